@@ -0,0 +1,32 @@
+"""Archive the submissions of exams that ended more than N days ago.
+
+Run from the backend directory, e.g. from cron:
+``python archive_submissions.py --older-than-days 180``. Safe to run more
+than once; an interrupted run is completed by the next one.
+"""
+import asyncio
+
+import typer
+
+from server import (
+    ARCHIVE_AFTER_DAYS, archivable_exams, archive_finished_exams, close_mongo, connect_mongo,
+)
+
+
+async def run(older_than_days: int) -> int:
+    connect_mongo()
+    try:
+        exam_ids = await archivable_exams(older_than_days)
+        await archive_finished_exams(exam_ids)
+    finally:
+        close_mongo()
+    return len(exam_ids)
+
+
+def main(older_than_days: int = typer.Option(ARCHIVE_AFTER_DAYS, help="Archive exams that ended this long ago.")):
+    archived = asyncio.run(run(older_than_days))
+    typer.echo(f"Archived {archived} exam(s)")
+
+
+if __name__ == "__main__":
+    typer.run(main)
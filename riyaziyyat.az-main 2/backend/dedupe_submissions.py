@@ -0,0 +1,34 @@
+"""Remove duplicate submissions so the unique (examId, studentId) index can be built.
+
+Run from the backend directory before starting a server on a database that
+was written without the index: ``python dedupe_submissions.py``. For each
+exam and student it keeps the earliest finished submission (a draft only
+when there is nothing else) and then creates the indexes.
+"""
+import asyncio
+
+import typer
+
+from server import close_mongo, connect_mongo, dedupe_submissions, ensure_indexes
+
+
+async def run(dry_run: bool) -> tuple:
+    connect_mongo()
+    try:
+        removed = await dedupe_submissions(dry_run)
+        missing_unique = [] if dry_run else await ensure_indexes()
+    finally:
+        close_mongo()
+    return removed, missing_unique
+
+
+def main(dry_run: bool = typer.Option(False, help="Only count the duplicates.")):
+    removed, missing_unique = asyncio.run(run(dry_run))
+    typer.echo(f"{'Would remove' if dry_run else 'Removed'} {removed} duplicate submission(s)")
+    if missing_unique:
+        typer.echo("Still missing unique indexes: " + ", ".join(missing_unique), err=True)
+        raise typer.Exit(1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
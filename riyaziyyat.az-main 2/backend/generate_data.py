@@ -0,0 +1,397 @@
+"""Generate a synthetic dataset at school-district scale.
+
+Run from the backend directory, for example
+``python generate_data.py --students 100000 --exams 5000 --seed 7 --drop``.
+Students, groups, exams (some questions carrying images) and the
+submissions of every exam that has started are written with bulk inserts,
+and the indexes are built once the data is in. The same options, ``--seed``
+and ``--today`` always produce the same documents.
+
+Every generated student logs in with ``--password``. Benchmarks and tests can
+skip the CLI and await ``generate(db, DatasetSpec(...))`` on any Motor database;
+``images=False`` skips the GridFS image store, which mongomock does not have.
+"""
+import asyncio
+import hashlib
+import random
+import struct
+import time
+import uuid
+import zlib
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import typer
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pydantic import BaseModel
+
+import server
+
+FIRST_NAMES = [
+    "Nijat", "Aynur", "Fuad", "Leyla", "Murad", "Günay", "Elvin", "Nigar", "Rauf", "Səbinə",
+    "Tural", "Aysel", "Kamran", "Nərgiz", "Orxan", "Lalə", "Ramil", "Şəbnəm", "Emil", "Fidan",
+]
+SURNAMES = [
+    "Məmmədov", "Əliyev", "Həsənov", "Hüseynov", "Quliyev", "İsmayılov", "Abbasov", "Rzayev",
+    "Cəfərov", "Kərimov", "Bağırov", "Nəsirov", "Qasımov", "Səfərov", "Vəliyev", "Orucov",
+]
+PHONE_PREFIXES = ["50", "51", "55", "70", "77", "99"]
+CLASS_LETTERS = "abcdef"
+EXAM_DURATIONS = [45, 60, 90, 120]
+EXAM_TOPICS = ["Cəbr", "Həndəsə", "Triqonometriya", "Funksiyalar", "Ehtimal", "Tənliklər", "Loqarifmlər"]
+OMIT_RATE = 0.05
+FREE_FORM_RATE = 0.2
+IMAGE_POOL_SIZE = 200
+# Everything the application stores, dropped by --drop
+APP_COLLECTIONS = [
+    "students", "groups", "exams", "submissions", "jobs", "submission_archives", "archive_summaries",
+    f"{server.IMAGE_BUCKET}.files", f"{server.IMAGE_BUCKET}.chunks",
+]
+
+
+class DatasetSpec(BaseModel):
+    students: int = 100_000
+    groups: int = 1_000
+    exams: int = 5_000
+    min_questions: int = 10
+    max_questions: int = 40
+    max_groups_per_exam: int = 4
+    # Share of an exam's active students who sit it
+    participation: float = 0.9
+    cheating_rate: float = 0.02
+    disabled_rate: float = 0.02
+    image_rate: float = 0.15
+    # Share of exams that have not started yet
+    upcoming_rate: float = 0.05
+    password: str = "student123"
+    seed: int = 0
+    today: date = date(2025, 9, 1)
+    batch_size: int = 5_000
+
+
+class BulkInserter:
+    """Buffers documents per collection and keeps a few insert_many calls in flight."""
+
+    def __init__(self, db, batch_size: int, concurrency: int = 4):
+        self.db = db
+        self.batch_size = batch_size
+        self.buffers: Dict[str, List[Dict[str, Any]]] = {}
+        self.counts: Dict[str, int] = {}
+        self.slots = asyncio.Semaphore(concurrency)
+        self.pending: set = set()
+
+    async def add(self, collection: str, document: Dict[str, Any]) -> None:
+        buffer = self.buffers.setdefault(collection, [])
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            await self.flush(collection)
+
+    async def flush(self, collection: str) -> None:
+        batch = self.buffers.pop(collection, [])
+        if not batch:
+            return
+        await self.slots.acquire()
+        task = asyncio.create_task(self._insert(collection, batch))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def _insert(self, collection: str, batch: List[Dict[str, Any]]) -> None:
+        try:
+            await self.db[collection].insert_many(batch, ordered=False)
+            self.counts[collection] = self.counts.get(collection, 0) + len(batch)
+        finally:
+            self.slots.release()
+
+    async def close(self) -> Dict[str, int]:
+        for collection in list(self.buffers):
+            await self.flush(collection)
+        await asyncio.gather(*self.pending)
+        return self.counts
+
+
+def seeded_uuid(pick: random.Random) -> str:
+    return str(uuid.UUID(int=pick.getrandbits(128), version=4))
+
+
+def png_image(red: int, green: int, blue: int, size: int = 16) -> bytes:
+    # A solid-colour RGB PNG, small but valid
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes([red, green, blue]) * size
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * size))
+        + chunk(b"IEND", b"")
+    )
+
+
+async def store_images(db, rng: np.random.Generator) -> List[str]:
+    # Stored the way server.store_image does it: named by SHA-256, so the
+    # image endpoint serves them and re-running reuses them
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name=server.IMAGE_BUCKET)
+    urls = []
+    for red, green, blue in rng.integers(0, 256, size=(IMAGE_POOL_SIZE, 3)):
+        data = png_image(int(red), int(green), int(blue))
+        digest = hashlib.sha256(data).hexdigest()
+        if not await db[f"{server.IMAGE_BUCKET}.files"].find_one({"filename": digest}, {"_id": 1}):
+            await bucket.upload_from_stream(digest, data, metadata={"contentType": "image/png"})
+        urls.append(server.IMAGE_URL_PREFIX + digest)
+    return urls
+
+
+def make_groups(spec: DatasetSpec, pick: random.Random) -> List[Dict[str, Any]]:
+    groups = []
+    for i in range(spec.groups):
+        grade = 5 + i % 7
+        groups.append({"id": seeded_uuid(pick), "name": f"{grade}({i // 7 + 1})", "grade": grade})
+    return groups
+
+
+def make_students(spec: DatasetSpec, groups: List[Dict[str, Any]], rng: np.random.Generator,
+                  pick: random.Random, password_hash: str) -> tuple:
+    """The student documents, the group index of each and a latent ability per student."""
+    # Uneven group sizes, as in real schools
+    weights = rng.dirichlet(np.full(len(groups), 5.0))
+    group_of = rng.choice(len(groups), size=spec.students, p=weights)
+    ability = rng.normal(0.0, 1.0, size=spec.students)
+    disabled = rng.random(spec.students) < spec.disabled_rate
+    phones = rng.integers(0, 10_000_000, size=spec.students)
+
+    students = []
+    for i in range(spec.students):
+        group = groups[group_of[i]]
+        name = pick.choice(FIRST_NAMES)
+        surname = pick.choice(SURNAMES)
+        students.append({
+            "id": seeded_uuid(pick),
+            "name": name,
+            # Surnames take the feminine ending for about half the students
+            "surname": surname + ("a" if pick.random() < 0.5 else ""),
+            "email": f"{name}.{surname}{i}".lower(),
+            "pass": password_hash,
+            "group": group["name"],
+            "class": f"{group['grade']}{CLASS_LETTERS[group_of[i] % len(CLASS_LETTERS)]}",
+            "parentContact": f"+994{pick.choice(PHONE_PREFIXES)}{phones[i]:07d}",
+            "status": "disabled" if disabled[i] else "active",
+        })
+    return students, group_of, ability
+
+
+def make_question(spec: DatasetSpec, rng: np.random.Generator, pick: random.Random,
+                  image_urls: List[str]) -> Dict[str, Any]:
+    a, b = (int(value) for value in rng.integers(1, 20, size=2))
+    image_url = pick.choice(image_urls) if image_urls and pick.random() < spec.image_rate else None
+    if pick.random() < FREE_FORM_RATE:
+        return {
+            "question": f"{a}x - {a * b} = 0 tənliyinin kökünü tapın.",
+            "type": "free-form",
+            "options": None,
+            "correctAnswer": str(b),
+            "imageUrl": image_url,
+        }
+    options = [f"x = {b + offset}" for offset in pick.sample(range(-5, 6), 4)]
+    return {
+        "question": f"{a}x = {a * b} olarsa, x nəyə bərabərdir?",
+        "type": "multiple-choice",
+        "options": options,
+        "correctAnswer": pick.choice(options),
+        "imageUrl": image_url,
+    }
+
+
+def make_exam(spec: DatasetSpec, groups: List[Dict[str, Any]], now: datetime, rng: np.random.Generator,
+              pick: random.Random, image_urls: List[str]) -> Dict[str, Any]:
+    if pick.random() < spec.upcoming_rate:
+        start_day = spec.today + timedelta(days=pick.randint(1, 30))
+    else:
+        start_day = spec.today - timedelta(days=pick.randint(0, 365))
+    start = datetime.combine(start_day, datetime.min.time()) + timedelta(minutes=pick.randrange(9 * 60, 17 * 60, 15))
+    end = start + timedelta(minutes=pick.choice(EXAM_DURATIONS))
+    status = "upcoming" if now < start else "live" if now < end else "finished"
+
+    questions_count = pick.randint(spec.min_questions, spec.max_questions)
+    questions = [make_question(spec, rng, pick, image_urls) for _ in range(questions_count)]
+    exam_groups = pick.sample(groups, pick.randint(1, min(spec.max_groups_per_exam, len(groups))))
+    exam = {
+        "id": seeded_uuid(pick),
+        "title": f"{pick.choice(EXAM_TOPICS)} - {start_day:%d.%m.%Y}",
+        "description": "Bacarıqlarınızın qiymətləndirilməsi.",
+        "questionsCount": questions_count,
+        "groups": [group["name"] for group in exam_groups],
+        "startTime": start.isoformat(timespec="seconds"),
+        "endTime": end.isoformat(timespec="seconds"),
+        "pointsPerQuestion": pick.randint(1, 5),
+        "status": status,
+        "questions": questions,
+    }
+    exam["answerKey"] = server.compile_answer_key(exam)
+    return exam
+
+
+def wrong_answers(question: Dict[str, Any]) -> List[str]:
+    if question["type"] == "multiple-choice":
+        return [option for option in question["options"] if option != question["correctAnswer"]]
+    return [str(int(question["correctAnswer"]) + offset) for offset in (-2, -1, 1, 2)]
+
+
+def make_submissions(spec: DatasetSpec, exam: Dict[str, Any], participants: np.ndarray,
+                     students: List[Dict[str, Any]], ability: np.ndarray, now: datetime,
+                     rng: np.random.Generator, pick: random.Random):
+    """Yield the submissions of one exam that has started.
+
+    Whether a student answers a question correctly follows a Rasch model of
+    their ability against the question's difficulty; cheaters do better.
+    Live exams get drafts holding the answers saved so far.
+    """
+    questions = exam["questions"]
+    difficulty = rng.normal(0.0, 1.0, size=len(questions))
+    cheating = rng.random(len(participants)) < spec.cheating_rate
+    logits = ability[participants, None] - difficulty[None, :] + np.where(cheating, 1.5, 0.0)[:, None]
+    correct = rng.random(logits.shape) < 1.0 / (1.0 + np.exp(-logits))
+    answered = rng.random(logits.shape) >= OMIT_RATE
+
+    start = datetime.fromisoformat(exam["startTime"])
+    end = datetime.fromisoformat(exam["endTime"])
+    live = exam["status"] == "live"
+    if live:
+        # How far into the exam each student has got
+        reached = rng.integers(0, len(questions) + 1, size=(len(participants), 1))
+        answered &= np.arange(len(questions))[None, :] < reached
+    offsets = rng.uniform(0.3, 1.0, size=len(participants)) * (end - start).total_seconds()
+
+    points = exam["pointsPerQuestion"]
+    keys = [str(index) for index in range(len(questions))]
+    expected = [question["correctAnswer"] for question in questions]
+    wrong = [wrong_answers(question) for question in questions]
+    for row, student in enumerate(participants):
+        answers = {
+            keys[index]: expected[index] if correct[row, index] else pick.choice(wrong[index])
+            for index in np.flatnonzero(answered[row])
+        }
+        submission = {
+            "id": seeded_uuid(pick),
+            "examId": exam["id"],
+            "studentId": students[student]["id"],
+            "answers": answers,
+            "cheatingDetected": bool(cheating[row]),
+        }
+        if live:
+            submission.update(score=None, status=server.SUBMISSION_IN_PROGRESS)
+        else:
+            submission.update(
+                submittedAt=(start + timedelta(seconds=float(offsets[row]))).isoformat(timespec="seconds"),
+                score=int((correct[row] & answered[row]).sum()) * points,
+                status=server.SUBMISSION_SUBMITTED,
+            )
+        yield submission
+
+
+async def drop_app_data(db) -> None:
+    for collection in APP_COLLECTIONS:
+        await db[collection].drop()
+
+
+async def generate(db, spec: DatasetSpec, progress=None, images: bool = True) -> Dict[str, int]:
+    """Write the dataset described by ``spec`` into ``db`` and return the document counts.
+
+    Collections are expected to be empty; indexes are not created here. With
+    ``images=False`` no image is stored and no question carries one.
+    """
+    rng = np.random.default_rng(spec.seed)
+    pick = random.Random(spec.seed)
+    report = progress or (lambda message: None)
+    now = datetime.combine(spec.today, datetime.min.time()) + timedelta(hours=12)
+    # One hash for everyone: hashing 100k passwords would dominate the run
+    password_hash = server.password_context.hash(spec.password)
+    inserter = BulkInserter(db, spec.batch_size)
+
+    groups = make_groups(spec, pick)
+    for group in groups:
+        await inserter.add("groups", {"id": group["id"], "name": group["name"]})
+    students, group_of, ability = make_students(spec, groups, rng, pick, password_hash)
+    for student in students:
+        await inserter.add("students", student)
+    report(f"{len(students)} students in {len(groups)} groups")
+
+    image_urls = await store_images(db, rng) if images else []
+    group_index = {group["name"]: index for index, group in enumerate(groups)}
+    active = np.array([student["status"] == "active" for student in students])
+    members = [np.flatnonzero((group_of == index) & active) for index in range(len(groups))]
+    for number in range(spec.exams):
+        exam = make_exam(spec, groups, now, rng, pick, image_urls)
+        await inserter.add("exams", exam)
+        if exam["status"] != "upcoming":
+            candidates = np.concatenate([members[group_index[name]] for name in exam["groups"]])
+            participants = candidates[rng.random(len(candidates)) < spec.participation]
+            for submission in make_submissions(spec, exam, participants, students, ability, now, rng, pick):
+                await inserter.add("submissions", submission)
+        if (number + 1) % 500 == 0:
+            report(f"{number + 1}/{spec.exams} exams")
+    return await inserter.close()
+
+
+def main(
+    students: int = typer.Option(100_000, help="Number of students."),
+    groups: int = typer.Option(1_000, help="Number of groups."),
+    exams: int = typer.Option(5_000, help="Number of exams."),
+    min_questions: int = typer.Option(10, help="Fewest questions per exam."),
+    max_questions: int = typer.Option(40, help="Most questions per exam."),
+    participation: float = typer.Option(0.9, help="Share of active students who sit each exam."),
+    cheating_rate: float = typer.Option(0.02, help="Share of submissions flagged for cheating."),
+    image_rate: float = typer.Option(0.15, help="Approximate share of questions with an image."),
+    password: str = typer.Option("student123", help="Password of every generated student."),
+    seed: int = typer.Option(0, help="Random seed; the same seed gives the same data."),
+    today: Optional[datetime] = typer.Option(
+        None, formats=["%Y-%m-%d"], help="Day exams are dated around (default: today)."
+    ),
+    batch_size: int = typer.Option(5_000, help="Documents per insert_many call."),
+    images: bool = typer.Option(True, "--images/--no-images", help="Store question images."),
+    drop: bool = typer.Option(False, "--drop", help="Drop existing application data first."),
+):
+    """Fill the database with a synthetic dataset."""
+    spec = DatasetSpec(
+        students=students,
+        groups=groups,
+        exams=exams,
+        min_questions=min_questions,
+        max_questions=max_questions,
+        participation=participation,
+        cheating_rate=cheating_rate,
+        image_rate=image_rate,
+        password=password,
+        seed=seed,
+        today=(today or datetime.now(server.EXAM_TIMEZONE)).date(),
+        batch_size=batch_size,
+    )
+    raise typer.Exit(asyncio.run(run(spec, drop, images)))
+
+
+async def run(spec: DatasetSpec, drop: bool, images: bool = True) -> int:
+    server.connect_mongo()
+    try:
+        if drop:
+            await drop_app_data(server.db)
+        elif await server.db.students.find_one({}, {"_id": 1}):
+            typer.echo("The database already has students; pass --drop to replace them", err=True)
+            return 1
+
+        started = time.perf_counter()
+        counts = await generate(server.db, spec, progress=typer.echo, images=images)
+        # Building the indexes once over the loaded data beats maintaining them per insert
+        missing_unique = await server.ensure_indexes()
+        elapsed = time.perf_counter() - started
+    finally:
+        server.close_mongo()
+    typer.echo(", ".join(f"{count} {collection}" for collection, count in sorted(counts.items())))
+    typer.echo(f"Done in {elapsed:.1f}s")
+    if missing_unique:
+        typer.echo("Could not build unique indexes: " + ", ".join(missing_unique), err=True)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    typer.run(main)
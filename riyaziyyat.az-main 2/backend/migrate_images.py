@@ -0,0 +1,21 @@
+"""Rewrite existing exams so question images live in the image store.
+
+Run from the backend directory: ``python migrate_images.py``. Safe to run
+more than once; exams without inline ``data:`` images are left untouched.
+"""
+import asyncio
+
+from server import close_mongo, connect_mongo, migrate_inline_images
+
+
+async def main():
+    connect_mongo()
+    try:
+        migrated = await migrate_inline_images()
+        print(f"Migrated {migrated} exam(s)")
+    finally:
+        close_mongo()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,41 +1,433 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Depends, Header, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.routing import Match
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
 import os
 import logging
+import asyncio
+import base64
+import codecs
+import contextvars
+import binascii
+import csv
+import hashlib
+import heapq
+import hmac
+import io
+import json
+import jwt
+import threading
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from passlib.context import CryptContext
+from pydantic import BaseModel, Field, ValidationError
+from pydantic_core import PydanticUndefined
+from typing import List, Optional, Dict, Any, Union
+import typing
 import uuid
-from datetime import datetime, timezone
+import zlib
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import numpy as np
+import orjson
+import pandas as pd
+try:
+    import brotli
+except ImportError:  # responses are then only gzip-compressed
+    brotli = None
+try:
+    import msgpack
+except ImportError:  # responses are then only JSON
+    msgpack = None
+from pymongo import ASCENDING, DeleteOne, IndexModel, InsertOne, ReadPreference, ReplaceOne, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from bson import ObjectId
+from bson.errors import InvalidId
+from gridfs.errors import NoFile
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Request and Mongo command metrics
+SLOW_REQUEST_SECONDS = float(os.environ.get('SLOW_REQUEST_SECONDS', '1.0'))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, label_names: tuple, buckets: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: tuple, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One count per bucket, then +Inf, sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in series_items:
+            label_text = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            prefix = label_text + "," if label_text else ""
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series[len(self.buckets)]}')
+            lines.append(f"{self.name}_count{{{label_text}}} {series[len(self.buckets)]}")
+            lines.append(f"{self.name}_sum{{{label_text}}} {series[-1]}")
+        return lines
+
+class Gauge:
+    def __init__(self, name: str, help_text: str, label_names: tuple):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def add(self, labels: tuple, amount: float) -> None:
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            label_text = ",".join(f'{name}="{label}"' for name, label in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_text}}} {value}")
+        return lines
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route", "status"), LATENCY_BUCKETS)
+http_response_size = Histogram(
+    "http_response_size_bytes", "HTTP response body size.", ("method", "route"), SIZE_BUCKETS)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method", "route"))
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency.", ("command", "collection"), LATENCY_BUCKETS)
+mongo_request_duration = Histogram(
+    "mongo_request_duration_seconds", "MongoDB time spent per HTTP request.", ("method", "route"), LATENCY_BUCKETS)
+mongo_request_documents = Histogram(
+    "mongo_request_documents", "Documents returned or written per HTTP request.", ("method", "route"),
+    (1, 10, 100, 1000, 10000, 100000))
+mongo_pool_connections = Gauge(
+    "mongo_pool_connections", "MongoDB connections by pool state.", ("address", "state"))
+METRICS = [
+    http_request_duration, http_response_size, http_requests_in_flight,
+    mongo_command_duration, mongo_request_duration, mongo_request_documents,
+    mongo_pool_connections,
+]
+
+class RequestStats:
+    # Mongo work done on behalf of one HTTP request
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.documents = 0
+        self.commands: List[tuple] = []
+
+current_request_stats: contextvars.ContextVar = contextvars.ContextVar("current_request_stats", default=None)
+
+def _reply_documents(reply: Dict[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    count = reply.get("n", 0)
+    return count if isinstance(count, int) else 0
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """Times every Mongo command and charges it to the HTTP request that issued it.
+
+    Motor runs pymongo calls with a copy of the caller's context, so the
+    request's ``RequestStats`` is visible from these callbacks. A ``getMore``
+    names only its cursor, so open cursors are remembered with the collection
+    their ``find`` or ``aggregate`` read, until exhausted or killed.
+    """
+
+    MAX_CURSORS = 10000
+
+    def __init__(self):
+        self._collections: Dict[tuple, tuple] = {}
+        self._cursors: "OrderedDict[int, str]" = OrderedDict()
+        # Callbacks run on Motor's executor threads
+        self._lock = threading.Lock()
+
+    def started(self, event) -> None:
+        cursor_id = None
+        if event.command_name == "getMore":
+            cursor_id = event.command["getMore"]
+            with self._lock:
+                collection = self._cursors.get(cursor_id, event.command.get("collection", ""))
+        else:
+            collection = event.command.get(event.command_name)
+            collection = collection if isinstance(collection, str) else ""
+            if event.command_name == "killCursors":
+                with self._lock:
+                    for killed in event.command.get("cursors", []):
+                        self._cursors.pop(killed, None)
+        self._collections[(event.connection_id, event.request_id)] = (collection, cursor_id)
+
+    def succeeded(self, event) -> None:
+        collection, cursor_id = self._collections.get((event.connection_id, event.request_id), ("", None))
+        cursor = event.reply.get("cursor")
+        if isinstance(cursor, dict):
+            self._track_cursor(cursor_id, cursor.get("id", 0), collection)
+        self._record(event, _reply_documents(event.reply))
+
+    def failed(self, event) -> None:
+        self._record(event, 0)
+
+    def _track_cursor(self, previous_id: Optional[int], cursor_id: int, collection: str) -> None:
+        with self._lock:
+            if previous_id is not None and not cursor_id:
+                # The getMore drained the cursor
+                self._cursors.pop(previous_id, None)
+            elif previous_id is None and cursor_id:
+                self._cursors[cursor_id] = collection
+                while len(self._cursors) > self.MAX_CURSORS:
+                    self._cursors.popitem(last=False)
+
+    def _record(self, event, documents: int) -> None:
+        collection, _ = self._collections.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_duration.observe((event.command_name, collection), seconds)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.db_seconds += seconds
+            stats.documents += documents
+            stats.commands.append((event.command_name, collection, seconds, documents))
+
+mongo_command_monitor = MongoCommandMonitor()
+
+class MongoPoolMonitor(monitoring.ConnectionPoolListener):
+    """Tracks open, checked-out and waiting connections of each server's pool."""
+
+    STATES = ("open", "in_use", "waiting")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, address, state: str, amount: int) -> None:
+        key = "%s:%s" % address
+        with self._lock:
+            counts = self._counts.setdefault(key, dict.fromkeys(self.STATES, 0))
+            counts[state] += amount
+        mongo_pool_connections.add((key, state), amount)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {address: dict(counts) for address, counts in self._counts.items()}
+
+    def connection_created(self, event) -> None:
+        self._add(event.address, "open", 1)
+
+    def connection_closed(self, event) -> None:
+        self._add(event.address, "open", -1)
+
+    def connection_check_out_started(self, event) -> None:
+        self._add(event.address, "waiting", 1)
+
+    def connection_check_out_failed(self, event) -> None:
+        self._add(event.address, "waiting", -1)
+
+    def connection_checked_out(self, event) -> None:
+        self._add(event.address, "waiting", -1)
+        self._add(event.address, "in_use", 1)
+
+    def connection_checked_in(self, event) -> None:
+        self._add(event.address, "in_use", -1)
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+mongo_pool_monitor = MongoPoolMonitor()
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, in-flight count, size and Mongo cost per route.
+
+    Server-sent event streams stay open for as long as a page is, so their
+    lifetime is neither a latency nor slow: they only count as in flight.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _route(self, scope) -> str:
+        for route in scope["app"].router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        labels = (scope["method"], self._route(scope))
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = {"code": 500, "stream": False}
+        size = {"bytes": 0}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                content_type = Headers(raw=message.get("headers", [])).get("content-type", "")
+                status["stream"] = content_type.startswith("text/event-stream")
+            elif message["type"] == "http.response.body":
+                size["bytes"] += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.add(labels, 1)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.add(labels, -1)
+            current_request_stats.reset(token)
+            if not status["stream"]:
+                http_request_duration.observe(labels + (str(status["code"]),), elapsed)
+            http_response_size.observe(labels, size["bytes"])
+            mongo_request_duration.observe(labels, stats.db_seconds)
+            mongo_request_documents.observe(labels, stats.documents)
+            if elapsed >= SLOW_REQUEST_SECONDS and not status["stream"]:
+                commands = "; ".join(
+                    f"{name} {collection} {seconds * 1000:.1f}ms {documents} docs"
+                    for name, collection, seconds, documents in stats.commands
+                )
+                logging.getLogger(__name__).warning(
+                    "Slow request %s %s: %.3fs total, %.3fs in %d Mongo commands [%s]",
+                    labels[0], labels[1], elapsed, stats.db_seconds, len(stats.commands), commands,
+                )
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
 # MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+MONGO_READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+def mongo_client_options() -> Dict[str, Any]:
+    socket_timeout = os.environ.get('MONGO_SOCKET_TIMEOUT_MS')
+    return {
+        "maxPoolSize": int(os.environ.get('MONGO_MAX_POOL_SIZE', '100')),
+        "minPoolSize": int(os.environ.get('MONGO_MIN_POOL_SIZE', '0')),
+        "maxIdleTimeMS": int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '300000')),
+        "waitQueueTimeoutMS": int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000')),
+        "connectTimeoutMS": int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+        "serverSelectionTimeoutMS": int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+        "socketTimeoutMS": int(socket_timeout) if socket_timeout else None,
+        "read_preference": MONGO_READ_PREFERENCES[os.environ.get('MONGO_READ_PREFERENCE', 'primary')],
+    }
+
+# Created per process by connect_mongo(), never at import: a client inherited
+# across fork() shares sockets and locks with its parent, and Motor binds to
+# the event loop it first runs on.
+client: Optional[AsyncIOMotorClient] = None
+db = None
+client_pid: Optional[int] = None
+
+def connect_mongo() -> AsyncIOMotorClient:
+    global client, db, client_pid
+    if client is not None and client_pid != os.getpid():
+        # Forked after connecting; drop the parent's client without touching its sockets
+        client = None
+    if client is None:
+        client = AsyncIOMotorClient(
+            os.environ['MONGO_URL'],
+            event_listeners=[mongo_command_monitor, mongo_pool_monitor],
+            **mongo_client_options(),
+        )
+        db = client[os.environ['DB_NAME']]
+        client_pid = os.getpid()
+    return client
+
+def close_mongo() -> None:
+    global client, db, client_pid
+    if client is not None and client_pid == os.getpid():
+        client.close()
+    client = db = client_pid = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not SESSION_SECRET:
+        # A random per-process key would break sessions across workers and restarts
+        raise RuntimeError("SESSION_SECRET is not set")
+    # Each worker process connects once its own event loop is running
+    connect_mongo()
+    try:
+        await start_background_services()
+        yield
+    finally:
+        await stop_background_services()
+        close_mongo()
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Models
-class Student(BaseModel):
+class StudentProfile(BaseModel):
+    # A student as sent to clients: everything but the password hash
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     surname: str
     email: str
-    pass_: str = Field(alias="pass")
     group: str
     class_: str = Field(alias="class")
     parentContact: str
     status: str = "active"
 
+class Student(StudentProfile):
+    pass_: str = Field(alias="pass")
+
+class StudentEdit(StudentProfile):
+    # An empty or missing password keeps the current one
+    pass_: Optional[str] = Field(None, alias="pass")
+
 class Group(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
@@ -59,6 +451,30 @@ class Exam(BaseModel):
     status: str = "upcoming"  # upcoming, live, finished
     questions: List[Question]
 
+class ExamSummary(BaseModel):
+    # Exam without its questions, for list views
+    id: str
+    title: str
+    description: str
+    questionsCount: int
+    groups: List[str]
+    startTime: str
+    endTime: str
+    pointsPerQuestion: int
+    status: str = "upcoming"
+
+EXAM_SUMMARY_PROJECTION = {field: 1 for field in ExamSummary.model_fields}
+
+class StudentSubmissionStatus(BaseModel):
+    id: str
+    submittedAt: str
+    cheatingDetected: bool = False
+    score: Optional[int] = None
+
+class StudentExam(ExamSummary):
+    # The student's own submission for this exam, if any
+    submission: Optional[StudentSubmissionStatus] = None
+
 class Submission(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     examId: str
@@ -67,6 +483,105 @@ class Submission(BaseModel):
     submittedAt: str
     cheatingDetected: bool = False
     score: Optional[int] = None
+    status: str = "submitted"  # "in-progress" while answers are being autosaved
+
+SUBMISSION_IN_PROGRESS = "in-progress"
+SUBMISSION_SUBMITTED = "submitted"
+# Matches finished submissions, including ones stored before drafts existed
+FINISHED_SUBMISSIONS = {"status": {"$ne": SUBMISSION_IN_PROGRESS}}
+# Drafts, and drafts submitted for the student when the exam ended, which the
+# student's own submission may still replace during the grace period
+OPEN_SUBMISSIONS = {"$or": [{"status": SUBMISSION_IN_PROGRESS}, {"autoSubmitted": True}]}
+
+class AnswerDraft(BaseModel):
+    examId: str
+    studentId: str
+    # Answers keyed by question index; autosaves send only the changed ones
+    answers: Dict[str, str] = {}
+
+class RegradeRequest(BaseModel):
+    # Corrected answers keyed by question index, applied before regrading
+    correctAnswers: Dict[str, str] = {}
+
+class OptionFrequency(BaseModel):
+    option: str
+    correct: bool
+    count: int
+    rate: float
+    # Share of the top and bottom 27% of students that picked this option
+    upperRate: float
+    lowerRate: float
+
+class QuestionAnalysis(BaseModel):
+    index: int
+    type: str
+    difficulty: Optional[float] = None
+    discrimination: Optional[float] = None
+    pointBiserial: Optional[float] = None
+    omitted: Optional[float] = None
+    options: Optional[List[OptionFrequency]] = None
+    otherRate: Optional[float] = None
+
+class ExamAnalysis(BaseModel):
+    examId: str
+    submissions: int
+    meanScore: Optional[float] = None
+    questions: List[QuestionAnalysis]
+
+class StudentPatch(BaseModel):
+    # Fields of a student to change; anything left out is kept
+    name: Optional[str] = None
+    surname: Optional[str] = None
+    email: Optional[str] = None
+    pass_: Optional[str] = Field(None, alias="pass")
+    group: Optional[str] = None
+    class_: Optional[str] = Field(None, alias="class")
+    parentContact: Optional[str] = None
+    status: Optional[str] = None
+
+class StudentUpdate(BaseModel):
+    id: str
+    changes: StudentPatch
+
+class StudentBulkRequest(BaseModel):
+    create: List[Student] = []
+    update: List[StudentUpdate] = []
+    delete: List[str] = []
+
+class GroupBulkRequest(BaseModel):
+    create: List[str] = []
+    delete: List[str] = []
+
+class GroupMoveRequest(BaseModel):
+    to: str
+
+class ExamBulkRequest(BaseModel):
+    create: List[Exam] = []
+    delete: List[str] = []
+
+class BulkItemResult(BaseModel):
+    op: str
+    id: str
+    ok: bool = True
+    error: Optional[str] = None
+
+class ImportRowError(BaseModel):
+    row: int  # line of the record in the file, the header being line 1
+    error: str
+
+class ImportResult(BaseModel):
+    imported: int = 0
+    updated: int = 0
+    failed: int = 0
+    # The first CSV_IMPORT_MAX_ERRORS failures; ``failed`` counts them all
+    errors: List[ImportRowError] = []
+
+class CheatingReport(BaseModel):
+    id: str
+    studentName: str
+    group: str
+    examTitle: str
+    submittedAt: str
 
 class LoginRequest(BaseModel):
     email: str
@@ -77,6 +592,1825 @@ class LoginResponse(BaseModel):
     userType: str  # "teacher" or "student"
     user: Optional[Dict[str, Any]] = None
     message: str
+    # Signed session, sent back as "Authorization: Bearer <token>"
+    token: Optional[str] = None
+
+# Scoring
+def normalize_answer(answer: Optional[str]) -> str:
+    # Same rule the results page used: trimmed, case-insensitive match
+    return (answer or "").strip().lower()
+
+def compile_answer_key(exam: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "answers": [normalize_answer(q["correctAnswer"]) for q in exam["questions"]],
+        "points": exam["pointsPerQuestion"],
+    }
+
+def score_answers(answer_key: Dict[str, Any], answers: Dict[str, str]) -> int:
+    correct = 0
+    for index, expected in enumerate(answer_key["answers"]):
+        given = normalize_answer(answers.get(str(index)))
+        # An empty answer never counts, even against an empty key
+        if given and given == expected:
+            correct += 1
+    return correct * answer_key["points"]
+
+def answer_codes(question_count: int, submissions: List[Dict[str, Any]]) -> tuple:
+    """Normalized answers of many submissions as a submissions x questions code matrix.
+
+    Returns ``(codes, labels)`` where ``labels[codes[i, j]]`` is the
+    normalized answer of submission ``i`` to question ``j`` and missing
+    answers are "". Answers are factorized before normalizing, so the string
+    work is done once per distinct answer rather than once per cell.
+    """
+    columns = [str(index) for index in range(question_count)]
+    raw = pd.DataFrame.from_records(
+        [submission.get("answers") or {} for submission in submissions], columns=columns
+    ).to_numpy(dtype=object)
+    raw_codes, raw_labels = pd.factorize(raw.ravel())
+    normalized = [normalize_answer(str(label)) for label in raw_labels] + [""]
+    # Different raw spellings of one normalized answer share a code
+    codes_by_label, labels = pd.factorize(np.array(normalized, dtype=object))
+    raw_codes[raw_codes < 0] = len(raw_labels)
+    return codes_by_label[raw_codes].reshape(raw.shape), np.asarray(labels, dtype=object)
+
+def expected_codes(answer_key: Dict[str, Any], labels: np.ndarray) -> np.ndarray:
+    # Code of each correct answer; -1 when nobody gave it or the key is empty
+    code_of = {label: code for code, label in enumerate(labels) if label != ""}
+    return np.array([code_of.get(answer, -1) for answer in answer_key["answers"]], dtype=np.int64)
+
+def score_submissions_frame(answer_key: Dict[str, Any], submissions: List[Dict[str, Any]]) -> np.ndarray:
+    """Score many submissions at once.
+
+    Answers are laid out as a submissions x questions matrix so comparison
+    runs column-wise instead of per answer in Python.
+    """
+    if not submissions or not answer_key["answers"]:
+        return np.zeros(len(submissions), dtype=np.int64)
+    codes, labels = answer_codes(len(answer_key["answers"]), submissions)
+    correct = codes == expected_codes(answer_key, labels)
+    return correct.sum(axis=1).astype(np.int64) * answer_key["points"]
+
+ITEM_GROUP_SHARE = 0.27  # Kelley's upper and lower groups
+
+def _rate(value) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), 4)
+
+def analyze_items(exam: Dict[str, Any], submissions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Per-question statistics of an exam's submissions.
+
+    For every question: difficulty (share answering correctly), the
+    upper-lower discrimination index over the top and bottom 27% by total
+    score, the corrected point-biserial correlation with the rest of the
+    test, the omission rate and, for multiple-choice questions, how often
+    each option was picked overall and within both groups.
+    """
+    questions = exam["questions"]
+    answer_key = exam.get("answerKey") or compile_answer_key(exam)
+    count = len(submissions)
+    analysis = {"examId": exam["id"], "submissions": count, "meanScore": None, "questions": []}
+    if not count or not questions:
+        analysis["questions"] = [
+            {"index": index, "type": question["type"], "difficulty": None, "discrimination": None,
+             "pointBiserial": None, "omitted": None, "options": None, "otherRate": None}
+            for index, question in enumerate(questions)
+        ]
+        return analysis
+
+    codes, labels = answer_codes(len(questions), submissions)
+    correct = codes == expected_codes(answer_key, labels)
+    totals = correct.sum(axis=1)
+    analysis["meanScore"] = round(float(totals.mean()) * answer_key["points"], 4)
+
+    group_size = max(1, int(round(count * ITEM_GROUP_SHARE)))
+    order = np.argsort(totals, kind="stable")
+    lower, upper = order[:group_size], order[-group_size:]
+    difficulty = correct.mean(axis=0)
+    discrimination = correct[upper].mean(axis=0) - correct[lower].mean(axis=0)
+
+    # Item against the rest of the test, so an item doesn't correlate with itself
+    items = correct.astype(np.float64)
+    rest = totals[:, None] - items
+    items_centered = items - items.mean(axis=0)
+    rest_centered = rest - rest.mean(axis=0)
+    spread = np.sqrt((items_centered ** 2).sum(axis=0) * (rest_centered ** 2).sum(axis=0))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        point_biserial = np.where(spread > 0, (items_centered * rest_centered).sum(axis=0) / spread, np.nan)
+
+    blank = int(np.flatnonzero(labels == "")[0])
+    omitted = (codes == blank).mean(axis=0)
+
+    # Answer counts per question and code, one bincount per group
+    label_count = len(labels)
+    offsets = np.arange(len(questions)) * label_count
+
+    def answer_counts(rows) -> np.ndarray:
+        flat = (codes[rows] + offsets).ravel()
+        return np.bincount(flat, minlength=len(questions) * label_count).reshape(len(questions), label_count)
+
+    overall, upper_counts, lower_counts = answer_counts(slice(None)), answer_counts(upper), answer_counts(lower)
+    code_of = {label: code for code, label in enumerate(labels)}
+
+    for index, question in enumerate(questions):
+        options = None
+        other_rate = None
+        if question["type"] == "multiple-choice" and question.get("options"):
+            options = []
+            option_codes = set()
+            for option in question["options"]:
+                code = code_of.get(normalize_answer(option), blank)
+                picked = code != blank
+                if picked:
+                    option_codes.add(code)
+                options.append({
+                    "option": option,
+                    "correct": normalize_answer(option) == answer_key["answers"][index],
+                    "count": int(overall[index, code]) if picked else 0,
+                    "rate": _rate(overall[index, code] / count) if picked else 0.0,
+                    "upperRate": _rate(upper_counts[index, code] / group_size) if picked else 0.0,
+                    "lowerRate": _rate(lower_counts[index, code] / group_size) if picked else 0.0,
+                })
+            # Answers that match none of the options
+            chosen = sum(int(overall[index, code]) for code in option_codes)
+            other_rate = _rate((count - int(overall[index, blank]) - chosen) / count)
+        analysis["questions"].append({
+            "index": index,
+            "type": question["type"],
+            "difficulty": _rate(difficulty[index]),
+            "discrimination": _rate(discrimination[index]),
+            "pointBiserial": _rate(point_biserial[index]),
+            "omitted": _rate(omitted[index]),
+            "options": options,
+            "otherRate": other_rate,
+        })
+    return analysis
+
+# Exam timing
+# Exam times are stored as naive local times from the browser
+EXAM_TIMEZONE = ZoneInfo(os.environ.get('EXAM_TIMEZONE', 'Asia/Baku'))
+SUBMISSION_GRACE = timedelta(seconds=float(os.environ.get('SUBMISSION_GRACE_SECONDS', '60')))
+
+def parse_exam_time(value: Optional[str]) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=EXAM_TIMEZONE)
+
+def exam_status_at(start: datetime, end: datetime, now: datetime) -> str:
+    if now < start:
+        return "upcoming"
+    if now <= end:
+        return "live"
+    return "finished"
+
+async def get_submission_rules(exam_ids) -> Dict[str, Dict[str, Any]]:
+    """Answer key and submission deadline of each exam, in one query."""
+    exams = await db.exams.find(
+        {"id": {"$in": list(exam_ids)}},
+        {"_id": 0, "id": 1, "answerKey": 1, "endTime": 1, "pointsPerQuestion": 1, "questions.correctAnswer": 1},
+    ).to_list(None)
+    rules = {}
+    for exam in exams:
+        if not exam.get("answerKey"):
+            # Exams created before answer keys were stored get one on first use
+            exam["answerKey"] = compile_answer_key(exam)
+            await db.exams.update_one({"id": exam["id"]}, {"$set": {"answerKey": exam["answerKey"]}})
+        end = parse_exam_time(exam.get("endTime"))
+        rules[exam["id"]] = {
+            "answerKey": exam["answerKey"],
+            "closesAt": end + SUBMISSION_GRACE if end else None,
+        }
+    return rules
+
+# Live exam events
+LIVE_EVENTS_SOURCE = os.environ.get('LIVE_EVENTS_SOURCE', 'local')  # "local" or "changestream"
+LIVE_EVENTS_HEARTBEAT = float(os.environ.get('LIVE_EVENTS_HEARTBEAT', '15'))
+SUBMISSION_EVENT_FIELDS = ("id", "examId", "studentId", "submittedAt", "cheatingDetected", "score")
+
+class EventBroker:
+    """In-process pub/sub of exam events for live monitoring.
+
+    Each subscriber gets a bounded queue. A subscriber that falls behind has
+    its backlog replaced by a single ``resync`` event telling it to refetch.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: Dict[asyncio.Queue, Optional[str]] = {}
+
+    def subscribe(self, exam_id: Optional[str] = None) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        self._subscribers[queue] = exam_id
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.pop(queue, None)
+
+    def publish(self, event_type: str, payload: Dict[str, Any]) -> None:
+        event = {"type": event_type, "data": payload}
+        for queue, exam_id in list(self._subscribers.items()):
+            if exam_id is not None and exam_id != payload.get("examId"):
+                continue
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync", "data": {}})
+
+event_broker = EventBroker()
+
+def publish_submission_event(event_type: str, submission: Dict[str, Any]) -> None:
+    # With change streams the watcher publishes, so every worker sees every event
+    if LIVE_EVENTS_SOURCE == "local":
+        event_broker.publish(
+            event_type, {field: submission.get(field) for field in SUBMISSION_EVENT_FIELDS}
+        )
+
+async def watch_submission_changes() -> None:
+    """Feed the broker from a submissions change stream (needs a replica set)."""
+    pipeline = [{"$match": {
+        "operationType": {"$in": ["insert", "update", "replace"]},
+        # Autosaves of in-progress answers are not events for teachers
+        "fullDocument.status": {"$ne": SUBMISSION_IN_PROGRESS},
+    }}]
+    projection = {field: 1 for field in SUBMISSION_EVENT_FIELDS}
+    while True:
+        try:
+            async with db.submissions.watch(pipeline, full_document="updateLookup") as stream:
+                async for change in stream:
+                    document = change.get("fullDocument")
+                    if not document:
+                        continue
+                    payload = {field: document.get(field) for field in projection}
+                    updated = change.get("updateDescription", {}).get("updatedFields", {})
+                    if change["operationType"] == "insert" or "status" in updated:
+                        event_broker.publish("submission", payload)
+                    elif "cheatingDetected" in updated:
+                        event_broker.publish("cheating-flag", payload)
+                    else:
+                        event_broker.publish("score", payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logging.getLogger(__name__).exception("Submission change stream failed, restarting")
+            await asyncio.sleep(1)
+
+change_stream_task: Optional[asyncio.Task] = None
+
+# Submission ingestion
+class WriteBatcher(ABC):
+    """Group-commits queued writes.
+
+    Items are queued and flushed every few milliseconds as one batch, so many
+    concurrent callers become a handful of writes. Each caller is answered
+    only after its batch has been written. Subclasses implement ``_flush``.
+    """
+
+    busy_detail = "Too many requests, please retry"
+
+    def __init__(self, max_batch: int = 500, max_delay: float = 0.005, max_queue: int = 10000):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            # Run in a fresh context so batch writes aren't charged to whichever
+            # request happened to start the batcher
+            self._task = contextvars.Context().run(
+                asyncio.get_running_loop().create_task, self._run()
+            )
+
+    async def submit(self, item: Dict[str, Any]) -> Any:
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=503,
+                detail=self.busy_detail,
+                headers={"Retry-After": "1"},
+            )
+        return await future
+
+    async def close(self) -> None:
+        # The sentinel queues behind everything already submitted
+        if self._task is not None and not self._task.done():
+            await self._queue.put(None)
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            if self._queue.qsize() < self.max_batch - 1 and self.max_delay:
+                await asyncio.sleep(self.max_delay)
+            closing = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            try:
+                await self._flush(batch)
+            except Exception as exc:
+                logger.exception("%s batch of %d failed", type(self).__name__, len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            if closing:
+                return
+
+    @abstractmethod
+    async def _flush(self, batch) -> None:
+        """Write one batch of ``(item, future)`` pairs and settle the futures."""
+
+def _settle(futures, outcome) -> None:
+    for future in futures:
+        if future.done():
+            continue
+        if isinstance(outcome, Exception):
+            future.set_exception(outcome)
+        else:
+            future.set_result(outcome)
+
+def _unavailable_exams(pending, rules, now) -> None:
+    # Drop entries for exams deleted since they were queued or past their
+    # deadline, failing their callers
+    for key, (_, futures) in list(pending.items()):
+        exam_rules = rules.get(key[0])
+        if exam_rules is None:
+            _settle(futures, HTTPException(status_code=404, detail="Exam not found"))
+            del pending[key]
+        elif exam_rules["closesAt"] is not None and now > exam_rules["closesAt"]:
+            _settle(futures, HTTPException(status_code=403, detail="Exam has finished"))
+            del pending[key]
+
+async def find_by_student_keys(keys, query: Dict[str, Any], projection: Dict[str, Any]) -> Dict[tuple, Dict[str, Any]]:
+    documents = {}
+    if keys:
+        by_key = {"$or": [{"examId": exam_id, "studentId": student_id} for exam_id, student_id in keys]}
+        async for document in db.submissions.find(
+            {"$and": [by_key, query]} if query else by_key, projection,
+        ):
+            documents[(document["examId"], document["studentId"])] = document
+    return documents
+
+class SubmissionBatcher(WriteBatcher):
+    """Group-commits finished submissions.
+
+    Flushed as one unordered bulk upsert keyed on (examId, studentId), so a
+    whole class auto-submitting at once becomes a handful of writes and a
+    retried submission resolves to the one already stored. When answers were
+    autosaved the in-progress document is flipped to submitted and only the
+    answers that differ from the draft are written.
+    """
+
+    busy_detail = "Too many submissions, please retry"
+
+    async def _flush(self, batch) -> None:
+        # Collapse duplicates within the batch before they reach Mongo
+        pending: "OrderedDict[tuple, tuple]" = OrderedDict()
+        for submission, future in batch:
+            key = (submission["examId"], submission["studentId"])
+            pending.setdefault(key, (submission, []))[1].append(future)
+
+        rules = await get_submission_rules({key[0] for key in pending})
+        _unavailable_exams(pending, rules, datetime.now(timezone.utc))
+        if not pending:
+            return
+        drafts = await find_by_student_keys(
+            list(pending), OPEN_SUBMISSIONS,
+            {"_id": 0, "examId": 1, "studentId": 1, "answers": 1},
+        )
+
+        operations = []
+        for key, (submission, _) in pending.items():
+            draft_answers = (drafts[key].get("answers") or {}) if key in drafts else None
+            answers = {**(draft_answers or {}), **submission["answers"]}
+            # Always scored on the server; the client's score is never kept
+            submission["score"] = score_answers(rules[submission["examId"]]["answerKey"], answers)
+            changes = {
+                field: submission[field] for field in ("submittedAt", "cheatingDetected", "score")
+            }
+            changes["status"] = SUBMISSION_SUBMITTED
+            if draft_answers is None:
+                changes["answers"] = answers
+            else:
+                changes.update({
+                    f"answers.{index}": answer for index, answer in submission["answers"].items()
+                    if draft_answers.get(index) != answer
+                })
+            submission.update(answers=answers, status=SUBMISSION_SUBMITTED)
+            operations.append(UpdateOne(
+                {"examId": submission["examId"], "studentId": submission["studentId"], **OPEN_SUBMISSIONS},
+                {"$set": changes, "$setOnInsert": {"id": submission["id"]}, "$unset": {"autoSubmitted": ""}},
+                upsert=True,
+            ))
+
+        failed: Dict[int, Dict[str, Any]] = {}
+        try:
+            result = await db.submissions.bulk_write(operations, ordered=False)
+            upserted = set(result.upserted_ids)
+        except BulkWriteError as exc:
+            upserted = {entry["index"] for entry in exc.details.get("upserted", [])}
+            for error in exc.details.get("writeErrors", []):
+                # A duplicate key means it was already submitted
+                if error["code"] != 11000:
+                    failed[error["index"]] = error
+
+        existing = await find_by_student_keys(
+            [key for index, key in enumerate(pending) if index not in upserted and index not in failed],
+            {}, {"_id": 0},
+        )
+
+        for index, (key, (submission, futures)) in enumerate(pending.items()):
+            if index in failed:
+                _settle(futures, HTTPException(status_code=500, detail="Submission could not be saved"))
+                continue
+            stored = submission if index in upserted else existing.get(key, submission)
+            _settle(futures, stored)
+            if index in upserted or (key in drafts and stored["submittedAt"] == submission["submittedAt"]):
+                analysis_cache.invalidate(key[0])
+                publish_submission_event("submission", stored)
+
+class AnswerAutosaver(WriteBatcher):
+    """Coalesces autosaved answers into partial updates of in-progress submissions.
+
+    Saves arriving within one flush window are merged per student, later
+    answers winning, and written as a single ``$set`` of just the changed
+    ``answers.<index>`` paths. Each caller gets the number of answers saved.
+    """
+
+    busy_detail = "Too many saves, please retry"
+
+    async def _flush(self, batch) -> None:
+        pending: "OrderedDict[tuple, tuple]" = OrderedDict()
+        for delta, future in batch:
+            key = (delta["examId"], delta["studentId"])
+            answers, futures = pending.setdefault(key, ({}, []))
+            answers.update(delta["answers"])
+            futures.append(future)
+
+        rules = await get_submission_rules({key[0] for key in pending})
+        _unavailable_exams(pending, rules, datetime.now(timezone.utc))
+        if not pending:
+            return
+
+        operations = [
+            UpdateOne(
+                {"examId": exam_id, "studentId": student_id, "status": SUBMISSION_IN_PROGRESS},
+                {
+                    "$set": {f"answers.{index}": answer for index, answer in answers.items()},
+                    "$setOnInsert": {"id": str(uuid.uuid4()), "cheatingDetected": False, "score": None},
+                },
+                upsert=True,
+            )
+            for (exam_id, student_id), (answers, _) in pending.items()
+        ]
+        outcomes: Dict[int, Exception] = {}
+        try:
+            await db.submissions.bulk_write(operations, ordered=False)
+        except BulkWriteError as exc:
+            for error in exc.details.get("writeErrors", []):
+                if error["code"] == 11000:
+                    outcomes[error["index"]] = HTTPException(status_code=409, detail="Exam already submitted")
+                else:
+                    outcomes[error["index"]] = HTTPException(status_code=500, detail="Answers could not be saved")
+
+        for index, (answers, futures) in enumerate(pending.values()):
+            _settle(futures, outcomes.get(index, {"saved": len(answers)}))
+
+submission_batcher = SubmissionBatcher(
+    max_batch=int(os.environ.get('SUBMISSION_BATCH_SIZE', '500')),
+    max_delay=float(os.environ.get('SUBMISSION_BATCH_DELAY_MS', '5')) / 1000,
+    max_queue=int(os.environ.get('SUBMISSION_QUEUE_SIZE', '10000')),
+)
+
+answer_autosaver = AnswerAutosaver(
+    max_batch=int(os.environ.get('AUTOSAVE_BATCH_SIZE', '500')),
+    # Long enough to fold a student's rapid successive saves into one write
+    max_delay=float(os.environ.get('AUTOSAVE_DELAY_MS', '250')) / 1000,
+    max_queue=int(os.environ.get('AUTOSAVE_QUEUE_SIZE', '10000')),
+)
+
+# Exam lifecycle
+class ExamLifecycleScheduler:
+    """Keeps ``Exam.status`` in step with the exam's start and end times.
+
+    Upcoming transitions sit in a heap ordered by time and the loop sleeps
+    until the earliest one is due, so nothing is polled. Transitions are
+    conditional updates, so with several workers each one is applied, and
+    its finish hooks run, exactly once. Transitions missed while no worker
+    was running are caught up in the background, ``catch_up_concurrency``
+    at a time, so startup does not wait for them.
+    """
+
+    # Statuses a transition may move an exam out of
+    TRANSITIONS_FROM = {"live": ["upcoming"], "finished": ["upcoming", "live"]}
+
+    def __init__(self, catch_up_concurrency: int = 4):
+        self.catch_up_concurrency = catch_up_concurrency
+        self.finish_hooks: List[Any] = []
+        self._heap: List[tuple] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, exam: Dict[str, Any]) -> None:
+        start = parse_exam_time(exam.get("startTime"))
+        end = parse_exam_time(exam.get("endTime"))
+        if start is None or end is None:
+            return
+        now = datetime.now(timezone.utc)
+        earliest = self._heap[0][0] if self._heap else None
+        for when, status in ((start, "live"), (end, "finished")):
+            if when > now:
+                heapq.heappush(self._heap, (when, exam["id"], status))
+        if self._wake is not None and self._heap and self._heap[0][0] != earliest:
+            self._wake.set()
+
+    async def start(self) -> None:
+        self._wake = asyncio.Event()
+        overdue = await self._reconcile()
+        self._task = asyncio.create_task(self._run(overdue))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile(self) -> List[tuple]:
+        # Schedule the upcoming transitions and return those already overdue
+        now = datetime.now(timezone.utc)
+        overdue = []
+        async for exam in db.exams.find(
+            {"status": {"$ne": "finished"}}, {"_id": 0, "id": 1, "startTime": 1, "endTime": 1, "status": 1}
+        ):
+            start = parse_exam_time(exam.get("startTime"))
+            end = parse_exam_time(exam.get("endTime"))
+            if start is None or end is None:
+                continue
+            status = exam_status_at(start, end, now)
+            if status != exam.get("status") and status != "upcoming":
+                overdue.append((exam["id"], status))
+            self.schedule(exam)
+        return overdue
+
+    async def _catch_up(self, overdue: List[tuple]) -> None:
+        semaphore = asyncio.Semaphore(self.catch_up_concurrency)
+
+        async def transition(exam_id: str, status: str) -> None:
+            async with semaphore:
+                await self._apply(exam_id, status)
+
+        await asyncio.gather(*(transition(exam_id, status) for exam_id, status in overdue))
+
+    async def _run(self, overdue: List[tuple]) -> None:
+        await self._catch_up(overdue)
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = (self._heap[0][0] - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            _, exam_id, status = heapq.heappop(self._heap)
+            await self._apply(exam_id, status)
+
+    async def _apply(self, exam_id: str, status: str) -> None:
+        try:
+            await self._transition(exam_id, status)
+        except Exception:
+            logger.exception("Could not move exam %s to %s", exam_id, status)
+
+    async def _transition(self, exam_id: str, status: str) -> None:
+        result = await db.exams.update_one(
+            {"id": exam_id, "status": {"$in": self.TRANSITIONS_FROM[status]}},
+            {"$set": {"status": status}},
+        )
+        if result.modified_count == 0:
+            # Deleted, rescheduled or already moved by another worker
+            return
+        exam_cache.invalidate(exam_id)
+        if LIVE_EVENTS_SOURCE == "local":
+            event_broker.publish("status", {"examId": exam_id, "status": status})
+        if status == "finished":
+            for hook in self.finish_hooks:
+                try:
+                    await hook(exam_id)
+                except Exception:
+                    logger.exception("Finish hook %s failed for exam %s", hook.__name__, exam_id)
+
+exam_scheduler = ExamLifecycleScheduler(
+    catch_up_concurrency=int(os.environ.get('EXAM_CATCH_UP_CONCURRENCY', '4')),
+)
+
+# Trusted document encoding
+def _nested_model(annotation):
+    # Model, List[Model] or Optional[...] of either -> (model, is_list)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if origin in (list, List) and args:
+        nested, _ = _nested_model(args[0])
+        return nested, True
+    if origin is Union and len(args) == 1:
+        return _nested_model(args[0])
+    return None, False
+
+_document_shapes: Dict[type, List[tuple]] = {}
+
+def document_shape(model) -> List[tuple]:
+    shape = _document_shapes.get(model)
+    if shape is None:
+        shape = []
+        for name, field in model.model_fields.items():
+            default = None if field.default is PydanticUndefined else field.default
+            nested, is_list = _nested_model(field.annotation)
+            shape.append((field.alias or name, default, document_shape(nested) if nested else None, is_list))
+        _document_shapes[model] = shape
+    return shape
+
+def _shape_document(document: Dict[str, Any], shape: List[tuple]) -> Dict[str, Any]:
+    shaped = {}
+    for key, default, nested, is_list in shape:
+        value = document.get(key, default)
+        if nested is not None and value is not None:
+            value = [_shape_document(item, nested) for item in value] if is_list else _shape_document(value, nested)
+        shaped[key] = value
+    return shaped
+
+def encode_trusted(document: Dict[str, Any], model) -> bytes:
+    """Encode a document read from our own database in ``model``'s JSON shape.
+
+    Documents we wrote ourselves were validated on the way in, so instead of
+    building a model per row this only picks the model's fields by their
+    aliases (``pass``, ``class``), fills missing defaults and drops anything
+    else such as ``_id``, then encodes with orjson.
+    """
+    return orjson.dumps(_shape_document(document, document_shape(model)))
+
+def pack_trusted(document: Dict[str, Any], model) -> bytes:
+    # encode_trusted for MessagePack responses
+    return msgpack.packb(_shape_document(document, document_shape(model)))
+
+def trusted_json_response(content: Any, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(content=orjson.dumps(content), media_type="application/json", headers=headers)
+
+# List pagination and streaming
+STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', '500'))
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def wants_msgpack(request: Request) -> bool:
+    # Opt-in only, and only offered when msgpack is installed
+    accept = request.headers.get("accept", "")
+    return msgpack is not None and (MSGPACK_MEDIA_TYPE in accept or "application/x-msgpack" in accept)
+
+def list_media_type(request: Request) -> str:
+    if wants_msgpack(request):
+        return MSGPACK_MEDIA_TYPE
+    return NDJSON_MEDIA_TYPE if wants_ndjson(request) else "application/json"
+
+def keyset_query(query: Dict[str, Any], after: Optional[str]) -> Dict[str, Any]:
+    if after is None:
+        return query
+    try:
+        return {**query, "_id": {"$gt": ObjectId(after)}}
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def stream_documents(cursor, model, media_type: str):
+    # One batch of documents in memory at a time
+    if media_type == MSGPACK_MEDIA_TYPE:
+        async for document in cursor:
+            yield pack_trusted(document, model)
+        return
+    ndjson = media_type == NDJSON_MEDIA_TYPE
+    first = True
+    if not ndjson:
+        yield b"["
+    async for document in cursor:
+        item = encode_trusted(document, model)
+        if ndjson:
+            yield item + b"\n"
+        else:
+            yield item if first else b"," + item
+        first = False
+    if not ndjson:
+        yield b"]"
+
+async def list_response(request: Request, collection, query: Dict[str, Any], model,
+                        after: Optional[str], limit: Optional[int],
+                        projection: Optional[Dict[str, Any]] = None) -> Response:
+    """Serve a collection query as a keyset page or a full streamed listing.
+
+    With ``limit`` a single page ordered by ``_id`` is returned and, when more
+    rows may follow, the cursor for the next page is sent in ``X-Next-Cursor``.
+    Without it every matching document is streamed from the Motor cursor.
+    Either way the body is a JSON array, or NDJSON when the client asks for it.
+    With MessagePack a page is one packed array, while a full listing is a
+    stream of one packed object per document, read with ``msgpack.Unpacker``.
+    A ``projection`` keeps unneeded fields from being read at all.
+    """
+    cursor = collection.find(keyset_query(query, after), projection).sort("_id", 1)
+    if limit is None:
+        return stream_response(request, cursor.batch_size(STREAM_BATCH_SIZE), model)
+    return page_response(request, await cursor.limit(limit).to_list(limit), model, limit)
+
+def stream_response(request: Request, documents, model) -> StreamingResponse:
+    media_type = list_media_type(request)
+    return StreamingResponse(
+        stream_documents(documents, model, media_type), media_type=media_type, headers={"Vary": "Accept"}
+    )
+
+def page_response(request: Request, documents: List[Dict[str, Any]], model, limit: int) -> Response:
+    # One keyset page of documents ordered by ``_id``
+    media_type = list_media_type(request)
+    headers = {"Vary": "Accept"}
+    if len(documents) == limit:
+        headers["X-Next-Cursor"] = str(documents[-1]["_id"])
+    if media_type == MSGPACK_MEDIA_TYPE:
+        shape = document_shape(model)
+        body = msgpack.packb([_shape_document(document, shape) for document in documents])
+    elif media_type == NDJSON_MEDIA_TYPE:
+        body = b"".join(encode_trusted(document, model) + b"\n" for document in documents)
+    else:
+        body = b"[" + b",".join(encode_trusted(document, model) for document in documents) + b"]"
+    return Response(content=body, media_type=media_type, headers=headers)
+
+# Response compression
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+# Brotli's default quality of 11 is meant for static assets, not per-request work
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '4'))
+# Already compressed, or (event streams) must reach the client unbuffered
+UNCOMPRESSED_MEDIA_TYPES = ("image/", "text/event-stream", "application/zip", "application/gzip")
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/ prefixes are ignored, and
+    # the header may list several tags or be "*"
+    if not if_none_match:
+        return False
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+def weaken_etag(headers: MutableHeaders) -> None:
+    # The bytes differ per content coding, so one strong validator must not
+    # cover them all; the weak form still revalidates through etag_matches
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = "W/" + etag
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """The content coding to answer with: brotli, gzip or None for identity."""
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip().lower()] = weight
+    wildcard = weights.get("*", 0.0)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    # Ties go to brotli, which is smaller at similar cost
+    best = max(candidates, key=lambda coding: weights.get(coding, wildcard))
+    return best if weights.get(best, wildcard) > 0 else None
+
+class _Compressor:
+    def __init__(self, coding: str):
+        if coding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self._finish = self._compressor.process, self._compressor.finish
+        else:
+            # wbits 31 writes the gzip header and trailer
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+            self.compress, self._finish = self._compressor.compress, self._compressor.flush
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+class CompressionMiddleware:
+    """ASGI middleware compressing responses with brotli or gzip as the client accepts.
+
+    Complete bodies under ``minimum_size`` bytes are sent as they are, since
+    the coding overhead outweighs the saving there; streamed bodies are
+    compressed as they are produced. ETags of negotiated responses, 304s
+    included, are made weak.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        coding = choose_encoding(Headers(scope=scope).get("accept-encoding", "")) if scope["type"] == "http" else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body part tells whether to compress
+                start = message
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                headers = MutableHeaders(raw=start["headers"])
+                media_type = headers.get("content-type", "")
+                if start["status"] == 304:
+                    # Answers for whichever coding the client holds
+                    weaken_etag(headers)
+                if ("content-encoding" in headers or media_type.startswith(UNCOMPRESSED_MEDIA_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(coding)
+                headers["Content-Encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                weaken_etag(headers)
+                del headers["Content-Length"]
+                body = compressor.compress(body)
+                if not more_body:
+                    body += compressor.finish()
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+                return
+
+            body = compressor.compress(body)
+            if not more_body:
+                body += compressor.finish()
+            # The compressor may still be holding everything back
+            if body or not more_body:
+                await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+# Content-addressed image store
+IMAGE_BUCKET = "images"
+IMAGE_URL_PREFIX = "/api/images/"
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(5 * 1024 * 1024)))
+
+def image_bucket() -> AsyncIOMotorGridFSBucket:
+    return AsyncIOMotorGridFSBucket(db, bucket_name=IMAGE_BUCKET)
+
+# Formats served as uploaded, by their leading bytes. SVG is left out on
+# purpose: it can carry script that runs when the image is opened directly.
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+]
+IMAGE_TYPES = {content_type for _, content_type in IMAGE_SIGNATURES} | {"image/webp"}
+
+def sniff_image_type(data: bytes) -> str:
+    # The declared type is the client's word; the bytes decide
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    raise HTTPException(status_code=415, detail="Unsupported image type, use PNG, JPEG, GIF or WebP")
+
+def decode_data_url(data_url: str) -> bytes:
+    # data:<mime>;base64,<payload> as produced by FileReader.readAsDataURL
+    header, _, payload = data_url.partition(",")
+    if not header.startswith("data:") or not header.endswith(";base64"):
+        raise HTTPException(status_code=400, detail="Unsupported image data URL")
+    try:
+        return base64.b64decode(payload, validate=True)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid image data")
+
+async def store_image(data: bytes) -> str:
+    """Store image bytes under their SHA-256 and return the image URL.
+
+    Only the formats in IMAGE_TYPES are accepted. Uploading the same bytes
+    twice returns the existing reference.
+    """
+    if len(data) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Image too large")
+    content_type = sniff_image_type(data)
+    digest = hashlib.sha256(data).hexdigest()
+    existing = await db[f"{IMAGE_BUCKET}.files"].find_one({"filename": digest}, {"_id": 1})
+    if existing is None:
+        file_id = ObjectId()
+        try:
+            await image_bucket().upload_from_stream_with_id(
+                file_id, digest, data, metadata={"contentType": content_type}
+            )
+        except DuplicateKeyError:
+            # A concurrent upload of the same bytes won the unique filename;
+            # its copy is kept and the chunks written for this one dropped
+            await db[f"{IMAGE_BUCKET}.chunks"].delete_many({"files_id": file_id})
+    return IMAGE_URL_PREFIX + digest
+
+async def externalize_question_images(questions: List[Dict[str, Any]]) -> bool:
+    # Replace inline data URLs with image store references, in place
+    changed = False
+    for question in questions:
+        image_url = question.get("imageUrl")
+        if image_url and image_url.startswith("data:"):
+            question["imageUrl"] = await store_image(decode_data_url(image_url))
+            changed = True
+    return changed
+
+async def migrate_inline_images() -> int:
+    """Move base64 images of existing exams into the image store."""
+    migrated = 0
+    async for exam in db.exams.find(
+        {"questions.imageUrl": {"$regex": "^data:"}}, {"_id": 0, "id": 1, "questions": 1}
+    ):
+        try:
+            changed = await externalize_question_images(exam["questions"])
+        except HTTPException as exc:
+            # E.g. an SVG; the exam keeps its inline images
+            logger.warning("Skipping images of exam %s: %s", exam["id"], exc.detail)
+            continue
+        if changed:
+            await db.exams.update_one({"id": exam["id"]}, {"$set": {"questions": exam["questions"]}})
+            exam_cache.invalidate(exam["id"])
+            migrated += 1
+    return migrated
+
+# Bulk writes and background jobs
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', '10000'))
+BULK_JOB_THRESHOLD = int(os.environ.get('BULK_JOB_THRESHOLD', '5000'))
+BULK_JOB_BATCH_SIZE = int(os.environ.get('BULK_JOB_BATCH_SIZE', '1000'))
+
+def check_bulk_size(*item_lists) -> None:
+    if sum(len(items) for items in item_lists) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} items per request")
+
+async def existing_ids(collection, field: str, values: List[str]) -> set:
+    if not values:
+        return set()
+    documents = await collection.find({field: {"$in": values}}, {"_id": 0, field: 1}).to_list(None)
+    return {document[field] for document in documents}
+
+async def apply_bulk(collection, items: List[tuple]) -> List[BulkItemResult]:
+    """Run (op, id, write) items as one unordered bulk_write with per-item results.
+
+    Items whose write is None have already failed and are reported as such.
+    """
+    results = [
+        BulkItemResult(op=op, id=item_id, ok=write is not None, error=None if write is not None else "Not found")
+        for op, item_id, write in items
+    ]
+    positions = [index for index, (_, _, write) in enumerate(items) if write is not None]
+    if not positions:
+        return results
+    try:
+        await collection.bulk_write([items[index][2] for index in positions], ordered=False)
+    except BulkWriteError as exc:
+        for error in exc.details.get("writeErrors", []):
+            result = results[positions[error["index"]]]
+            result.ok = False
+            result.error = "Already exists" if error["code"] == 11000 else error.get("errmsg", "Write failed")
+    return results
+
+background_jobs: set = set()
+
+async def start_job(job_type: str, total: int, work) -> str:
+    """Run ``work(job_id)`` in the background and track its progress in ``db.jobs``."""
+    job_id = str(uuid.uuid4())
+    await db.jobs.insert_one({
+        "id": job_id,
+        "type": job_type,
+        "status": "running",
+        "total": total,
+        "processed": 0,
+        "error": None,
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+    })
+
+    async def run():
+        try:
+            await work(job_id)
+            await db.jobs.update_one({"id": job_id}, {"$set": {"status": "done"}})
+        except Exception as exc:
+            logger.exception("Background job %s (%s) failed", job_id, job_type)
+            await db.jobs.update_one({"id": job_id}, {"$set": {"status": "failed", "error": str(exc)}})
+
+    task = contextvars.Context().run(asyncio.get_running_loop().create_task, run())
+    # Keep a reference so the task isn't garbage collected mid-run
+    background_jobs.add(task)
+    task.add_done_callback(background_jobs.discard)
+    return job_id
+
+async def delete_in_batches(collection, query: Dict[str, Any], job_id: Optional[str] = None) -> None:
+    while True:
+        batch = await collection.find(query, {"_id": 1}).limit(BULK_JOB_BATCH_SIZE).to_list(BULK_JOB_BATCH_SIZE)
+        if not batch:
+            return
+        result = await collection.delete_many({"_id": {"$in": [document["_id"] for document in batch]}})
+        if job_id:
+            await db.jobs.update_one({"id": job_id}, {"$inc": {"processed": result.deleted_count}})
+
+async def update_in_batches(collection, query: Dict[str, Any], update: Dict[str, Any],
+                            job_id: Optional[str] = None) -> None:
+    # The update must take documents out of ``query`` or this never ends
+    while True:
+        batch = await collection.find(query, {"_id": 1}).limit(BULK_JOB_BATCH_SIZE).to_list(BULK_JOB_BATCH_SIZE)
+        if not batch:
+            return
+        result = await collection.update_many({"_id": {"$in": [document["_id"] for document in batch]}}, update)
+        if job_id:
+            await db.jobs.update_one({"id": job_id}, {"$inc": {"processed": result.modified_count}})
+
+async def delete_exam_submissions(exam_ids: List[str]) -> Optional[str]:
+    # Small deletes run inline; large ones become a batched background job
+    query = {"examId": {"$in": exam_ids}}
+    await db.submission_archives.delete_many(query)
+    await db.archive_summaries.delete_many(query)
+    total = await db.submissions.count_documents(query)
+    if total <= BULK_JOB_THRESHOLD:
+        await db.submissions.delete_many(query)
+        return None
+    return await start_job(
+        "delete-submissions", total, lambda job_id: delete_in_batches(db.submissions, query, job_id)
+    )
+
+# CSV import and export
+CSV_CHUNK_SIZE = int(os.environ.get('CSV_CHUNK_SIZE', str(64 * 1024)))
+CSV_IMPORT_BATCH_SIZE = int(os.environ.get('CSV_IMPORT_BATCH_SIZE', '500'))
+CSV_IMPORT_MAX_BYTES = int(os.environ.get('CSV_IMPORT_MAX_BYTES', str(20 * 1024 * 1024)))
+CSV_IMPORT_MAX_ERRORS = int(os.environ.get('CSV_IMPORT_MAX_ERRORS', '1000'))
+CSV_MEDIA_TYPE = "text/csv; charset=utf-8"
+# Exported without passwords; re-importing the file updates the students by id
+STUDENT_CSV_COLUMNS = ["id", "name", "surname", "email", "group", "class", "parentContact", "status"]
+STUDENT_CSV_REQUIRED = {"name", "surname", "email", "pass", "group", "class", "parentContact"}
+# Leading characters that make spreadsheet applications evaluate a cell
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+async def csv_records(upload: UploadFile):
+    """Yield the raw records of an uploaded CSV, reading it CSV_CHUNK_SIZE bytes at a time.
+
+    A record ends at a newline outside quotes, so quoted values may span lines.
+    A UTF-8 byte order mark, as spreadsheet applications write it, is dropped.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    scanned = quotes = received = 0
+    while True:
+        chunk = await upload.read(CSV_CHUNK_SIZE)
+        received += len(chunk)
+        if received > CSV_IMPORT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="File too large")
+        try:
+            buffer += decoder.decode(chunk, final=not chunk)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="File is not UTF-8 encoded")
+        while True:
+            newline = buffer.find("\n", scanned)
+            if newline == -1:
+                break
+            quotes += buffer.count('"', scanned, newline + 1)
+            scanned = newline + 1
+            if quotes % 2 == 0:
+                yield buffer[:scanned]
+                buffer = buffer[scanned:]
+                scanned = quotes = 0
+        if not chunk:
+            if buffer.strip():
+                yield buffer
+            return
+
+def csv_delimiter(header: str) -> str:
+    # Spreadsheet applications in some locales separate values with ";"
+    try:
+        return csv.Sniffer().sniff(header, delimiters=",;\t").delimiter
+    except csv.Error:
+        return ","
+
+def describe_validation_error(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    field = ".".join(str(part) for part in error["loc"])
+    return f"{field}: {error['msg']}" if field else error["msg"]
+
+def csv_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    # Phone numbers such as +994... stay as they are
+    if text.startswith(CSV_FORMULA_PREFIXES) and not text.lstrip("+-").isdigit():
+        return "'" + text
+    return text
+
+async def stream_csv(header: List[str], rows):
+    # Encoded and sent every STREAM_BATCH_SIZE rows; the BOM lets spreadsheet
+    # applications detect UTF-8
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write("\ufeff")
+    writer.writerow(header)
+    pending = 0
+    async for row in rows:
+        writer.writerow([csv_cell(value) for value in row])
+        pending += 1
+        if pending == STREAM_BATCH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+def csv_response(rows, header: List[str], filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_csv(header, rows),
+        media_type=CSV_MEDIA_TYPE,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+async def import_students(upload: UploadFile) -> ImportResult:
+    """Create or update the students listed in an uploaded CSV.
+
+    Records are parsed as the file is read and written CSV_IMPORT_BATCH_SIZE at
+    a time. Rows whose ``id`` matches a student update the non-empty columns;
+    every other row creates a student and needs all of them. Missing groups
+    are created. A row that fails is reported and the others are still written.
+    """
+    result = ImportResult()
+    records = csv_records(upload)
+    header_record = await anext(records, None)
+    if header_record is None:
+        raise HTTPException(status_code=400, detail="File is empty")
+    delimiter = csv_delimiter(header_record)
+    header = [column.strip() for column in next(csv.reader([header_record], delimiter=delimiter), [])]
+    missing = STUDENT_CSV_REQUIRED - set(header)
+    if "id" not in header and missing:
+        raise HTTPException(status_code=400, detail=f"Missing columns: {', '.join(sorted(missing))}")
+
+    batch = []
+    # Quoted values may span lines, so rows are numbered by the line they start on
+    line = 1 + header_record.count("\n")
+    async for record in records:
+        row, line = line, line + record.count("\n")
+        values = next(csv.reader([record], delimiter=delimiter), [])
+        if not any(value.strip() for value in values):
+            continue
+        if len(values) > len(header):
+            add_import_error(result, row, "More values than columns")
+            continue
+        batch.append((row, {column: value.strip() for column, value in zip(header, values) if value.strip()}))
+        if len(batch) == CSV_IMPORT_BATCH_SIZE:
+            await import_student_batch(batch, result)
+            batch = []
+    if batch:
+        await import_student_batch(batch, result)
+    result.errors.sort(key=lambda error: error.row)
+    return result
+
+def add_import_error(result: ImportResult, row: int, error: str) -> None:
+    result.failed += 1
+    if len(result.errors) < CSV_IMPORT_MAX_ERRORS:
+        result.errors.append(ImportRowError(row=row, error=error))
+
+async def import_student_batch(batch: List[tuple], result: ImportResult) -> None:
+    found = await existing_ids(db.students, "id", [values["id"] for _, values in batch if "id" in values])
+    creates, updates = [], []
+    for row, values in batch:
+        try:
+            if values.get("id") in found:
+                changes = StudentPatch(**values).dict(by_alias=True, exclude_none=True)
+                if changes:
+                    updates.append((row, values["id"], changes))
+            else:
+                creates.append((row, Student(**values)))
+        except ValidationError as exc:
+            add_import_error(result, row, describe_validation_error(exc))
+
+    hashed = await password_hasher.hash_many(
+        [student.pass_ for _, student in creates] + [changes["pass"] for _, _, changes in updates if "pass" in changes]
+    )
+    passwords = iter(hashed)
+    for _, student in creates:
+        student.pass_ = next(passwords)
+    for _, _, changes in updates:
+        if "pass" in changes:
+            changes["pass"] = next(passwords)
+
+    groups = {student.group for _, student in creates}
+    groups |= {changes["group"] for _, _, changes in updates if "group" in changes}
+    new_groups = groups - await existing_ids(db.groups, "name", list(groups))
+    if new_groups:
+        # Another import may create the same group meanwhile; either copy will do
+        await apply_bulk(db.groups, [("create", name, InsertOne(Group(name=name).dict())) for name in new_groups])
+
+    rows = [row for row, _ in creates] + [row for row, _, _ in updates]
+    items = [("create", student.id, InsertOne(student.dict(by_alias=True))) for _, student in creates]
+    items += [("update", student_id, UpdateOne({"id": student_id}, {"$set": changes})) for _, student_id, changes in updates]
+    for row, item in zip(rows, await apply_bulk(db.students, items)):
+        if not item.ok:
+            add_import_error(result, row, item.error)
+        elif item.op == "create":
+            result.imported += 1
+        else:
+            result.updated += 1
+            login_cache.invalidate_student(item.id)
+            session_tokens.revoke_student(item.id)
+
+async def student_csv_rows(cursor):
+    async for student in cursor:
+        yield [student.get(column) for column in STUDENT_CSV_COLUMNS]
+
+def exam_result_columns(questions_count: int) -> List[str]:
+    return ["studentId", "name", "surname", "group", "class", "score", "submittedAt", "cheatingDetected"] + [
+        f"Q{index + 1}" for index in range(questions_count)
+    ]
+
+async def exam_result_rows(submissions, questions_count: int):
+    # Students are looked up once per batch of submissions
+    async def rows(submissions):
+        students = await db.students.find(
+            {"id": {"$in": [submission["studentId"] for submission in submissions]}},
+            {"_id": 0, "id": 1, "name": 1, "surname": 1, "group": 1, "class": 1},
+        ).to_list(None)
+        by_id = {student["id"]: student for student in students}
+        for submission in submissions:
+            student = by_id.get(submission["studentId"], {})
+            answers = submission.get("answers") or {}
+            yield [
+                submission["studentId"], student.get("name"), student.get("surname"), student.get("group"),
+                student.get("class"), submission.get("score"), submission.get("submittedAt"),
+                "yes" if submission.get("cheatingDetected") else "no",
+            ] + [answers.get(str(index)) for index in range(questions_count)]
+
+    batch = []
+    async for submission in submissions:
+        batch.append(submission)
+        if len(batch) == STREAM_BATCH_SIZE:
+            async for row in rows(batch):
+                yield row
+            batch = []
+    if batch:
+        async for row in rows(batch):
+            yield row
+
+# Submission archive
+# Submissions of exams that ended long ago move out of ``submissions`` into
+# ``submission_archives``: per exam, documents of up to ARCHIVE_PART_SIZE
+# submissions packed as zlib-compressed JSON. Reads of one exam's results
+# unpack them on demand. The student's exam list reads ``archive_summaries``
+# instead, one small document per archived submission indexed on
+# ``studentId``. The hot collection and its indexes only hold recent terms.
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_PART_SIZE = int(os.environ.get('ARCHIVE_PART_SIZE', '5000'))
+ARCHIVE_COMPRESSION_LEVEL = int(os.environ.get('ARCHIVE_COMPRESSION_LEVEL', '6'))
+ARCHIVE_SUMMARY_FIELDS = ["id", "studentId", "submittedAt", "cheatingDetected", "score"]
+
+def pack_archive_part(exam_id: str, part: int, submissions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "examId": exam_id,
+        "part": part,
+        "count": len(submissions),
+        "data": zlib.compress(orjson.dumps(submissions), ARCHIVE_COMPRESSION_LEVEL),
+    }
+
+def archive_summary(exam_id: str, submission: Dict[str, Any]) -> Dict[str, Any]:
+    return {"examId": exam_id, **{field: submission.get(field) for field in ARCHIVE_SUMMARY_FIELDS}}
+
+def unpack_archive_part(part: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # ``_id`` is kept as its hex string, which sorts like the ObjectId
+    return orjson.loads(zlib.decompress(part["data"]))
+
+async def archived_submissions(exam_id: str, after: Optional[str] = None):
+    """Yield an exam's archived submissions in ``_id`` order, one part in memory at a time."""
+    async for part in db.submission_archives.find({"examId": exam_id}, {"_id": 0, "data": 1}).sort("part", 1):
+        for submission in await asyncio.to_thread(unpack_archive_part, part):
+            if after is None or submission["_id"] > after:
+                yield submission
+
+async def is_archived(exam_id: str) -> bool:
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "archived": 1})
+    return bool(exam and exam.get("archived"))
+
+async def finished_exam_submissions(exam_id: str, fields: List[str]):
+    # Archived and hot submissions alike; an exam is only in one of them
+    # except while it is being archived or restored
+    seen = set()
+    async for submission in db.submissions.find(
+        {"examId": exam_id, **FINISHED_SUBMISSIONS}, {"_id": 0, "id": 1, **{field: 1 for field in fields}}
+    ).batch_size(STREAM_BATCH_SIZE):
+        seen.add(submission["id"])
+        yield submission
+    async for submission in archived_submissions(exam_id):
+        if submission["id"] not in seen:
+            yield {field: submission.get(field) for field in ["id", *fields]}
+
+async def write_archive_part(exam_id: str, number: int, submissions: List[Dict[str, Any]]) -> None:
+    # Archive one part, then its summaries, and only then drop the hot copies
+    part = await asyncio.to_thread(pack_archive_part, exam_id, number, submissions)
+    await db.submission_archives.replace_one({"examId": exam_id, "part": number}, part, upsert=True)
+    for start in range(0, len(submissions), BULK_JOB_BATCH_SIZE):
+        await db.archive_summaries.bulk_write([
+            ReplaceOne(
+                {"examId": exam_id, "studentId": submission["studentId"]},
+                archive_summary(exam_id, submission),
+                upsert=True,
+            )
+            for submission in submissions[start:start + BULK_JOB_BATCH_SIZE]
+        ], ordered=False)
+    await db.submissions.delete_many({"_id": {"$in": [ObjectId(submission["_id"]) for submission in submissions]}})
+
+async def archive_exam_submissions(exam_id: str) -> int:
+    """Move an exam's finished submissions into its archive and return how many moved.
+
+    Hot submissions are streamed in ``_id`` order and appended as new parts
+    after the last archived ``_id``, so existing parts are never rewritten
+    and at most one part is held in memory. Each part is written before its
+    submissions are deleted; hot copies of the last part left behind by an
+    interrupted run are deleted on the next one.
+    """
+    query: Dict[str, Any] = {"examId": exam_id, **FINISHED_SUBMISSIONS}
+    next_part = 0
+    last = await db.submission_archives.find_one(
+        {"examId": exam_id}, {"_id": 0, "part": 1, "data": 1}, sort=[("part", -1)],
+    )
+    if last is not None:
+        next_part = last["part"] + 1
+        last_part = await asyncio.to_thread(unpack_archive_part, last)
+        last_id = ObjectId(last_part[-1]["_id"])
+        in_last_part = {submission["id"] for submission in last_part}
+        leftovers = await db.submissions.find(
+            {**query, "_id": {"$lte": last_id}}, {"_id": 1, "id": 1},
+        ).to_list(None)
+        archived = [submission["_id"] for submission in leftovers if submission["id"] in in_last_part]
+        if archived:
+            await db.submissions.delete_many({"_id": {"$in": archived}})
+        if len(archived) < len(leftovers):
+            # Not in the archive, so they stay hot; results read both
+            logger.warning("Exam %s has %d submissions older than its archive", exam_id, len(leftovers) - len(archived))
+        query["_id"] = {"$gt": last_id}
+
+    moved = 0
+    batch: List[Dict[str, Any]] = []
+    async for submission in db.submissions.find(query).sort("_id", 1).batch_size(STREAM_BATCH_SIZE):
+        batch.append({**submission, "_id": str(submission["_id"])})
+        if len(batch) == ARCHIVE_PART_SIZE:
+            await write_archive_part(exam_id, next_part, batch)
+            next_part += 1
+            moved += len(batch)
+            batch = []
+    if batch:
+        await write_archive_part(exam_id, next_part, batch)
+        moved += len(batch)
+    await db.exams.update_one(
+        {"id": exam_id}, {"$set": {"archived": True, "archivedAt": datetime.now(timezone.utc).isoformat()}}
+    )
+    return moved
+
+async def restore_exam_submissions(exam_id: str) -> int:
+    """Move an exam's archived submissions back into ``submissions``."""
+    restored = [
+        {**submission, "_id": ObjectId(submission["_id"])} async for submission in archived_submissions(exam_id)
+    ]
+    for start in range(0, len(restored), BULK_JOB_BATCH_SIZE):
+        try:
+            await db.submissions.insert_many(restored[start:start + BULK_JOB_BATCH_SIZE], ordered=False)
+        except BulkWriteError as exc:
+            # Left behind by an interrupted archive run
+            if any(error["code"] != 11000 for error in exc.details.get("writeErrors", [])):
+                raise
+    await db.exams.update_one({"id": exam_id}, {"$unset": {"archived": "", "archivedAt": ""}})
+    await db.submission_archives.delete_many({"examId": exam_id})
+    await db.archive_summaries.delete_many({"examId": exam_id})
+    return len(restored)
+
+async def archivable_exams(older_than_days: int) -> List[str]:
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    exams = await db.exams.find(
+        {"status": "finished", "archived": {"$ne": True}}, {"_id": 0, "id": 1, "endTime": 1}
+    ).to_list(None)
+    archivable = []
+    for exam in exams:
+        end = parse_exam_time(exam.get("endTime"))
+        if end is not None and end < cutoff:
+            archivable.append(exam["id"])
+    return archivable
+
+async def archive_finished_exams(exam_ids: List[str], job_id: Optional[str] = None) -> None:
+    for exam_id in exam_ids:
+        moved = await archive_exam_submissions(exam_id)
+        logger.info("Archived %d submissions of exam %s", moved, exam_id)
+        if job_id:
+            await db.jobs.update_one({"id": job_id}, {"$inc": {"processed": 1}})
+
+# Password hashing
+password_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__rounds=int(os.environ.get('PASSWORD_HASH_ROUNDS', '29000')),
+)
+
+def is_password_hash(value: str) -> bool:
+    return password_context.identify(value, required=False) is not None
+
+class PasswordHasher:
+    """Hashes and verifies passwords in a bounded thread pool.
+
+    A single hash takes tens of milliseconds of CPU, so it never runs on the
+    event loop. At most ``max_workers`` run at once, ``max_pending`` more may
+    queue behind them, and anything beyond that is turned away with a 503
+    rather than letting a login storm pile up unbounded work.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 256):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._queued = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads don't survive fork(), so each worker process gets its own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="password-hash")
+            self._pid = os.getpid()
+        return self._executor
+
+    async def _run(self, function, *args):
+        if self._queued >= self.max_workers + self.max_pending:
+            raise HTTPException(
+                status_code=503,
+                detail="Too many logins, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self._queued += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool(), function, *args)
+        finally:
+            self._queued -= 1
+
+    async def hash(self, password: str) -> str:
+        # Already-hashed values pass through, so a record can be written back as read
+        if is_password_hash(password):
+            return password
+        return await self._run(password_context.hash, password)
+
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        # A pool's worth at a time, leaving room for logins in between
+        hashed: List[str] = []
+        for start in range(0, len(passwords), self.max_workers):
+            chunk = passwords[start:start + self.max_workers]
+            hashed.extend(await asyncio.gather(*(self.hash(password) for password in chunk)))
+        return hashed
+
+    async def verify(self, password: str, stored: str) -> tuple:
+        """Check ``password`` against ``stored``; returns ``(valid, replacement)``.
+
+        ``replacement`` is a new hash to store when ``stored`` is a plaintext
+        password from before hashing, or a hash with outdated parameters.
+        """
+        if not is_password_hash(stored):
+            if not hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8")):
+                return False, None
+            return True, await self.hash(password)
+        return await self._run(password_context.verify_and_update, password, stored)
+
+    def shutdown(self) -> None:
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
+
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+    max_pending=int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', '256')),
+)
+
+# Login cache
+class LoginCache:
+    """Bounded LRU of recently verified student logins.
+
+    Entries keep a digest of the password rather than the password itself and
+    expire after ``ttl`` seconds, so a changed or disabled account is picked up
+    again even without an explicit invalidation.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    @staticmethod
+    def _digest(password: str) -> bytes:
+        return hashlib.sha256(password.encode("utf-8")).digest()
+
+    def get(self, email: str, password: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        digest, expires_at, user = entry
+        if expires_at < time.monotonic() or not hmac.compare_digest(digest, self._digest(password)):
+            return None
+        self._entries.move_to_end(email)
+        return user
+
+    def put(self, email: str, password: str, user: Dict[str, Any]) -> None:
+        self._entries[email] = (self._digest(password), time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate_student(self, student_id: str) -> None:
+        for email, (_, _, user) in list(self._entries.items()):
+            if user.get("id") == student_id:
+                del self._entries[email]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+login_cache = LoginCache(
+    maxsize=int(os.environ.get('LOGIN_CACHE_SIZE', '1024')),
+    ttl=float(os.environ.get('LOGIN_CACHE_TTL', '60')),
+)
+
+# Session tokens
+class SessionTokens:
+    """Signed, stateless sessions.
+
+    A token carries the student's id, group and status, so a request is
+    authorised without reading the student back. Verified tokens are kept in
+    a small LRU so repeat requests skip even the signature check.
+
+    Revocation is an in-memory denylist of this process: single token ids
+    until they expire, and "issued before" times per student or group for
+    when an account or group changes under its open sessions.
+    """
+
+    ALGORITHM = "HS256"
+
+    def __init__(self, secret: str, ttl: float, cache_size: int = 4096):
+        self.secret = secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._verified: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._revoked_ids: Dict[str, float] = {}
+        self._revoked_before: Dict[tuple, float] = {}
+
+    def issue(self, subject: str, role: str, **claims) -> str:
+        now = time.time()
+        payload = {
+            **claims, "sub": subject, "role": role,
+            "jti": secrets.token_urlsafe(12), "iat": now, "exp": int(now + self.ttl),
+        }
+        return jwt.encode(payload, self.secret, algorithm=self.ALGORITHM)
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        claims = self._verified.get(token)
+        if claims is None:
+            try:
+                claims = jwt.decode(token, self.secret, algorithms=[self.ALGORITHM])
+            except jwt.InvalidTokenError:
+                raise HTTPException(status_code=401, detail="Invalid session")
+            self._verified[token] = claims
+            while len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+        else:
+            self._verified.move_to_end(token)
+        if claims["exp"] <= time.time() or self._is_revoked(claims):
+            self._verified.pop(token, None)
+            raise HTTPException(status_code=401, detail="Session expired")
+        return claims
+
+    def _is_revoked(self, claims: Dict[str, Any]) -> bool:
+        if claims["jti"] in self._revoked_ids:
+            return True
+        for key in (("sub", claims["sub"]), ("group", claims.get("group"))):
+            revoked_at = self._revoked_before.get(key)
+            if revoked_at is not None and claims["iat"] < revoked_at:
+                return True
+        return False
+
+    def revoke(self, claims: Dict[str, Any]) -> None:
+        self._prune()
+        self._revoked_ids[claims["jti"]] = claims["exp"]
+
+    def revoke_student(self, student_id: str) -> None:
+        self._prune()
+        self._revoked_before[("sub", student_id)] = time.time()
+
+    def revoke_group(self, group: str) -> None:
+        self._prune()
+        self._revoked_before[("group", group)] = time.time()
+
+    def _prune(self) -> None:
+        # Entries only matter while tokens they could match are unexpired
+        now = time.time()
+        self._revoked_ids = {jti: exp for jti, exp in self._revoked_ids.items() if exp > now}
+        self._revoked_before = {
+            key: revoked_at for key, revoked_at in self._revoked_before.items() if revoked_at + self.ttl > now
+        }
+
+# Required to serve; checked at startup so the maintenance scripts that
+# import this module don't need it
+SESSION_SECRET = os.environ.get('SESSION_SECRET')
+
+session_tokens = SessionTokens(
+    SESSION_SECRET,
+    ttl=float(os.environ.get('SESSION_TTL_HOURS', '12')) * 3600,
+    cache_size=int(os.environ.get('SESSION_CACHE_SIZE', '4096')),
+)
+
+def issue_student_session(user: Dict[str, Any]) -> str:
+    return session_tokens.issue(user["id"], "student", group=user["group"], status=user["status"])
+
+def current_session(authorization: Optional[str] = Header(None)) -> Dict[str, Any]:
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return session_tokens.verify(token)
+
+def require_teacher(session: Dict[str, Any] = Depends(current_session)) -> Dict[str, Any]:
+    if session["role"] != "teacher":
+        raise HTTPException(status_code=403, detail="Teacher access only")
+    return session
+
+def event_stream_session(
+    token: Optional[str] = None, authorization: Optional[str] = Header(None),
+) -> Dict[str, Any]:
+    # EventSource can't set headers, so the token may come in the query string
+    return require_teacher(current_session(authorization or (f"Bearer {token}" if token else None)))
+
+def authorize_student(session: Dict[str, Any], student_id: str) -> None:
+    if session["role"] != "student" or session["sub"] != student_id:
+        raise HTTPException(status_code=403, detail="Not allowed for this student")
+    if session.get("status") == "disabled":
+        raise HTTPException(status_code=403, detail="Account is disabled")
+
+# Exam cache
+class ExamCache:
+    """TTL/LRU cache of per-exam values, such as encoded responses, with coalesced misses.
+
+    Concurrent misses for the same exam share a single load, so a whole
+    group opening an exam at once costs one query per worker. If the task
+    doing that load is cancelled, one of its waiters takes the load over.
+
+    ``invalidate`` only reaches this worker's cache: other workers keep
+    serving their copy until it expires, so ``ttl`` is the bound on how
+    stale an exam can be after a change made elsewhere.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    async def get(self, exam_id: str, loader) -> Optional[tuple]:
+        while True:
+            entry = self._entries.get(exam_id)
+            if entry is not None and entry[0] >= time.monotonic():
+                self._entries.move_to_end(exam_id)
+                return entry[1]
+
+            pending = self._pending.get(exam_id)
+            if pending is None:
+                break
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # The loading task was cancelled, not this one: retry, and
+                # the first waiter to get here loads for the others
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[exam_id] = future
+        try:
+            value = await loader(exam_id)
+        except asyncio.CancelledError:
+            self._finish(exam_id, future)
+            future.cancel()
+            raise
+        except Exception as exc:
+            self._finish(exam_id, future)
+            future.set_exception(exc)
+            # Mark retrieved so a failure nobody else awaited is not logged
+            future.exception()
+            raise
+
+        current = self._finish(exam_id, future)
+        future.set_result(value)
+        # A load that raced an invalidation is handed out but not kept
+        if value is not None and current:
+            self._entries[exam_id] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(exam_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def _finish(self, exam_id: str, future: asyncio.Future) -> bool:
+        if self._pending.get(exam_id) is future:
+            del self._pending[exam_id]
+            return True
+        return False
+
+    def invalidate(self, exam_id: str) -> None:
+        self._entries.pop(exam_id, None)
+        self._pending.pop(exam_id, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._pending.clear()
+
+exam_cache = ExamCache(
+    maxsize=int(os.environ.get('EXAM_CACHE_SIZE', '256')),
+    ttl=float(os.environ.get('EXAM_CACHE_TTL', '30')),
+)
+
+# Invalidated by new submissions and regrades in this worker; the TTL bounds
+# how long other workers serve an older analysis
+analysis_cache = ExamCache(
+    maxsize=int(os.environ.get('ANALYSIS_CACHE_SIZE', '64')),
+    ttl=float(os.environ.get('ANALYSIS_CACHE_TTL', '300')),
+)
+
+async def load_exam_response(exam_id: str) -> Optional[tuple]:
+    exam = await db.exams.find_one({"id": exam_id})
+    if not exam:
+        return None
+    shaped = _shape_document(exam, document_shape(Exam))
+    body = orjson.dumps(shaped)
+    # The MessagePack variant is built once here rather than per request
+    packed = msgpack.packb(shaped) if msgpack is not None else None
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"', exam.get("groups", []), packed
+
+async def load_exam_analysis(exam_id: str) -> Optional[bytes]:
+    exam = await db.exams.find_one(
+        {"id": exam_id},
+        {"_id": 0, "id": 1, "pointsPerQuestion": 1, "answerKey": 1,
+         "questions.type": 1, "questions.options": 1, "questions.correctAnswer": 1},
+    )
+    if not exam:
+        return None
+    submissions = [submission async for submission in finished_exam_submissions(exam_id, ["answers"])]
+    # Keep the matrix work off the event loop
+    analysis = await asyncio.to_thread(analyze_items, exam, submissions)
+    return orjson.dumps(analysis)
+
+async def authorize_exam(session: Dict[str, Any], exam_id: str) -> tuple:
+    """Cached exam response, if the session may see this exam.
+
+    Students only get exams assigned to their group; the group comes from the
+    session and the exam's groups from the exam cache, so no query is needed.
+    """
+    cached = await exam_cache.get(exam_id, load_exam_response)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    if session["role"] == "student":
+        if session.get("status") == "disabled":
+            raise HTTPException(status_code=403, detail="Account is disabled")
+        if session.get("group") not in cached[2]:
+            raise HTTPException(status_code=403, detail="Exam is not assigned to your group")
+    return cached
 
 # Auth endpoints
 @api_router.post("/auth/login", response_model=LoginResponse)
@@ -87,29 +2421,47 @@ async def login(request: LoginRequest):
             success=True,
             userType="teacher",
             user={"name": "Dr. Anar Hüseynov", "username": "anar.huseynov"},
-            message="Giriş uğurludur"
+            message="Giriş uğurludur",
+            token=session_tokens.issue("anar.huseynov", "teacher"),
         )
     
-    # Check student credentials from localStorage data
-    # In a real app, this would check the database
-    students_data = await db.students.find().to_list(1000)
-    
-    for student_doc in students_data:
+    cached_user = login_cache.get(request.email, request.password)
+    if cached_user is not None:
+        return LoginResponse(
+            success=True,
+            userType="student",
+            user=cached_user,
+            message="Giriş uğurludur",
+            token=issue_student_session(cached_user),
+        )
+
+    # Point lookup on the indexed email field; duplicates are rare but the
+    # password still decides which one of them is logging in
+    async for student_doc in db.students.find({"email": request.email}):
         student = Student(**student_doc)
-        if student.email == request.email and student.pass_ == request.password:
-            if student.status == "disabled":
-                return LoginResponse(
-                    success=False,
-                    userType="student",
-                    user=None,
-                    message="Hesabınız deaktiv edilib."
-                )
+        valid, new_hash = await password_hasher.verify(request.password, student.pass_)
+        if not valid:
+            continue
+        if new_hash is not None:
+            # Migrate a plaintext or outdated password, unless it changed meanwhile
+            await db.students.update_one({"id": student.id, "pass": student.pass_}, {"$set": {"pass": new_hash}})
+            student.pass_ = new_hash
+        if student.status == "disabled":
             return LoginResponse(
-                success=True,
-                userType="student", 
-                user=student.dict(by_alias=True),
-                message="Giriş uğurludur"
+                success=False,
+                userType="student",
+                user=None,
+                message="Hesabınız deaktiv edilib."
             )
+        user = student.dict(by_alias=True, exclude={"pass_"})
+        login_cache.put(request.email, request.password, user)
+        return LoginResponse(
+            success=True,
+            userType="student", 
+            user=user,
+            message="Giriş uğurludur",
+            token=issue_student_session(user),
+        )
     
     return LoginResponse(
         success=False,
@@ -118,48 +2470,211 @@ async def login(request: LoginRequest):
         message="İstifadəçi adı və ya şifrə yanlışdır."
     )
 
+@api_router.post("/auth/logout")
+async def logout(session: Dict[str, Any] = Depends(current_session)):
+    session_tokens.revoke(session)
+    return {"message": "Logged out"}
+
 # Student management endpoints
-@api_router.get("/students", response_model=List[Student])
-async def get_students():
-    students = await db.students.find().to_list(1000)
-    return [Student(**student) for student in students]
+@api_router.get("/students", response_model=List[StudentProfile], dependencies=[Depends(require_teacher)])
+async def get_students(
+    request: Request,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    return await list_response(request, db.students, {}, StudentProfile, after, limit, {"pass": 0})
+
+# Submission fields shown on the student dashboard
+STUDENT_SUBMISSION_PROJECTION = {
+    "_id": 0, "examId": 1, "id": 1, "submittedAt": 1, "cheatingDetected": 1, "score": 1,
+}
+
+async def load_student_exams(student_id: str) -> Optional[Dict[str, Any]]:
+    """The student's group exams, submissions and archived submissions.
+
+    One aggregation joins them on indexed fields. ``$lookup`` with both
+    ``localField`` and ``pipeline`` needs MongoDB 5.0+; older servers (and
+    mongomock) reject it, and then the same data is read with one indexed
+    query per collection. Returns None when the student does not exist.
+    """
+    try:
+        results = await db.students.aggregate([
+            {"$match": {"id": student_id}},
+            {"$project": {"_id": 0, "id": 1, "group": 1}},
+            {"$lookup": {
+                "from": "exams",
+                "localField": "group",
+                "foreignField": "groups",
+                "pipeline": [{"$project": {**EXAM_SUMMARY_PROJECTION, "_id": 0}}],
+                "as": "exams",
+            }},
+            {"$lookup": {
+                "from": "submissions",
+                "localField": "id",
+                "foreignField": "studentId",
+                "pipeline": [{"$match": FINISHED_SUBMISSIONS}, {"$project": STUDENT_SUBMISSION_PROJECTION}],
+                "as": "submissions",
+            }},
+            {"$lookup": {
+                "from": "archive_summaries",
+                "localField": "id",
+                "foreignField": "studentId",
+                "pipeline": [{"$project": {"_id": 0}}],
+                "as": "archivedSubmissions",
+            }},
+        ]).to_list(1)
+    except (OperationFailure, NotImplementedError):
+        student = await db.students.find_one({"id": student_id}, {"_id": 0, "id": 1, "group": 1})
+        if student is None:
+            return None
+        exams, submissions, archived = await asyncio.gather(
+            db.exams.find({"groups": student["group"]}, {**EXAM_SUMMARY_PROJECTION, "_id": 0}).to_list(None),
+            db.submissions.find({"studentId": student_id, **FINISHED_SUBMISSIONS},
+                                STUDENT_SUBMISSION_PROJECTION).to_list(None),
+            db.archive_summaries.find({"studentId": student_id}, {"_id": 0}).to_list(None),
+        )
+        return {**student, "exams": exams, "submissions": submissions, "archivedSubmissions": archived}
+    return results[0] if results else None
+
+@api_router.get("/students/{student_id}/exams", response_model=List[StudentExam])
+async def get_student_exams(student_id: str, session: Dict[str, Any] = Depends(current_session)):
+    authorize_student(session, student_id)
+    student = await load_student_exams(student_id)
+    if student is None:
+        raise HTTPException(status_code=404, detail="Student not found")
 
-@api_router.post("/students", response_model=Student)
+    submissions_by_exam = {
+        submission["examId"]: submission
+        for submission in student["archivedSubmissions"] + student["submissions"]
+    }
+    shape = document_shape(StudentExam)
+    return trusted_json_response([
+        _shape_document({**exam, "submission": submissions_by_exam.get(exam["id"])}, shape)
+        for exam in student["exams"]
+    ])
+
+@api_router.post("/students", response_model=StudentProfile, dependencies=[Depends(require_teacher)])
 async def create_student(student: Student):
+    student.pass_ = await password_hasher.hash(student.pass_)
     student_dict = student.dict(by_alias=True)
     await db.students.insert_one(student_dict)
     return student
 
-@api_router.put("/students/{student_id}", response_model=Student)
-async def update_student(student_id: str, student: Student):
-    student_dict = student.dict(by_alias=True)
-    await db.students.replace_one({"id": student_id}, student_dict)
+@api_router.put("/students/{student_id}", response_model=StudentProfile, dependencies=[Depends(require_teacher)])
+async def update_student(student_id: str, student: StudentEdit):
+    student_dict = student.dict(by_alias=True, exclude={"pass_"})
+    if student.pass_:
+        student_dict["pass"] = await password_hasher.hash(student.pass_)
+    await db.students.update_one({"id": student_id}, {"$set": student_dict})
+    login_cache.invalidate_student(student_id)
+    session_tokens.revoke_student(student_id)
     return student
 
-@api_router.delete("/students/{student_id}")
+@api_router.post("/students/bulk", response_model=List[BulkItemResult], dependencies=[Depends(require_teacher)])
+async def bulk_students(request: StudentBulkRequest):
+    check_bulk_size(request.create, request.update, request.delete)
+    found = await existing_ids(
+        db.students, "id", [update.id for update in request.update] + request.delete
+    )
+
+    hashed = await password_hasher.hash_many([student.pass_ for student in request.create])
+    for student, password in zip(request.create, hashed):
+        student.pass_ = password
+    items = [("create", student.id, InsertOne(student.dict(by_alias=True))) for student in request.create]
+    for update in request.update:
+        # An explicit null means "keep", as an empty CSV cell does
+        changes = update.changes.dict(by_alias=True, exclude_none=True)
+        if "pass" in changes:
+            changes["pass"] = await password_hasher.hash(changes["pass"])
+        write = UpdateOne({"id": update.id}, {"$set": changes}) if update.id in found and changes else None
+        items.append(("update", update.id, write))
+    for student_id in request.delete:
+        items.append(("delete", student_id, DeleteOne({"id": student_id}) if student_id in found else None))
+
+    results = await apply_bulk(db.students, items)
+    for result in results:
+        if result.op != "create":
+            login_cache.invalidate_student(result.id)
+            session_tokens.revoke_student(result.id)
+    return results
+
+@api_router.post("/students/import", response_model=ImportResult, dependencies=[Depends(require_teacher)])
+async def import_students_csv(file: UploadFile = File(...)):
+    return await import_students(file)
+
+@api_router.get("/students/export", dependencies=[Depends(require_teacher)])
+async def export_students(group: Optional[str] = None):
+    query = {"group": group} if group else {}
+    cursor = db.students.find(query, {"_id": 0, "pass": 0}).sort("_id", 1).batch_size(STREAM_BATCH_SIZE)
+    return csv_response(student_csv_rows(cursor), STUDENT_CSV_COLUMNS, "students.csv")
+
+@api_router.delete("/students/{student_id}", dependencies=[Depends(require_teacher)])
 async def delete_student(student_id: str):
     result = await db.students.delete_one({"id": student_id})
+    login_cache.invalidate_student(student_id)
+    session_tokens.revoke_student(student_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Student not found")
     return {"message": "Student deleted successfully"}
 
 # Group management endpoints
-@api_router.get("/groups", response_model=List[str])
+@api_router.get("/groups", response_model=List[str], dependencies=[Depends(require_teacher)])
 async def get_groups():
     groups = await db.groups.find().to_list(1000)
     return [group["name"] for group in groups]
 
-@api_router.post("/groups")
+@api_router.post("/groups", dependencies=[Depends(require_teacher)])
 async def create_group(group: Group):
     group_dict = group.dict()
-    await db.groups.insert_one(group_dict)
+    try:
+        await db.groups.insert_one(group_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Group already exists")
     return {"message": "Group created successfully"}
 
-@api_router.delete("/groups/{group_name}")
+@api_router.post("/groups/bulk", response_model=List[BulkItemResult], dependencies=[Depends(require_teacher)])
+async def bulk_groups(request: GroupBulkRequest):
+    check_bulk_size(request.create, request.delete)
+    found = await existing_ids(db.groups, "name", request.delete)
+    occupied = set(await db.students.distinct("group", {"group": {"$in": request.delete}})) if request.delete else set()
+
+    items = [("create", name, InsertOne(Group(name=name).dict())) for name in request.create]
+    delete_items = []
+    for name in request.delete:
+        write = DeleteOne({"name": name}) if name in found and name not in occupied else None
+        delete_items.append(("delete", name, write))
+    results = await apply_bulk(db.groups, items + delete_items)
+    for result in results:
+        if result.op == "delete" and result.id in occupied:
+            result.error = "Cannot delete group with students"
+    return results
+
+@api_router.post("/groups/{group_name}/move", dependencies=[Depends(require_teacher)])
+async def move_group_students(group_name: str, request: GroupMoveRequest):
+    if not await db.groups.find_one({"name": request.to}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Group not found")
+    query = {"group": group_name}
+    update = {"$set": {"group": request.to}}
+    total = await db.students.count_documents(query)
+    # Cached logins and open sessions carry the old group
+    login_cache.clear()
+    session_tokens.revoke_group(group_name)
+    if total <= BULK_JOB_THRESHOLD:
+        await db.students.update_many(query, update)
+        return {"message": "Students moved successfully", "moved": total}
+
+    async def work(job_id):
+        await update_in_batches(db.students, query, update, job_id)
+        login_cache.clear()
+
+    job_id = await start_job("move-group", total, work)
+    return {"message": "Students are being moved", "jobId": job_id}
+
+@api_router.delete("/groups/{group_name}", dependencies=[Depends(require_teacher)])
 async def delete_group(group_name: str):
     # Check if any students are in this group
-    students_in_group = await db.students.find({"group": group_name}).to_list(1)
-    if students_in_group:
+    student_in_group = await db.students.find_one({"group": group_name}, {"_id": 1})
+    if student_in_group:
         raise HTTPException(status_code=400, detail="Cannot delete group with students")
     
     result = await db.groups.delete_one({"name": group_name})
@@ -168,81 +2683,526 @@ async def delete_group(group_name: str):
     return {"message": "Group deleted successfully"}
 
 # Exam management endpoints
-@api_router.get("/exams", response_model=List[Exam])
-async def get_exams():
-    exams = await db.exams.find().to_list(1000)
-    return [Exam(**exam) for exam in exams]
+@api_router.get("/exams", response_model=Union[List[Exam], List[ExamSummary]], dependencies=[Depends(require_teacher)])
+async def get_exams(
+    request: Request,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    summary: bool = False,
+    status: Optional[str] = None,
+):
+    query = {"status": status} if status else {}
+    if summary:
+        # Question bodies and images are never read from Mongo in summary mode
+        return await list_response(
+            request, db.exams, query, ExamSummary, after, limit, projection=EXAM_SUMMARY_PROJECTION
+        )
+    return await list_response(request, db.exams, query, Exam, after, limit)
 
 @api_router.get("/exams/{exam_id}", response_model=Exam)
-async def get_exam(exam_id: str):
-    exam = await db.exams.find_one({"id": exam_id})
-    if not exam:
-        raise HTTPException(status_code=404, detail="Exam not found")
-    return Exam(**exam)
+async def get_exam(exam_id: str, request: Request, session: Dict[str, Any] = Depends(current_session)):
+    body, etag, _, packed = await authorize_exam(session, exam_id)
+    media_type = "application/json"
+    if wants_msgpack(request):
+        # Each representation needs its own validator
+        body, etag, media_type = packed, etag[:-1] + '.msgpack"', MSGPACK_MEDIA_TYPE
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
 
-@api_router.post("/exams", response_model=Exam)
-async def create_exam(exam: Exam):
+async def prepare_exam(exam: Exam) -> Dict[str, Any]:
     exam_dict = exam.dict()
+    start = parse_exam_time(exam_dict["startTime"])
+    end = parse_exam_time(exam_dict["endTime"])
+    if start is not None and end is not None:
+        exam_dict["status"] = exam_status_at(start, end, datetime.now(timezone.utc))
+    await externalize_question_images(exam_dict["questions"])
+    exam_dict["answerKey"] = compile_answer_key(exam_dict)
+    return exam_dict
+
+@api_router.post("/exams", response_model=Exam, dependencies=[Depends(require_teacher)])
+async def create_exam(exam: Exam):
+    exam_dict = await prepare_exam(exam)
     await db.exams.insert_one(exam_dict)
-    return exam
+    exam_cache.invalidate(exam_dict["id"])
+    exam_scheduler.schedule(exam_dict)
+    return Exam(**exam_dict)
+
+@api_router.post("/exams/bulk", dependencies=[Depends(require_teacher)])
+async def bulk_exams(request: ExamBulkRequest):
+    check_bulk_size(request.create, request.delete)
+    found = await existing_ids(db.exams, "id", request.delete)
+    prepared = [await prepare_exam(exam) for exam in request.create]
 
-@api_router.delete("/exams/{exam_id}")
+    items = [("create", exam_dict["id"], InsertOne(exam_dict)) for exam_dict in prepared]
+    items += [("delete", exam_id, DeleteOne({"id": exam_id}) if exam_id in found else None)
+              for exam_id in request.delete]
+    results = await apply_bulk(db.exams, items)
+
+    created = {result.id for result in results if result.op == "create" and result.ok}
+    for exam_dict in prepared:
+        if exam_dict["id"] in created:
+            exam_scheduler.schedule(exam_dict)
+    deleted = [result.id for result in results if result.op == "delete" and result.ok]
+    for exam_id in created | set(deleted):
+        exam_cache.invalidate(exam_id)
+        analysis_cache.invalidate(exam_id)
+    job_id = await delete_exam_submissions(deleted) if deleted else None
+    return {"results": results, "jobId": job_id}
+
+@api_router.delete("/exams/{exam_id}", dependencies=[Depends(require_teacher)])
 async def delete_exam(exam_id: str):
     result = await db.exams.delete_one({"id": exam_id})
+    exam_cache.invalidate(exam_id)
+    analysis_cache.invalidate(exam_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Exam not found")
     
     # Also delete related submissions
-    await db.submissions.delete_many({"examId": exam_id})
+    job_id = await delete_exam_submissions([exam_id])
+    if job_id:
+        return {"message": "Exam deleted successfully", "jobId": job_id}
     return {"message": "Exam deleted successfully"}
 
+@api_router.post("/exams/{exam_id}/regrade", dependencies=[Depends(require_teacher)])
+async def regrade_exam(exam_id: str, request: Optional[RegradeRequest] = None):
+    exam = await db.exams.find_one(
+        {"id": exam_id}, {"_id": 0, "pointsPerQuestion": 1, "questions.correctAnswer": 1}
+    )
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+
+    corrections = request.correctAnswers if request else {}
+    updates: Dict[str, Any] = {}
+    for index, answer in corrections.items():
+        if not index.isdigit() or int(index) >= len(exam["questions"]):
+            raise HTTPException(status_code=400, detail=f"Invalid question index: {index}")
+        exam["questions"][int(index)]["correctAnswer"] = answer
+        updates[f"questions.{index}.correctAnswer"] = answer
+
+    if await is_archived(exam_id):
+        # Scores are rewritten in place; the next archive run packs them again
+        await restore_exam_submissions(exam_id)
+
+    answer_key = compile_answer_key(exam)
+    updates["answerKey"] = answer_key
+    await db.exams.update_one({"id": exam_id}, {"$set": updates})
+    exam_cache.invalidate(exam_id)
+
+    submissions = await db.submissions.find(
+        {"examId": exam_id, **FINISHED_SUBMISSIONS}, {"_id": 0, "id": 1, "answers": 1}
+    ).to_list(None)
+    scores = score_submissions_frame(answer_key, submissions)
+    if submissions:
+        await db.submissions.bulk_write(
+            [
+                UpdateOne({"id": submission["id"]}, {"$set": {"score": int(score)}})
+                for submission, score in zip(submissions, scores)
+            ],
+            ordered=False,
+        )
+    analysis_cache.invalidate(exam_id)
+    if LIVE_EVENTS_SOURCE == "local":
+        # One event for the whole exam; listeners refetch scores
+        event_broker.publish("regraded", {"examId": exam_id, "regraded": len(submissions)})
+    return {"message": "Exam regraded", "regraded": len(submissions)}
+
+@api_router.get("/exams/{exam_id}/analysis", response_model=ExamAnalysis, dependencies=[Depends(require_teacher)])
+async def get_exam_analysis(exam_id: str):
+    body = await analysis_cache.get(exam_id, load_exam_analysis)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    return Response(content=body, media_type="application/json")
+
+@api_router.post("/submissions/archive", dependencies=[Depends(require_teacher)])
+async def archive_submissions(olderThanDays: int = Query(ARCHIVE_AFTER_DAYS, ge=0)):
+    exam_ids = await archivable_exams(olderThanDays)
+    if not exam_ids:
+        return {"message": "No exams to archive", "exams": 0}
+    job_id = await start_job(
+        "archive-submissions", len(exam_ids), lambda job_id: archive_finished_exams(exam_ids, job_id)
+    )
+    return {"message": "Submissions are being archived", "exams": len(exam_ids), "jobId": job_id}
+
+# Background job endpoints
+@api_router.get("/jobs/{job_id}", dependencies=[Depends(require_teacher)])
+async def get_job(job_id: str):
+    job = await db.jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# Live monitoring endpoint
+@api_router.get("/events", dependencies=[Depends(event_stream_session)])
+async def live_events(request: Request, examId: Optional[str] = None):
+    """Server-Sent Events stream of submissions, cheating flags and scores."""
+    queue = event_broker.subscribe(examId)
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), LIVE_EVENTS_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+        finally:
+            event_broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Image endpoints
+@api_router.post("/images", dependencies=[Depends(require_teacher)])
+async def upload_image(file: UploadFile = File(...)):
+    data = await file.read(IMAGE_MAX_BYTES + 1)
+    url = await store_image(data)
+    return {"url": url}
+
+@api_router.get("/images/{digest}")
+async def get_image(digest: str, request: Request):
+    etag = f'"{digest}"'
+    cache_headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "X-Content-Type-Options": "nosniff",
+    }
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers)
+    try:
+        grid_out = await image_bucket().open_download_stream_by_name(digest)
+    except NoFile:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    async def chunks():
+        while True:
+            chunk = await grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+
+    # Images stored before uploads were sniffed may carry any declared type
+    content_type = (grid_out.metadata or {}).get("contentType")
+    return StreamingResponse(
+        chunks(),
+        media_type=content_type if content_type in IMAGE_TYPES else "application/octet-stream",
+        headers={**cache_headers, "Content-Length": str(grid_out.length)},
+    )
+
 # Submission endpoints
-@api_router.get("/submissions", response_model=List[Submission])
-async def get_submissions():
-    submissions = await db.submissions.find().to_list(1000)
-    return [Submission(**submission) for submission in submissions]
+@api_router.get("/submissions", response_model=List[Submission], dependencies=[Depends(require_teacher)])
+async def get_submissions(
+    request: Request,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    return await list_response(request, db.submissions, FINISHED_SUBMISSIONS, Submission, after, limit)
 
-@api_router.get("/submissions/exam/{exam_id}", response_model=List[Submission])
-async def get_exam_submissions(exam_id: str):
-    submissions = await db.submissions.find({"examId": exam_id}).to_list(1000)
-    return [Submission(**submission) for submission in submissions]
+@api_router.get("/submissions/exam/{exam_id}", response_model=List[Submission], dependencies=[Depends(require_teacher)])
+async def get_exam_submissions(
+    exam_id: str,
+    request: Request,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    if await is_archived(exam_id):
+        documents = archived_submissions(exam_id, after)
+        if limit is None:
+            return stream_response(request, documents, Submission)
+        page = []
+        async for document in documents:
+            page.append(document)
+            if len(page) == limit:
+                break
+        return page_response(request, page, Submission, limit)
+    return await list_response(
+        request, db.submissions, {"examId": exam_id, **FINISHED_SUBMISSIONS}, Submission, after, limit
+    )
+
+@api_router.get("/exams/{exam_id}/export", dependencies=[Depends(require_teacher)])
+async def export_exam_results(exam_id: str):
+    exam = await db.exams.find_one({"id": exam_id}, {"_id": 0, "questionsCount": 1})
+    if not exam:
+        raise HTTPException(status_code=404, detail="Exam not found")
+    submissions = finished_exam_submissions(
+        exam_id, ["studentId", "answers", "score", "submittedAt", "cheatingDetected"]
+    )
+    return csv_response(
+        exam_result_rows(submissions, exam["questionsCount"]),
+        exam_result_columns(exam["questionsCount"]),
+        f"exam-{exam_id}-results.csv",
+    )
 
 @api_router.post("/submissions", response_model=Submission)
-async def create_submission(submission: Submission):
-    submission_dict = submission.dict()
-    await db.submissions.insert_one(submission_dict)
-    return submission
-
-@api_router.get("/cheating-reports")
-async def get_cheating_reports():
-    submissions = await db.submissions.find({"cheatingDetected": True}).to_list(1000)
-    reports = []
-    
-    for submission in submissions:
-        student = await db.students.find_one({"id": submission["studentId"]})
-        exam = await db.exams.find_one({"id": submission["examId"]})
-        
-        if student and exam:
-            reports.append({
-                "id": submission["id"],
-                "studentName": f"{student['name']} {student['surname']}",
-                "group": student["group"],
-                "examTitle": exam["title"],
-                "submittedAt": submission["submittedAt"]
-            })
-    
-    return reports
+async def create_submission(submission: Submission, session: Dict[str, Any] = Depends(current_session)):
+    authorize_student(session, submission.studentId)
+    await authorize_exam(session, submission.examId)
+    check_answer_indexes(submission.answers)
+    stored = await submission_batcher.submit(submission.dict())
+    return Submission(**stored)
+
+def check_answer_indexes(answers: Dict[str, str]) -> None:
+    # Answer keys become update paths, so only plain question indexes are allowed
+    for index in answers:
+        if not index.isdigit():
+            raise HTTPException(status_code=400, detail=f"Invalid question index: {index}")
+
+@api_router.get("/submissions/draft", response_model=AnswerDraft)
+async def get_answer_draft(examId: str, studentId: str, session: Dict[str, Any] = Depends(current_session)):
+    authorize_student(session, studentId)
+    draft = await db.submissions.find_one(
+        {"examId": examId, "studentId": studentId, "status": SUBMISSION_IN_PROGRESS},
+        {"_id": 0, "examId": 1, "studentId": 1, "answers": 1},
+    )
+    if draft is None:
+        raise HTTPException(status_code=404, detail="Draft not found")
+    return draft
 
-@api_router.delete("/cheating-reports/{submission_id}")
+@api_router.patch("/submissions/draft")
+async def autosave_answers(draft: AnswerDraft, session: Dict[str, Any] = Depends(current_session)):
+    authorize_student(session, draft.studentId)
+    await authorize_exam(session, draft.examId)
+    check_answer_indexes(draft.answers)
+    if not draft.answers:
+        return {"saved": 0}
+    return await answer_autosaver.submit(draft.dict())
+
+async def cheating_reports(submissions, batch_size: int):
+    # Students and exams are looked up once per batch of flagged submissions
+    # instead of twice per submission; reports whose student or exam is gone
+    # are skipped. Each report keeps its submission's ``_id`` as the cursor.
+    async def reports(submissions):
+        students = await db.students.find(
+            {"id": {"$in": list({submission["studentId"] for submission in submissions})}},
+            {"_id": 0, "id": 1, "name": 1, "surname": 1, "group": 1},
+        ).to_list(None)
+        exams = await db.exams.find(
+            {"id": {"$in": list({submission["examId"] for submission in submissions})}},
+            {"_id": 0, "id": 1, "title": 1},
+        ).to_list(None)
+        students_by_id = {student["id"]: student for student in students}
+        exams_by_id = {exam["id"]: exam for exam in exams}
+        for submission in submissions:
+            student = students_by_id.get(submission["studentId"])
+            exam = exams_by_id.get(submission["examId"])
+            if student and exam:
+                yield {
+                    "_id": submission["_id"],
+                    "id": submission["id"],
+                    "studentName": f"{student['name']} {student['surname']}",
+                    "group": student["group"],
+                    "examTitle": exam["title"],
+                    "submittedAt": submission["submittedAt"],
+                }
+
+    batch = []
+    async for submission in submissions:
+        batch.append(submission)
+        if len(batch) == batch_size:
+            async for report in reports(batch):
+                yield report
+            batch = []
+    if batch:
+        async for report in reports(batch):
+            yield report
+
+@api_router.get("/cheating-reports", response_model=List[CheatingReport], dependencies=[Depends(require_teacher)])
+async def get_cheating_reports(
+    request: Request,
+    examId: Optional[str] = None,
+    group: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+):
+    query: Dict[str, Any] = {"cheatingDetected": True}
+    if examId:
+        query["examId"] = examId
+    if group:
+        group_students = await db.students.find({"group": group}, {"_id": 0, "id": 1}).to_list(None)
+        query["studentId"] = {"$in": [student["id"] for student in group_students]}
+
+    batch_size = min(limit or STREAM_BATCH_SIZE, STREAM_BATCH_SIZE)
+    submissions = db.submissions.find(
+        keyset_query(query, after), {"_id": 1, "id": 1, "studentId": 1, "examId": 1, "submittedAt": 1}
+    ).sort("_id", 1).batch_size(batch_size)
+    reports = cheating_reports(submissions, batch_size)
+    if limit is None:
+        return stream_response(request, reports, CheatingReport)
+
+    # Skipped reports don't shorten the page: reading goes on until it is full
+    page = []
+    try:
+        async for report in reports:
+            page.append(report)
+            if len(page) == limit:
+                break
+    finally:
+        await reports.aclose()
+    return page_response(request, page, CheatingReport, limit)
+
+@api_router.delete("/cheating-reports/{submission_id}", dependencies=[Depends(require_teacher)])
 async def remove_cheating_flag(submission_id: str):
-    result = await db.submissions.update_one(
-        {"id": submission_id},
-        {"$set": {"cheatingDetected": False}}
+    submission = await db.submissions.find_one_and_update(
+        {"id": submission_id, "cheatingDetected": {"$ne": False}},
+        {"$set": {"cheatingDetected": False}},
+        projection={"_id": 0, "answers": 0},
     )
-    if result.modified_count == 0:
+    if submission is None:
         raise HTTPException(status_code=404, detail="Submission not found")
+    publish_submission_event("cheating-flag", {**submission, "cheatingDetected": False})
     return {"message": "Cheating flag removed"}
 
+# Indexes
+INDEXES = {
+    "students": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("email", ASCENDING)]),
+        IndexModel([("group", ASCENDING)]),
+    ],
+    "groups": [
+        IndexModel([("name", ASCENDING)], unique=True),
+    ],
+    "exams": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("groups", ASCENDING)]),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    f"{IMAGE_BUCKET}.files": [
+        # Content-addressed, so concurrent uploads of the same bytes keep one copy
+        IndexModel([("filename", ASCENDING)], unique=True),
+    ],
+    "submission_archives": [
+        IndexModel([("examId", ASCENDING), ("part", ASCENDING)], unique=True),
+    ],
+    "archive_summaries": [
+        IndexModel([("examId", ASCENDING), ("studentId", ASCENDING)], unique=True),
+        IndexModel([("studentId", ASCENDING)]),
+    ],
+    "submissions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # One submission per student and exam; retried submits upsert against this
+        IndexModel([("examId", ASCENDING), ("studentId", ASCENDING)], unique=True),
+        IndexModel([("examId", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("studentId", ASCENDING)]),
+        IndexModel(
+            [("cheatingDetected", ASCENDING), ("_id", ASCENDING)],
+            partialFilterExpression={"cheatingDetected": True},
+        ),
+    ],
+}
+
+async def ensure_indexes() -> List[str]:
+    """Create the declared indexes and return the unique ones that could not be built.
+
+    Indexes are created one by one so existing duplicates only cost that
+    index. A missing unique index is not just slower: it is what keeps
+    retried submissions from being stored twice, so callers treat it as fatal.
+    """
+    missing_unique = []
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            try:
+                await db[collection_name].create_indexes([index])
+            except OperationFailure as exc:
+                logger.warning("Could not create index %s on %s: %s",
+                               index.document["name"], collection_name, exc)
+                if index.document.get("unique"):
+                    missing_unique.append(f"{collection_name}.{index.document['name']}")
+    return missing_unique
+
+def _submission_rank(submission: Dict[str, Any]) -> tuple:
+    # Finished submissions beat drafts, then the first one submitted wins, as
+    # it would have with the unique index in place
+    return (submission.get("status") == SUBMISSION_IN_PROGRESS, submission.get("submittedAt") or "", submission["_id"])
+
+async def dedupe_submissions(dry_run: bool = False) -> int:
+    """Keep one submission per exam and student so the unique index can be built.
+
+    Returns how many submissions were (or, with ``dry_run``, would be) removed.
+    """
+    removed = 0
+    duplicates = db.submissions.aggregate([
+        {"$group": {"_id": {"examId": "$examId", "studentId": "$studentId"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    async for group in duplicates:
+        submissions = await db.submissions.find(group["_id"], {"_id": 1, "status": 1, "submittedAt": 1}).to_list(None)
+        keep = min(submissions, key=_submission_rank)
+        extra = [submission["_id"] for submission in submissions if submission["_id"] != keep["_id"]]
+        if not dry_run:
+            await db.submissions.delete_many({"_id": {"$in": extra}})
+            analysis_cache.invalidate(group["_id"]["examId"])
+        removed += len(extra)
+    return removed
+
+# The queries the endpoints issue, as (name, collection, filter, sort)
+ENDPOINT_QUERIES = [
+    ("login", "students", {"email": ""}, None),
+    ("update_student", "students", {"id": ""}, None),
+    ("get_students", "students", {}, [("_id", 1)]),
+    ("export_students.group", "students", {"group": ""}, [("_id", 1)]),
+    ("import_students", "students", {"id": {"$in": [""]}}, None),
+    ("delete_group.students", "students", {"group": ""}, None),
+    ("delete_group", "groups", {"name": ""}, None),
+    ("get_exams", "exams", {}, [("_id", 1)]),
+    ("get_exam", "exams", {"id": ""}, None),
+    ("get_submission_rules", "exams", {"id": {"$in": [""]}}, None),
+    ("get_exams.status", "exams", {"status": ""}, [("_id", 1)]),
+    ("get_student_exams.exams", "exams", {"groups": ""}, None),
+    ("get_student_exams.submissions", "submissions", {"studentId": ""}, None),
+    ("get_student_exams.archives", "archive_summaries", {"studentId": ""}, None),
+    ("archived_submissions", "submission_archives", {"examId": ""}, [("part", 1)]),
+    ("archive_submissions", "exams", {"status": "finished", "archived": {"$ne": True}}, None),
+    ("get_submissions", "submissions", FINISHED_SUBMISSIONS, [("_id", 1)]),
+    ("get_exam_submissions", "submissions", {"examId": "", **FINISHED_SUBMISSIONS}, [("_id", 1)]),
+    ("export_exam_results", "submissions", {"examId": "", **FINISHED_SUBMISSIONS}, [("_id", 1)]),
+    ("export_exam_results.students", "students", {"id": {"$in": [""]}}, None),
+    ("get_exam_analysis", "submissions", {"examId": "", **FINISHED_SUBMISSIONS}, None),
+    ("create_submission", "submissions", {"examId": "", "studentId": ""}, None),
+    ("autosave_answers", "submissions", {"examId": "", "studentId": "", "status": SUBMISSION_IN_PROGRESS}, None),
+    ("get_cheating_reports", "submissions", {"cheatingDetected": True}, [("_id", 1)]),
+    ("get_cheating_reports.exam", "submissions", {"cheatingDetected": True, "examId": ""}, [("_id", 1)]),
+    ("get_cheating_reports.group", "submissions",
+     {"cheatingDetected": True, "studentId": {"$in": [""]}}, [("_id", 1)]),
+    ("get_cheating_reports.students", "students", {"id": {"$in": [""]}}, None),
+    ("remove_cheating_flag", "submissions", {"id": ""}, None),
+    ("get_image", f"{IMAGE_BUCKET}.files", {"filename": ""}, None),
+    ("get_job", "jobs", {"id": ""}, None),
+]
+
+def _plan_stages(plan) -> List[str]:
+    if isinstance(plan, dict):
+        stages = [plan["stage"]] if "stage" in plan else []
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+        return stages
+    if isinstance(plan, list):
+        return [stage for item in plan for stage in _plan_stages(item)]
+    return []
+
+async def verify_query_plans() -> List[str]:
+    """Explain every endpoint query and return the names of those doing a COLLSCAN."""
+    collection_scans = []
+    for name, collection_name, query, sort in ENDPOINT_QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        if "COLLSCAN" in _plan_stages(explanation["queryPlanner"]["winningPlan"]):
+            collection_scans.append(name)
+    return collection_scans
+
 # Initialize data endpoint
 @api_router.post("/init-data")
 async def initialize_data():
@@ -348,26 +3308,81 @@ async def initialize_data():
             "answers": {"0": "x = -2, x = -3"},
             "submittedAt": "2025-09-21T23:45:38",
             "cheatingDetected": False,
-            "score": 0
         }
     ]
+    # Scored by the same rule as real submissions, against stored answer keys
+    for exam in initial_exams:
+        exam["answerKey"] = compile_answer_key(exam)
+    answer_keys = {exam["id"]: exam["answerKey"] for exam in initial_exams}
+    for submission in initial_submissions:
+        submission["score"] = score_answers(answer_keys[submission["examId"]], submission["answers"])
     
     await db.students.insert_many(initial_students)
     await db.groups.insert_many(initial_groups)
     await db.exams.insert_many(initial_exams)
     await db.submissions.insert_many(initial_submissions)
+    for exam in initial_exams:
+        exam_scheduler.schedule(exam)
     
     return {"message": "Data initialized successfully"}
 
+# Metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+# Readiness probe
+HEALTH_PING_TIMEOUT = float(os.environ.get('HEALTH_PING_TIMEOUT', '2'))
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Ready when Mongo answers a ping; reports its round trip and pool usage."""
+    max_pool_size = client.options.pool_options.max_pool_size
+    pools = mongo_pool_monitor.snapshot()
+    in_use = sum(counts["in_use"] for counts in pools.values())
+    servers = {
+        "%s:%s" % address: round(description.round_trip_time * 1000, 3)
+        for address, description in client.topology_description.server_descriptions().items()
+        if description.round_trip_time is not None
+    }
+    report = {
+        "status": "ok",
+        "pid": os.getpid(),
+        "mongo": {
+            "pingMs": None,
+            "serverRttMs": servers,
+            "pool": {
+                "maxPoolSize": max_pool_size,
+                "inUse": in_use,
+                "utilisation": round(in_use / (max_pool_size * max(len(pools), 1)), 3) if max_pool_size else None,
+                "servers": pools,
+            },
+        },
+    }
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), HEALTH_PING_TIMEOUT)
+    except Exception as exc:
+        report["status"] = "unavailable"
+        report["mongo"]["error"] = str(exc) or type(exc).__name__
+        return JSONResponse(report, status_code=503)
+    report["mongo"]["pingMs"] = round((time.perf_counter() - started) * 1000, 3)
+    return report
+
 # Include the router in the main app
 app.include_router(api_router)
 
+# Inside the metrics middleware, so response sizes are what goes on the wire
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Configure logging
@@ -377,6 +3392,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def create_indexes():
+    missing_unique = await ensure_indexes()
+    if missing_unique:
+        raise RuntimeError(
+            f"Unique indexes could not be built: {', '.join(missing_unique)}. "
+            "Remove the duplicates (python dedupe_submissions.py for submissions) and restart."
+        )
+    if os.environ.get('VERIFY_QUERY_PLANS'):
+        collection_scans = await verify_query_plans()
+        if collection_scans:
+            raise RuntimeError(f"Queries without an index: {', '.join(collection_scans)}")
+
+async def start_change_stream():
+    global change_stream_task
+    if LIVE_EVENTS_SOURCE == "changestream":
+        change_stream_task = asyncio.create_task(watch_submission_changes())
+
+async def finalize_exam_scores(exam_id: str) -> None:
+    # Autosaved answers of students who never pressed finish count as submitted
+    await db.submissions.update_many(
+        {"examId": exam_id, "status": SUBMISSION_IN_PROGRESS},
+        {"$set": {
+            "status": SUBMISSION_SUBMITTED,
+            "autoSubmitted": True,
+            "submittedAt": datetime.now(timezone.utc).isoformat(),
+        }},
+    )
+    await regrade_exam(exam_id)
+
+exam_scheduler.finish_hooks.append(finalize_exam_scores)
+
+async def start_background_services():
+    await create_indexes()
+    await start_change_stream()
+    await exam_scheduler.start()
+
+async def stop_background_services():
+    global change_stream_task
+    await exam_scheduler.stop()
+    if change_stream_task is not None:
+        change_stream_task.cancel()
+        change_stream_task = None
+    await submission_batcher.close()
+    await answer_autosaver.close()
+    password_hasher.shutdown()
\ No newline at end of file
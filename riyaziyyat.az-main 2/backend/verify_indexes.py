@@ -0,0 +1,43 @@
+"""Create the declared indexes and check that no endpoint query is a COLLSCAN.
+
+Run from the backend directory: ``python verify_indexes.py``. Exits non-zero
+and lists the offending queries if any of them still scans a collection, or
+the unique indexes that duplicates kept from being built.
+
+The student dashboard joins exams and submissions in one aggregation, which
+needs MongoDB 5.0+. On older servers it falls back to one query per
+collection; this script says so when it connects to one.
+"""
+import asyncio
+import sys
+
+import server
+from server import close_mongo, connect_mongo, ensure_indexes, verify_query_plans
+
+# $lookup with both localField and pipeline
+JOIN_MIN_VERSION = (5, 0)
+
+
+async def main():
+    connect_mongo()
+    try:
+        version = (await server.client.server_info())["versionArray"]
+        missing_unique = await ensure_indexes()
+        collection_scans = await verify_query_plans()
+    finally:
+        close_mongo()
+    if tuple(version[:2]) < JOIN_MIN_VERSION:
+        print("MongoDB %s: student exams are read with separate queries instead of one aggregation "
+              "(needs 5.0+)" % ".".join(map(str, version[:3])))
+    if missing_unique:
+        print("Missing unique indexes: " + ", ".join(missing_unique))
+    if collection_scans:
+        print("COLLSCAN: " + ", ".join(collection_scans))
+    if missing_unique or collection_scans:
+        return 1
+    print("All endpoint queries use an index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
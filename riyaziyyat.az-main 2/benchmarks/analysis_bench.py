@@ -0,0 +1,83 @@
+"""Item analysis benchmark.
+
+Times ``server.analyze_items`` (difficulty, discrimination, point-biserial
+and distractor frequencies) over synthetic submissions to a 30-question
+multiple-choice exam. The analysis endpoint has to stay well under a second
+for tens of thousands of submissions; the run fails if the largest size
+takes longer than ``--limit-ms``.
+
+No database is needed; submissions are generated in memory with the shape
+the endpoint reads from Mongo.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "riyaziyyat")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+SIZES = [1_000, 10_000, 50_000]
+QUESTIONS = 30
+OPTIONS = ["x = -2", "x = 2", "x = 0", "x = 1"]
+
+
+def make_exam():
+    return {
+        "id": "bench-exam",
+        "pointsPerQuestion": 5,
+        "questions": [
+            {"type": "multiple-choice", "options": OPTIONS, "correctAnswer": OPTIONS[q % len(OPTIONS)]}
+            for q in range(QUESTIONS)
+        ],
+    }
+
+
+def make_submissions(count, rng):
+    submissions = []
+    for _ in range(count):
+        ability = rng.random()
+        answers = {}
+        for q in range(QUESTIONS):
+            if rng.random() < 0.05:
+                continue  # left blank
+            correct = OPTIONS[q % len(OPTIONS)]
+            answers[str(q)] = correct if rng.random() < ability else rng.choice(OPTIONS)
+        submissions.append({"answers": answers})
+    return submissions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--limit-ms", type=float, default=1000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    exam = make_exam()
+    print(f"{'submissions':>12} {'median ms':>10} {'max ms':>8}")
+    slowest = 0.0
+    for size in SIZES:
+        submissions = make_submissions(size, rng)
+        samples = []
+        for _ in range(args.rounds):
+            started = time.perf_counter()
+            server.analyze_items(exam, submissions)
+            samples.append((time.perf_counter() - started) * 1000)
+        slowest = statistics.median(samples)
+        print(f"{size:>12} {slowest:>10.1f} {max(samples):>8.1f}")
+
+    print(f"\n{SIZES[-1]} submissions analysed in {slowest:.1f} ms (limit {args.limit_ms:.0f} ms)")
+    return 0 if slowest < args.limit_ms else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
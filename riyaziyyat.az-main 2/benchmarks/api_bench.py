@@ -0,0 +1,359 @@
+"""Offline API load benchmark.
+
+Drives the FastAPI ``app`` in-process through an ASGI client, so no server
+or network is involved, and replays the moments that hurt in production:
+
+* ``login-storm``      – every student logging in at once
+* ``exam-start``       – a group opening the same exam together
+* ``submission-burst`` – the timer running out and everyone submitting
+* ``results-view``     – teachers opening the results page
+* ``encodings``        – the heavy endpoints in every response encoding the
+                         server offers (JSON or MessagePack, each plain, gzip
+                         and brotli)
+
+For each endpoint it reports p50/p95/p99 latency, throughput, bytes on the
+wire (after any compression) and CPU time per request. The client runs in the
+same process but never decompresses, so the CPU time is essentially the
+server's. ``--save-baseline`` writes the numbers to a JSON file and
+``--compare`` fails when an endpoint's p95 regresses past ``--tolerance``.
+
+The data comes from ``generate_data.generate`` (students, groups, past exams
+and their submissions) plus one exam that is live for the whole run. By
+default the benchmark talks to a local MongoDB (``MONGO_URL``) in a scratch
+``<DB_NAME>_bench`` database that is dropped afterwards. ``--mongo memory``
+uses mongomock-motor instead; that needs no server but does not use indexes
+or store images, so only compare baselines taken with the same backend.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "riyaziyyat")
+os.environ["DB_NAME"] = os.environ["DB_NAME"] + "_bench"
+os.environ.setdefault("SESSION_SECRET", "bench-session-secret-0123456789abcdef")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+from generate_data import DatasetSpec, drop_app_data, generate  # noqa: E402
+
+# httpx logs every request at INFO, which would drown the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+BENCH_PASSWORD = "bench-pass"
+SCENARIOS = ["login-storm", "exam-start", "submission-burst", "results-view", "encodings"]
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.sizes = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.wall = defaultdict(float)
+        self.cpu = defaultdict(float)
+
+    async def request(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        async with client.stream(method, url, **kwargs) as response:
+            # Raw bytes as sent, still compressed
+            async for chunk in response.aiter_raw():
+                self.sizes[label] += len(chunk)
+        self.samples[label].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[label] += 1
+        return response
+
+    def summary(self):
+        report = {}
+        for label, samples in self.samples.items():
+            latencies = np.array(samples)
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            report[label] = {
+                "requests": len(samples),
+                "errors": self.errors[label],
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "throughput_rps": round(len(samples) / self.wall[label], 1) if self.wall[label] else None,
+                "avg_bytes": int(self.sizes[label] / len(samples)),
+                "cpu_ms": round(self.cpu[label] * 1000 / len(samples), 3),
+            }
+        return report
+
+
+async def run_concurrently(recorder, label, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(call):
+        async with semaphore:
+            await call()
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    await asyncio.gather(*(limited(call) for call in calls))
+    recorder.cpu[label] += time.process_time() - cpu_started
+    recorder.wall[label] += time.perf_counter() - started
+
+
+async def seed(args):
+    """Generate the dataset and the live benchmark exam; return the students taking part."""
+    db = server.db
+    spec = DatasetSpec(
+        students=args.students,
+        groups=args.groups,
+        exams=args.exams,
+        min_questions=args.questions,
+        max_questions=args.questions,
+        # Every student can log in and sit the benchmark exam
+        disabled_rate=0.0,
+        password=BENCH_PASSWORD,
+        seed=args.seed,
+        today=datetime.now(server.EXAM_TIMEZONE).date(),
+    )
+    await generate(db, spec, images=args.mongo == "local")
+    students = await db.students.find({}, {"_id": 0, "id": 1, "email": 1, "group": 1}).sort("_id", 1).to_list(None)
+    group_names = await db.groups.distinct("name")
+
+    now = datetime.now(server.EXAM_TIMEZONE).replace(tzinfo=None)
+    exam = server.Exam(
+        id="bench-exam",
+        title="Benchmark",
+        description="Benchmark exam",
+        questionsCount=args.questions,
+        groups=group_names,
+        # Live for the whole run so the submission burst isn't rejected as late
+        startTime=(now - timedelta(hours=1)).isoformat(timespec="seconds"),
+        endTime=(now + timedelta(hours=1)).isoformat(timespec="seconds"),
+        status="live",
+        pointsPerQuestion=5,
+        questions=[
+            server.Question(
+                question=f"Sual {q}: x² + {q}x = 0",
+                type="multiple-choice",
+                options=[f"x = {q}", f"x = -{q}", "x = 0", "x = 1"],
+                correctAnswer=f"x = -{q}",
+            )
+            for q in range(args.questions)
+        ],
+    ).dict()
+    exam["answerKey"] = server.compile_answer_key(exam)
+    await db.exams.insert_one(exam)
+    return students
+
+
+def student_headers(student):
+    # Sessions are signed locally; the login storm measures logging in itself
+    token = server.issue_student_session({**student, "status": "active"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def teacher_headers():
+    return {"Authorization": f"Bearer {server.session_tokens.issue('bench-teacher', 'teacher')}"}
+
+
+def student_answers(i, questions):
+    return {str(q): f"x = -{q}" if (i + q) % 3 else "x = 0" for q in range(questions)}
+
+
+async def login_storm(client, recorder, args):
+    server.login_cache.clear()
+    calls = [
+        lambda student=student: recorder.request(
+            client, "POST /api/auth/login", "POST", "/api/auth/login",
+            json={"email": student["email"], "password": BENCH_PASSWORD},
+        )
+        for student in args.roster
+    ]
+    await run_concurrently(recorder, "POST /api/auth/login", calls, args.concurrency)
+
+
+async def exam_start(client, recorder, args):
+    server.exam_cache.clear()
+    calls = [
+        lambda student=student: recorder.request(
+            client, "GET /api/exams/{id}", "GET", "/api/exams/bench-exam", headers=student_headers(student)
+        )
+        for student in args.roster
+    ]
+    await run_concurrently(recorder, "GET /api/exams/{id}", calls, args.concurrency)
+
+
+async def submission_burst(client, recorder, args):
+    calls = [
+        lambda i=i, student=student: recorder.request(
+            client, "POST /api/submissions", "POST", "/api/submissions",
+            json={
+                "examId": "bench-exam",
+                "studentId": student["id"],
+                "answers": student_answers(i, args.questions),
+                "submittedAt": "2025-01-01T10:00:00",
+                "cheatingDetected": i % 50 == 0,
+            },
+            headers=student_headers(student),
+        )
+        for i, student in enumerate(args.roster)
+    ]
+    await run_concurrently(recorder, "POST /api/submissions", calls, args.concurrency)
+
+
+async def results_view(client, recorder, args):
+    # A handful of teachers refreshing the results page
+    routes = [
+        ("GET /api/exams/{id}", "/api/exams/bench-exam"),
+        ("GET /api/submissions/exam/{id}", "/api/submissions/exam/bench-exam"),
+        ("GET /api/exams/{id}/analysis", "/api/exams/bench-exam/analysis"),
+        ("GET /api/students", "/api/students"),
+        ("GET /api/cheating-reports", "/api/cheating-reports"),
+    ]
+    headers = teacher_headers()
+    for label, url in routes:
+        calls = [
+            lambda url=url, label=label: recorder.request(client, label, "GET", url, headers=headers)
+            for _ in range(args.viewers)
+        ]
+        await run_concurrently(recorder, label, calls, args.concurrency)
+
+
+def response_encodings():
+    # (name, Accept, Accept-Encoding) for every combination the server supports
+    formats = [("json", "application/json")]
+    if server.msgpack is not None:
+        formats.append(("msgpack", server.MSGPACK_MEDIA_TYPE))
+    codings = [("", "identity"), ("+gzip", "gzip")]
+    if server.brotli is not None:
+        codings.append(("+br", "br"))
+    return [(name + suffix, accept, coding) for name, accept in formats for suffix, coding in codings]
+
+
+async def encodings(client, recorder, args):
+    # Meant to run after submission-burst, so the submission list has rows
+    routes = [
+        ("GET /api/exams/{id}", "/api/exams/bench-exam"),
+        ("GET /api/submissions/exam/{id}", "/api/submissions/exam/bench-exam"),
+        ("GET /api/students", "/api/students"),
+    ]
+    for route, url in routes:
+        for name, accept, coding in response_encodings():
+            label = f"{route} [{name}]"
+            headers = {**teacher_headers(), "Accept": accept, "Accept-Encoding": coding}
+            calls = [
+                lambda url=url, label=label, headers=headers: recorder.request(
+                    client, label, "GET", url, headers=headers
+                )
+                for _ in range(args.viewers)
+            ]
+            # One at a time so each label's CPU time is its own
+            await run_concurrently(recorder, label, calls, 1)
+
+
+SCENARIO_RUNNERS = {
+    "login-storm": login_storm,
+    "exam-start": exam_start,
+    "submission-burst": submission_burst,
+    "results-view": results_view,
+    "encodings": encodings,
+}
+
+
+def print_report(report):
+    print(f"{'endpoint':<48} {'reqs':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} "
+          f"{'bytes':>9} {'cpu ms':>8}")
+    for label, row in sorted(report.items()):
+        print(f"{label:<48} {row['requests']:>6} {row['errors']:>4} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} "
+              f"{row['p99_ms']:>9.2f} {row['throughput_rps'] or 0:>9.1f} {row['avg_bytes']:>9} {row['cpu_ms']:>8.2f}")
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+    for label, row in report.items():
+        previous = baseline.get("endpoints", {}).get(label)
+        if previous and row["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p95 {previous['p95_ms']:.2f} -> {row['p95_ms']:.2f} ms")
+    return regressions
+
+
+async def run(args):
+    if args.mongo == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[os.environ["DB_NAME"]]
+    else:
+        server.connect_mongo()
+
+    await drop_app_data(server.db)
+    await server.ensure_indexes()
+    args.roster = await seed(args)
+
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for scenario in args.scenario or SCENARIOS:
+                print(f"▶ {scenario}")
+                await SCENARIO_RUNNERS[scenario](client, recorder, args)
+        await server.submission_batcher.close()
+    finally:
+        if args.mongo == "local":
+            await server.client.drop_database(os.environ["DB_NAME"])
+            server.close_mongo()
+    return recorder.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="scenario to run (repeatable, default: all)")
+    parser.add_argument("--mongo", choices=["local", "memory"], default="local")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=40)
+    parser.add_argument("--exams", type=int, default=50, help="past exams generated alongside the live one")
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--viewers", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed p95 regression as a fraction (default 0.2)")
+    args = parser.parse_args()
+
+    print("🚀 API load benchmark")
+    print("=" * 50)
+    report = asyncio.run(run(args))
+    print_report(report)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "mongo": args.mongo,
+            "students": args.students,
+            "endpoints": report,
+        }, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.tolerance)
+        if regressions:
+            print("\n⚠️  Regressions:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
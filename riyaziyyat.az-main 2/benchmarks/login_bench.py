@@ -0,0 +1,180 @@
+"""Login latency benchmark.
+
+Seeds a scratch database with increasing numbers of students and times the
+``login`` handler against it. With the email index in place the per-login
+latency should stay flat from 100 to 100k students.
+
+A second phase fires concurrent logins at the same accounts while a probe
+task measures how late the event loop wakes it. Password hashing runs in a
+thread pool, so the loop's p99 lag should stay far below the cost of a
+single hash. The first storm migrates the seeded plaintext passwords to
+hashes and the second one verifies them.
+
+Needs a reachable MongoDB (``MONGO_URL``, defaults to a local server). The
+benchmark uses its own ``<DB_NAME>_bench`` database and drops it afterwards.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "riyaziyyat")
+os.environ["DB_NAME"] = os.environ["DB_NAME"] + "_bench"
+os.environ.setdefault("SESSION_SECRET", "bench-session-secret-0123456789abcdef")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import server  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 100_000]
+LOGINS_PER_SIZE = 200
+BATCH = 5_000
+STORM_LOGINS = 500
+STORM_CONCURRENCY = 100
+PROBE_INTERVAL = 0.005
+MAX_LOOP_LAG_MS = 50
+
+
+def make_student(i):
+    return {
+        "id": f"bench-{i}",
+        "name": "Bench",
+        "surname": f"Student{i}",
+        "email": f"bench.student{i}",
+        "pass": f"pass{i}",
+        "group": f"G{i % 40}",
+        "class": "10a",
+        "parentContact": "+994500000000",
+        "status": "active",
+    }
+
+
+async def seed_up_to(current, target):
+    for start in range(current, target, BATCH):
+        end = min(start + BATCH, target)
+        await server.db.students.insert_many([make_student(i) for i in range(start, end)])
+
+
+async def time_logins(count, use_cache):
+    samples = []
+    step = max(count // LOGINS_PER_SIZE, 1)
+    for i in range(0, count, step):
+        if not use_cache:
+            server.login_cache.clear()
+        request = server.LoginRequest(email=f"bench.student{i}", password=f"pass{i}")
+        started = time.perf_counter()
+        response = await server.login(request)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.success, response.message
+    return samples
+
+
+async def probe_loop(lags, stop):
+    # How much later than asked the loop gets back to us
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append((time.perf_counter() - started - PROBE_INTERVAL) * 1000)
+
+
+async def login_storm():
+    server.login_cache.clear()
+    semaphore = asyncio.Semaphore(STORM_CONCURRENCY)
+
+    async def one(i):
+        async with semaphore:
+            request = server.LoginRequest(email=f"bench.student{i}", password=f"pass{i}")
+            started = time.perf_counter()
+            response = await server.login(request)
+            assert response.success, response.message
+            return (time.perf_counter() - started) * 1000
+
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_loop(lags, stop))
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(one(i) for i in range(STORM_LOGINS)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe
+    return samples, lags, elapsed
+
+
+async def inline_reference(stored):
+    # The same storm if verification ran on the event loop: each login blocks it
+    async def one():
+        await asyncio.sleep(0)
+        server.password_context.verify("calibration", stored)
+
+    lags, stop = [], asyncio.Event()
+    probe = asyncio.create_task(probe_loop(lags, stop))
+    await asyncio.sleep(0)
+    await asyncio.gather(*(one() for _ in range(STORM_CONCURRENCY)))
+    stop.set()
+    await probe
+    return lags
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    return statistics.median(ordered), p95
+
+
+async def run():
+    server.connect_mongo()
+    await server.db.students.drop()
+    await server.ensure_indexes()
+
+    print(f"{'students':>10} {'cold p50 ms':>12} {'cold p95 ms':>12} {'warm p50 ms':>12}")
+    seeded = 0
+    results = []
+    try:
+        for size in SIZES:
+            await seed_up_to(seeded, size)
+            seeded = size
+            cold_p50, cold_p95 = summarize(await time_logins(size, use_cache=False))
+            # Second pass over the same accounts is served from the login cache
+            await time_logins(size, use_cache=True)
+            warm_p50, _ = summarize(await time_logins(size, use_cache=True))
+            results.append((size, cold_p50))
+            print(f"{size:>10} {cold_p50:>12.3f} {cold_p95:>12.3f} {warm_p50:>12.3f}")
+
+        started = time.perf_counter()
+        stored = server.password_context.hash("calibration")
+        hash_ms = (time.perf_counter() - started) * 1000
+        print(f"\n{STORM_LOGINS} concurrent logins ({STORM_CONCURRENCY} in flight, "
+              f"{server.password_hasher.max_workers} hash threads, one hash = {hash_ms:.1f} ms)")
+        print(f"{'phase':>10} {'login p50':>10} {'login p95':>10} {'logins/s':>9} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+        worst_lag = 0.0
+        for phase in ("migrate", "verify"):
+            samples, lags, elapsed = await login_storm()
+            p50, p95 = summarize(samples)
+            lag_p50, lag_p99 = statistics.median(lags), sorted(lags)[int(len(lags) * 0.99) - 1]
+            worst_lag = max(worst_lag, lag_p99)
+            print(f"{phase:>10} {p50:>10.1f} {p95:>10.1f} {STORM_LOGINS / elapsed:>9.0f} "
+                  f"{lag_p50:>8.2f} {lag_p99:>8.2f} {max(lags):>8.2f}")
+        lags = await inline_reference(stored)
+        print(f"{'inline':>10} {'':>10} {'':>10} {'':>9} {statistics.median(lags):>8.2f} {'':>8} {max(lags):>8.2f}"
+              f"   <- {STORM_CONCURRENCY} verifications on the loop, for reference")
+    finally:
+        await server.client.drop_database(os.environ["DB_NAME"])
+        server.close_mongo()
+
+    smallest, largest = results[0][1], results[-1][1]
+    ratio = largest / smallest if smallest else float("inf")
+    print(f"\np50 growth from {SIZES[0]} to {SIZES[-1]} students: {ratio:.2f}x")
+    print(f"Event loop lag p99 during the login storms: {worst_lag:.2f} ms (limit {MAX_LOOP_LAG_MS} ms)")
+    return 0 if ratio < 3 and worst_lag < MAX_LOOP_LAG_MS else 1
+
+
+def main():
+    print("🚀 Login latency benchmark")
+    print("=" * 50)
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Response serialization microbenchmark.
+
+Measures CPU time per 1000 documents for the two ways a list endpoint can turn
+raw MongoDB documents into a JSON body:
+
+* ``validated`` - the previous path: build the pydantic model for every
+  document, let FastAPI validate it again against ``response_model`` and run
+  it through ``jsonable_encoder`` and ``json.dumps``.
+* ``trusted`` - ``server.encode_trusted``: pick the model's fields straight
+  from the document and encode them with orjson.
+
+No database is needed; the documents are built in memory in the same shape
+the handlers read them from Mongo.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from bson import ObjectId
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "riyaziyyat")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import server  # noqa: E402
+
+
+def student_document(i):
+    return {
+        "_id": ObjectId(),
+        "id": f"bench-{i}",
+        "name": "Bench",
+        "surname": f"Student{i}",
+        "email": f"bench.student{i}",
+        "pass": f"pass{i}",
+        "group": f"G{i % 40}",
+        "class": "10a",
+        "parentContact": "+994500000000",
+        "status": "active",
+    }
+
+
+def exam_document(i, questions=30):
+    return {
+        "_id": ObjectId(),
+        "id": f"exam-{i}",
+        "title": f"Exam {i}",
+        "description": "Bacarıqlarınızın qiymətləndirilməsi.",
+        "questionsCount": questions,
+        "questions": [
+            {
+                "question": f"Question {q}",
+                "type": "multiple",
+                "options": ["A", "B", "C", "D"],
+                "correctAnswer": "A",
+                "imageUrl": None,
+            }
+            for q in range(questions)
+        ],
+        "groups": ["G1", "G2"],
+        "startTime": "2025-09-21T10:00:00",
+        "endTime": "2025-09-21T12:00:00",
+        "pointsPerQuestion": 10,
+        "status": "finished",
+        "answerKey": {"answers": ["a"] * questions, "points": [10] * questions},
+    }
+
+
+def submission_document(i):
+    return {
+        "_id": ObjectId(),
+        "id": f"sub-{i}",
+        "examId": "exam-1",
+        "studentId": f"bench-{i}",
+        "answers": {str(q): "A" for q in range(30)},
+        "submittedAt": "2025-09-21T11:00:00",
+        "cheatingDetected": False,
+        "score": 250,
+    }
+
+
+def validated(documents, model):
+    adapter = TypeAdapter(list[model])
+    items = adapter.validate_python([model(**document) for document in documents])
+    return json.dumps(jsonable_encoder(items, by_alias=True)).encode("utf-8")
+
+
+def trusted(documents, model):
+    return b"[" + b",".join(server.encode_trusted(document, model) for document in documents) + b"]"
+
+
+def cpu_per_thousand(encode, documents, model, rounds):
+    started = time.process_time()
+    for _ in range(rounds):
+        encode(documents, model)
+    return (time.process_time() - started) * 1000 / rounds / len(documents) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        ("Student", server.Student, [student_document(i) for i in range(args.documents)]),
+        ("Exam", server.Exam, [exam_document(i) for i in range(args.documents)]),
+        ("Submission", server.Submission, [submission_document(i) for i in range(args.documents)]),
+    ]
+
+    print(f"{'model':<12}{'validated ms':>14}{'trusted ms':>12}{'speedup':>9}   (CPU per 1000 docs)")
+    for name, model, documents in cases:
+        assert json.loads(validated(documents, model)) == json.loads(trusted(documents, model)), name
+        slow = cpu_per_thousand(validated, documents, model, args.rounds)
+        fast = cpu_per_thousand(trusted, documents, model, args.rounds)
+        print(f"{name:<12}{slow:>14.2f}{fast:>12.2f}{slow / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
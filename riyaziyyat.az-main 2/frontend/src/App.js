@@ -3,6 +3,7 @@ import "./App.css";
 import { BrowserRouter, Routes, Route, Navigate } from "react-router-dom";
 import { Toaster } from "./components/ui/sonner";
 import axios from "axios";
+import "./lib/session";
 
 // Import pages
 import LoginPage from "./pages/LoginPage";
@@ -20,7 +21,8 @@ const API = `${BACKEND_URL}/api`;
 // Protected Route components
 const ProtectedTeacherRoute = ({ children }) => {
   const currentUser = JSON.parse(localStorage.getItem("currentUser") || "null");
-  if (!currentUser || currentUser.userType !== "teacher") {
+  // Teacher pages load exams through session-checked endpoints too
+  if (!currentUser || currentUser.userType !== "teacher" || !localStorage.getItem("sessionToken")) {
     return <Navigate to="/" replace />;
   }
   return children;
@@ -28,7 +30,8 @@ const ProtectedTeacherRoute = ({ children }) => {
 
 const ProtectedStudentRoute = ({ children }) => {
   const currentStudent = JSON.parse(localStorage.getItem("currentStudent") || "null");
-  if (!currentStudent) {
+  // Logins from before signed sessions have no token and must sign in again
+  if (!currentStudent || !localStorage.getItem("sessionToken")) {
     return <Navigate to="/" replace />;
   }
   return children;
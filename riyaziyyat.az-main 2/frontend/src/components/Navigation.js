@@ -12,11 +12,13 @@ import {
 } from "./ui/dropdown-menu";
 import { Avatar, AvatarFallback } from "./ui/avatar";
 import { toast } from "sonner";
+import { clearSession } from "../lib/session";
 
 export default function Navigation() {
   const navigate = useNavigate();
 
   const handleLogout = () => {
+    clearSession();
     localStorage.removeItem("currentUser");
     localStorage.removeItem("currentStudent");
     toast.success("Çıxış uğurludur", {
@@ -12,12 +12,14 @@ import {
 } from "./ui/dropdown-menu";
 import { Avatar, AvatarFallback } from "./ui/avatar";
 import { toast } from "sonner";
+import { clearSession } from "../lib/session";
 
 export default function StudentNav() {
   const navigate = useNavigate();
   const currentStudent = JSON.parse(localStorage.getItem("currentStudent") || "{}");
 
   const handleLogout = () => {
+    clearSession();
     localStorage.removeItem("currentStudent");
     toast.success("Çıxış uğurludur", {
       description: "Sistemi tərk etdiniz."
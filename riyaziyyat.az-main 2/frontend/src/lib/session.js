@@ -0,0 +1,44 @@
+import axios from "axios";
+
+const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
+const API = `${BACKEND_URL}/api`;
+const SESSION_KEY = "sessionToken";
+
+// Every request carries the signed session issued at login
+export const setSession = (token) => {
+  if (token) {
+    localStorage.setItem(SESSION_KEY, token);
+    axios.defaults.headers.common["Authorization"] = `Bearer ${token}`;
+  }
+};
+
+export const clearSession = async () => {
+  if (localStorage.getItem(SESSION_KEY)) {
+    try {
+      await axios.post(`${API}/auth/logout`);
+    } catch (error) {
+      // Already expired or revoked
+    }
+  }
+  localStorage.removeItem(SESSION_KEY);
+  delete axios.defaults.headers.common["Authorization"];
+};
+
+// EventSource can't send headers, so live streams carry the session in the query
+export const withSessionToken = (url) => {
+  const token = localStorage.getItem(SESSION_KEY);
+  if (!token) return url;
+  return `${url}${url.includes("?") ? "&" : "?"}token=${encodeURIComponent(token)}`;
+};
+
+// Downloads go through axios so they carry the session header as well
+export const downloadFile = async (url, filename) => {
+  const response = await axios.get(url, { responseType: "blob" });
+  const link = document.createElement("a");
+  link.href = URL.createObjectURL(response.data);
+  link.download = filename;
+  link.click();
+  URL.revokeObjectURL(link.href);
+};
+
+setSession(localStorage.getItem(SESSION_KEY));
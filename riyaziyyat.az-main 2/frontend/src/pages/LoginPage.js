@@ -8,6 +8,7 @@ import { Button } from "../components/ui/button";
 import { toast } from "sonner";
 import { getInitialStudents } from "../lib/data";
 import axios from "axios";
+import { setSession } from "../lib/session";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -35,9 +36,10 @@ export default function LoginPage() {
         password
       });
 
-      const { success, userType, user, message } = response.data;
+      const { success, userType, user, message, token } = response.data;
 
       if (success) {
+        setSession(token);
         if (userType === "teacher") {
           localStorage.setItem("currentUser", JSON.stringify({ userType: "teacher", ...user }));
           toast.success("Giriş uğurludur", {
@@ -30,18 +30,16 @@ export default function StudentDashboard() {
 
   const fetchData = async () => {
     try {
-      const [examsRes, submissionsRes] = await Promise.all([
-        axios.get(`${API}/exams`),
-        axios.get(`${API}/submissions`)
-      ]);
-
-      // Filter exams for current student's group
-      const studentExams = examsRes.data.filter(exam => 
-        exam.groups.includes(currentStudent.group)
-      );
+      // Only this student's group exams, each with their own submission attached
+      const response = await axios.get(`${API}/students/${currentStudent.id}/exams`);
+      const studentExams = response.data;
 
       setExams(studentExams);
-      setSubmissions(submissionsRes.data);
+      setSubmissions(
+        studentExams
+          .filter(exam => exam.submission)
+          .map(exam => ({ ...exam.submission, examId: exam.id, studentId: currentStudent.id }))
+      );
     } catch (error) {
       console.error("Failed to fetch data:", error);
       toast.error("Xəta", {
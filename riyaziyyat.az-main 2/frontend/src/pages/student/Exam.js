@@ -11,6 +11,8 @@ import axios from "axios";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
+// Answers are autosaved once the student pauses for this long
+const AUTOSAVE_DELAY = 1500;
 
 // Timer Component
 const ExamTimer = ({ endTime, onTimeUp }) => {
@@ -77,12 +79,17 @@ export default function StudentExam() {
   const [announcement, setAnnouncement] = useState("");
   const currentStudent = JSON.parse(localStorage.getItem("currentStudent") || "{}");
   const cheatingDetectedRef = useRef(false);
+  // Answers changed since the last autosave, and the ones currently being saved
+  const unsavedAnswersRef = useRef({});
+  const savingAnswersRef = useRef({});
+  const autosaveTimerRef = useRef(null);
 
   useEffect(() => {
     fetchExam();
     initializeAntiCheat();
     
     return () => {
+      clearTimeout(autosaveTimerRef.current);
       // Cleanup event listeners
       document.removeEventListener('visibilitychange', handleVisibilityChange);
       document.removeEventListener('fullscreenchange', handleFullscreenChange);
@@ -93,6 +100,16 @@ export default function StudentExam() {
     try {
       const response = await axios.get(`${API}/exams/${examId}`);
       setExam(response.data);
+
+      // Restore answers autosaved before a reload or a closed tab
+      try {
+        const draft = await axios.get(`${API}/submissions/draft`, {
+          params: { examId, studentId: currentStudent.id }
+        });
+        setAnswers(prev => ({ ...draft.data.answers, ...prev }));
+      } catch (error) {
+        // No autosaved answers yet
+      }
       
       // Check for announcements
       const savedAnnouncement = localStorage.getItem(`announcement_${examId}`);
@@ -166,10 +183,12 @@ export default function StudentExam() {
     setSubmitting(true);
     
     try {
+      clearTimeout(autosaveTimerRef.current);
+      // Autosaved answers are already on the server; only send the rest
       const submission = {
         examId,
         studentId: currentStudent.id,
-        answers,
+        answers: { ...savingAnswersRef.current, ...unsavedAnswersRef.current },
         submittedAt: new Date().toISOString(),
         cheatingDetected: cheating
       };
@@ -214,11 +233,34 @@ export default function StudentExam() {
     }
   };
 
+  const saveAnswers = async () => {
+    const changes = unsavedAnswersRef.current;
+    if (Object.keys(changes).length === 0) return;
+    unsavedAnswersRef.current = {};
+    savingAnswersRef.current = changes;
+    try {
+      await axios.patch(`${API}/submissions/draft`, {
+        examId,
+        studentId: currentStudent.id,
+        answers: changes
+      });
+    } catch (error) {
+      console.error("Failed to autosave answers:", error);
+      // Keep them for the next save or the final submission
+      unsavedAnswersRef.current = { ...changes, ...unsavedAnswersRef.current };
+    } finally {
+      savingAnswersRef.current = {};
+    }
+  };
+
   const handleAnswerChange = (questionIndex, answer) => {
     setAnswers(prev => ({
       ...prev,
       [questionIndex]: answer
     }));
+    unsavedAnswersRef.current = { ...unsavedAnswersRef.current, [questionIndex]: String(answer) };
+    clearTimeout(autosaveTimerRef.current);
+    autosaveTimerRef.current = setTimeout(saveAnswers, AUTOSAVE_DELAY);
   };
 
   const handleTimeUp = () => {
@@ -306,7 +348,7 @@ export default function StudentExam() {
                       {question.imageUrl && (
                         <div className="relative h-64 question-image">
                           <img
-                            src={question.imageUrl}
+                            src={question.imageUrl.startsWith("/api/") ? `${BACKEND_URL}${question.imageUrl}` : question.imageUrl}
                             alt={`Sual ${index + 1}`}
                             className="w-full h-full object-contain rounded"
                           />
@@ -8,6 +8,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from ".
 import { AlertDialog, AlertDialogAction, AlertDialogCancel, AlertDialogContent, AlertDialogDescription, AlertDialogFooter, AlertDialogHeader, AlertDialogTitle, AlertDialogTrigger } from "../../components/ui/alert-dialog";
 import { toast } from "sonner";
 import axios from "axios";
+import { withSessionToken } from "../../lib/session";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -20,6 +21,31 @@ export default function TeacherCheaters() {
     fetchCheatingReports();
   }, []);
 
+  // Refresh only when a flag actually changes
+  useEffect(() => {
+    const events = new EventSource(withSessionToken(`${API}/events`));
+
+    const handleSubmission = (e) => {
+      if (JSON.parse(e.data).cheatingDetected) {
+        fetchCheatingReports();
+      }
+    };
+    const handleCheatingFlag = (e) => {
+      const data = JSON.parse(e.data);
+      if (data.cheatingDetected) {
+        fetchCheatingReports();
+      } else {
+        setCheatingReports(prev => prev.filter(report => report.id !== data.id));
+      }
+    };
+
+    events.addEventListener("submission", handleSubmission);
+    events.addEventListener("cheating-flag", handleCheatingFlag);
+    events.addEventListener("resync", fetchCheatingReports);
+
+    return () => events.close();
+  }, []);
+
   const fetchCheatingReports = async () => {
     try {
       const response = await axios.get(`${API}/cheating-reports`);
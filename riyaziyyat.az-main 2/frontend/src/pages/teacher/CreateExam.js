@@ -79,20 +79,28 @@ export default function CreateExam() {
     }, 0);
   };
 
-  const handleImageUpload = (e, questionIndex) => {
+  const handleImageUpload = async (e, questionIndex) => {
     const file = e.target.files[0];
     if (!file) return;
 
-    const reader = new FileReader();
-    reader.onload = (e) => {
+    // Images are stored once by content hash; the exam only keeps the reference
+    const formData = new FormData();
+    formData.append("file", file);
+
+    try {
+      const response = await axios.post(`${API}/images`, formData);
       setExamData(prev => ({
         ...prev,
         questions: prev.questions.map((q, i) => 
-          i === questionIndex ? { ...q, imageUrl: e.target.result } : q
+          i === questionIndex ? { ...q, imageUrl: response.data.url } : q
         )
       }));
-    };
-    reader.readAsDataURL(file);
+    } catch (error) {
+      console.error("Failed to upload image:", error);
+      toast.error("Xəta", {
+        description: "Şəkil yüklənərkən xəta baş verdi."
+      });
+    }
   };
 
   const addQuestion = () => {
@@ -383,7 +391,7 @@ export default function CreateExam() {
                               <input
                                 id={`image-${questionIndex}`}
                                 type="file"
-                                accept="image/*"
+                                accept="image/png,image/jpeg,image/gif,image/webp"
                                 onChange={(e) => handleImageUpload(e, questionIndex)}
                                 className="hidden"
                               />
@@ -392,7 +400,7 @@ export default function CreateExam() {
                           {question.imageUrl && (
                             <div className="question-image">
                               <img
-                                src={question.imageUrl}
+                                src={question.imageUrl.startsWith("/api/") ? `${BACKEND_URL}${question.imageUrl}` : question.imageUrl}
                                 alt="Question"
                                 className="w-20 h-20 object-cover rounded"
                               />
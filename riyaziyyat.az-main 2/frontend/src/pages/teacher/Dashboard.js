@@ -25,7 +25,7 @@ export default function TeacherDashboard() {
 
   const fetchExams = async () => {
     try {
-      const response = await axios.get(`${API}/exams`);
+      const response = await axios.get(`${API}/exams?summary=true`);
       setExams(response.data);
     } catch (error) {
       console.error("Failed to fetch exams:", error);
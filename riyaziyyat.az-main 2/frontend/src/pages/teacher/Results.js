@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { ArrowLeft, Eye } from "lucide-react";
+import { ArrowLeft, Download, Eye } from "lucide-react";
 import { Link, useParams } from "react-router-dom";
 import Navigation from "../../components/Navigation";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "../../components/ui/card";
@@ -8,6 +8,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from ".
 import { Badge } from "../../components/ui/badge";
 import { toast } from "sonner";
 import axios from "axios";
+import { downloadFile, withSessionToken } from "../../lib/session";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -17,10 +18,44 @@ export default function TeacherResults() {
   const [exam, setExam] = useState(null);
   const [submissions, setSubmissions] = useState([]);
   const [students, setStudents] = useState([]);
+  const [analysis, setAnalysis] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     fetchExamResults();
+    fetchAnalysis();
+  }, [examId]);
+
+  // Live updates while the exam runs instead of reloading everything
+  useEffect(() => {
+    const events = new EventSource(withSessionToken(`${API}/events?examId=${examId}`));
+
+    const upsertSubmission = (e) => {
+      const data = JSON.parse(e.data);
+      setSubmissions(prev => {
+        const existing = prev.find(s => s.id === data.id);
+        return existing
+          ? prev.map(s => (s.id === data.id ? { ...s, ...data } : s))
+          : [...prev, data];
+      });
+    };
+    const refetchSubmissions = async () => {
+      try {
+        const response = await axios.get(`${API}/submissions/exam/${examId}`);
+        setSubmissions(response.data);
+      } catch (error) {
+        console.error("Failed to refresh submissions:", error);
+      }
+    };
+
+    events.addEventListener("submission", upsertSubmission);
+    events.addEventListener("cheating-flag", upsertSubmission);
+    events.addEventListener("score", upsertSubmission);
+    events.addEventListener("regraded", refetchSubmissions);
+    events.addEventListener("regraded", fetchAnalysis);
+    events.addEventListener("resync", refetchSubmissions);
+
+    return () => events.close();
   }, [examId]);
 
   const fetchExamResults = async () => {
@@ -44,6 +79,35 @@ export default function TeacherResults() {
     }
   };
 
+  const fetchAnalysis = async () => {
+    try {
+      const response = await axios.get(`${API}/exams/${examId}/analysis`);
+      setAnalysis(response.data);
+    } catch (error) {
+      console.error("Failed to fetch item analysis:", error);
+    }
+  };
+
+  const handleExport = async () => {
+    try {
+      await downloadFile(`${API}/exams/${examId}/export`, `exam-${examId}-results.csv`);
+    } catch (error) {
+      console.error("Failed to export results:", error);
+      toast.error("Xəta", {
+        description: "Nəticələr ixrac edilərkən xəta baş verdi."
+      });
+    }
+  };
+
+  const formatPercent = (value) => (value === null || value === undefined ? "—" : `${Math.round(value * 100)}%`);
+
+  // The wrong option picked most often, if any
+  const topDistractor = (question) => {
+    const distractors = (question.options || []).filter(option => !option.correct && option.count > 0);
+    if (distractors.length === 0) return null;
+    return distractors.reduce((top, option) => (option.rate > top.rate ? option : top));
+  };
+
   const getStudentInfo = (studentId) => {
     return students.find(s => s.id === studentId) || {};
   };
@@ -76,7 +140,8 @@ export default function TeacherResults() {
       grouped[group].push({
         ...submission,
         student,
-        score: calculateScore(submission)
+        // Scored by the server on submit and on regrade; older submissions fall back to the client
+        score: submission.score ?? calculateScore(submission)
       });
     });
     
@@ -138,6 +203,12 @@ export default function TeacherResults() {
               Şagirdlərin performansının və təqdimatlarının siniflərə görə qruplaşdırılmış icmalı.
             </p>
           </div>
+          {submissions.length > 0 && (
+            <Button variant="outline" size="sm" className="ml-auto" onClick={handleExport}>
+              <Download className="mr-2 h-4 w-4" />
+              CSV ixrac et
+            </Button>
+          )}
         </div>
 
         {submissions.length === 0 ? (
@@ -210,6 +281,50 @@ export default function TeacherResults() {
                 </CardContent>
               </Card>
             ))}
+
+            {analysis && analysis.submissions > 0 && (
+              <Card>
+                <CardHeader>
+                  <CardTitle>Sualların təhlili</CardTitle>
+                  <CardDescription>
+                    Çətinlik düzgün cavab verənlərin payıdır; ayırdetmə ən yaxşı və ən zəif 27% arasındakı fərqdir.
+                  </CardDescription>
+                </CardHeader>
+                <CardContent>
+                  <Table>
+                    <TableHeader>
+                      <TableRow>
+                        <TableHead>Sual</TableHead>
+                        <TableHead>Çətinlik</TableHead>
+                        <TableHead>Ayırdetmə</TableHead>
+                        <TableHead>Cavabsız</TableHead>
+                        <TableHead>Ən çox seçilən yanlış variant</TableHead>
+                      </TableRow>
+                    </TableHeader>
+                    <TableBody>
+                      {analysis.questions.map((question) => {
+                        const distractor = topDistractor(question);
+                        return (
+                          <TableRow key={question.index}>
+                            <TableCell className="font-medium">{question.index + 1}</TableCell>
+                            <TableCell>{formatPercent(question.difficulty)}</TableCell>
+                            <TableCell>
+                              <span className="font-mono">
+                                {question.discrimination === null ? "—" : question.discrimination.toFixed(2)}
+                              </span>
+                            </TableCell>
+                            <TableCell>{formatPercent(question.omitted)}</TableCell>
+                            <TableCell>
+                              {distractor ? `${distractor.option} (${formatPercent(distractor.rate)})` : "—"}
+                            </TableCell>
+                          </TableRow>
+                        );
+                      })}
+                    </TableBody>
+                  </Table>
+                </CardContent>
+              </Card>
+            )}
           </div>
         )}
       </div>
@@ -1,5 +1,5 @@
-import React, { useState, useEffect } from "react";
-import { ArrowLeft, UserPlus, Users, KeyRound, Pencil, UserX, UserCheck, Trash2, Copy } from "lucide-react";
+import React, { useState, useEffect, useRef } from "react";
+import { ArrowLeft, UserPlus, Users, KeyRound, Pencil, UserX, UserCheck, Trash2, Copy, Upload, Download } from "lucide-react";
 import { Link } from "react-router-dom";
 import Navigation from "../../components/Navigation";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "../../components/ui/card";
@@ -13,6 +13,7 @@ import { AlertDialog, AlertDialogAction, AlertDialogCancel, AlertDialogContent,
 import { Badge } from "../../components/ui/badge";
 import { toast } from "sonner";
 import axios from "axios";
+import { downloadFile } from "../../lib/session";
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -23,6 +24,8 @@ export default function TeacherStudents() {
   const [loading, setLoading] = useState(true);
   const [editingStudent, setEditingStudent] = useState(null);
   const [newGroupName, setNewGroupName] = useState("");
+  const [importing, setImporting] = useState(false);
+  const importInputRef = useRef(null);
   const [newStudent, setNewStudent] = useState({
     name: "",
     surname: "",
@@ -103,7 +106,10 @@ export default function TeacherStudents() {
         ...student,
         status: student.status === "active" ? "disabled" : "active"
       };
-      await axios.put(`${API}/students/${student.id}`, updatedStudent);
+      // Partial update: only the status field is written
+      await axios.post(`${API}/students/bulk`, {
+        update: [{ id: student.id, changes: { status: updatedStudent.status } }]
+      });
       toast.success("Uğurludur", {
         description: `Şagird hesabı ${updatedStudent.status === "active" ? "aktivləşdirildi" : "deaktivləşdirildi"}.`
       });
@@ -131,6 +137,46 @@ export default function TeacherStudents() {
     }
   };
 
+  const handleImportStudents = async (e) => {
+    const file = e.target.files[0];
+    e.target.value = "";
+    if (!file) return;
+    setImporting(true);
+    try {
+      const formData = new FormData();
+      formData.append("file", file);
+      const { data } = await axios.post(`${API}/students/import`, formData);
+      const summary = `${data.imported} şagird əlavə edildi, ${data.updated} şagird yeniləndi.`;
+      if (data.failed > 0) {
+        const rows = data.errors.slice(0, 5).map((error) => `${error.row}-ci sətir: ${error.error}`).join("; ");
+        toast.warning("İdxal tamamlandı", {
+          description: `${summary} ${data.failed} sətir idxal edilmədi. ${rows}`
+        });
+      } else {
+        toast.success("Uğurludur", { description: summary });
+      }
+      fetchData();
+    } catch (error) {
+      console.error("Failed to import students:", error);
+      toast.error("Xəta", {
+        description: error.response?.data?.detail || "Şagirdlər idxal edilərkən xəta baş verdi."
+      });
+    } finally {
+      setImporting(false);
+    }
+  };
+
+  const handleExportStudents = async () => {
+    try {
+      await downloadFile(`${API}/students/export`, "students.csv");
+    } catch (error) {
+      console.error("Failed to export students:", error);
+      toast.error("Xəta", {
+        description: "Şagirdlər ixrac edilərkən xəta baş verdi."
+      });
+    }
+  };
+
   const handleAddGroup = async (e) => {
     e.preventDefault();
     if (!newGroupName.trim()) return;
@@ -367,10 +413,36 @@ export default function TeacherStudents() {
           <div className="md:col-span-2">
             <Card>
               <CardHeader>
-                <CardTitle>Şagird Siyahısı</CardTitle>
-                <CardDescription>
-                  Sistemdə qeydiyyatdan keçmiş bütün şagirdlərin siyahısı.
-                </CardDescription>
+                <div className="flex items-start justify-between gap-4">
+                  <div>
+                    <CardTitle>Şagird Siyahısı</CardTitle>
+                    <CardDescription>
+                      Sistemdə qeydiyyatdan keçmiş bütün şagirdlərin siyahısı.
+                    </CardDescription>
+                  </div>
+                  <div className="flex gap-2">
+                    <input
+                      ref={importInputRef}
+                      type="file"
+                      accept=".csv,text/csv"
+                      className="hidden"
+                      onChange={handleImportStudents}
+                    />
+                    <Button
+                      variant="outline"
+                      size="sm"
+                      disabled={importing}
+                      onClick={() => importInputRef.current?.click()}
+                    >
+                      <Upload className="mr-2 h-4 w-4" />
+                      {importing ? "İdxal edilir..." : "CSV idxal et"}
+                    </Button>
+                    <Button variant="outline" size="sm" onClick={handleExportStudents}>
+                      <Download className="mr-2 h-4 w-4" />
+                      CSV ixrac et
+                    </Button>
+                  </div>
+                </div>
               </CardHeader>
               <CardContent>
                 <Table>
@@ -433,19 +505,6 @@ export default function TeacherStudents() {
                                       <Copy className="h-4 w-4" />
                                     </Button>
                                   </div>
-                                  <div className="flex items-center justify-between p-3 bg-muted rounded">
-                                    <div>
-                                      <Label className="text-sm font-medium">Şifrə</Label>
-                                      <p className="font-mono">{student.pass}</p>
-                                    </div>
-                                    <Button 
-                                      variant="ghost" 
-                                      size="sm"
-                                      onClick={() => copyToClipboard(student.pass)}
-                                    >
-                                      <Copy className="h-4 w-4" />
-                                    </Button>
-                                  </div>
                                 </div>
                               </DialogContent>
                             </Dialog>
@@ -512,9 +571,9 @@ export default function TeacherStudents() {
                                       <Label>Şifrə</Label>
                                       <Input
                                         type="password"
-                                        value={editingStudent.pass}
+                                        value={editingStudent.pass || ""}
                                         onChange={(e) => setEditingStudent(prev => ({ ...prev, pass: e.target.value }))}
-                                        required
+                                        placeholder="Dəyişmək istəmirsinizsə boş saxlayın"
                                       />
                                     </div>
                                     <div>
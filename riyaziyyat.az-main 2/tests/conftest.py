@@ -0,0 +1,79 @@
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "riyaziyyat_test")
+os.environ.setdefault("SESSION_SECRET", "test-session-secret-0123456789abcdef")
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+import server
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db(monkeypatch):
+    client = AsyncMongoMockClient()
+    database = client[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "client", client)
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "session_tokens", server.SessionTokens(os.environ["SESSION_SECRET"], ttl=3600))
+    monkeypatch.setattr(server.answer_autosaver, "max_delay", 0.01)
+    server.exam_cache.clear()
+    server.analysis_cache.clear()
+    server.login_cache.clear()
+    await server.ensure_indexes()
+    yield database
+    # The batchers bind their queue to the loop of the test that used them
+    await server.submission_batcher.close()
+    await server.answer_autosaver.close()
+
+
+@pytest.fixture
+async def api(db):
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        await client.post("/api/init-data")
+        yield client
+
+
+@pytest.fixture
+def login(api):
+    async def login(email: str = "aynur.mammadova", password: str = "aynur123") -> dict:
+        response = await api.post("/api/auth/login", json={"email": email, "password": password})
+        return {"Authorization": f"Bearer {response.json()['token']}"}
+    return login
+
+
+@pytest.fixture
+async def teacher(api):
+    response = await api.post("/api/auth/login", json={"email": "Anar", "password": "Anar2025"})
+    return {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+@pytest.fixture
+async def live_exam(api, teacher) -> str:
+    """A three-question exam for group 10(1,3) that is running now; one point per answer "a"."""
+    now = datetime.now(server.EXAM_TIMEZONE).replace(tzinfo=None)
+    exam = {
+        "title": "Test",
+        "description": "",
+        "questionsCount": 3,
+        "groups": ["10(1,3)"],
+        "startTime": (now - timedelta(hours=1)).isoformat(),
+        "endTime": (now + timedelta(hours=1)).isoformat(),
+        "pointsPerQuestion": 1,
+        "status": "live",
+        "questions": [{"question": "q", "type": "free-form", "correctAnswer": "a"}] * 3,
+    }
+    response = await api.post("/api/exams", json=exam, headers=teacher)
+    return response.json()["id"]
@@ -0,0 +1,96 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+EXAM = {
+    "id": "e",
+    "pointsPerQuestion": 2,
+    "questions": [
+        {"type": "multiple-choice", "options": ["A", "B", "C"], "correctAnswer": "A"},
+        {"type": "free-form", "correctAnswer": "5"},
+    ],
+}
+
+
+def test_item_statistics():
+    submissions = [
+        {"answers": {"0": "A", "1": "5"}},
+        {"answers": {"0": "a ", "1": "5"}},
+        {"answers": {"0": "B"}},
+        {"answers": {"0": "D", "1": "6"}},
+    ]
+
+    analysis = server.analyze_items(EXAM, submissions)
+
+    assert analysis["submissions"] == 4
+    assert analysis["meanScore"] == 2.0
+    choice, free_form = analysis["questions"]
+    assert choice["difficulty"] == 0.5
+    assert choice["discrimination"] == 1.0
+    assert choice["pointBiserial"] == 1.0
+    assert choice["omitted"] == 0.0
+    assert choice["otherRate"] == 0.25
+    assert choice["options"] == [
+        {"option": "A", "correct": True, "count": 2, "rate": 0.5, "upperRate": 1.0, "lowerRate": 0.0},
+        {"option": "B", "correct": False, "count": 1, "rate": 0.25, "upperRate": 0.0, "lowerRate": 1.0},
+        {"option": "C", "correct": False, "count": 0, "rate": 0.0, "upperRate": 0.0, "lowerRate": 0.0},
+    ]
+    assert free_form["difficulty"] == 0.5
+    assert free_form["omitted"] == 0.25
+    assert free_form["options"] is None
+    assert free_form["otherRate"] is None
+
+
+def test_exam_without_submissions_has_empty_statistics():
+    analysis = server.analyze_items(EXAM, [])
+
+    assert analysis["meanScore"] is None
+    assert [question["difficulty"] for question in analysis["questions"]] == [None, None]
+
+
+def test_constant_item_has_no_point_biserial():
+    analysis = server.analyze_items(EXAM, [{"answers": {"0": "A", "1": "5"}}, {"answers": {"0": "A"}}])
+
+    assert analysis["questions"][0]["difficulty"] == 1.0
+    assert analysis["questions"][0]["pointBiserial"] is None
+
+
+async def test_analysis_endpoint(api, teacher):
+    response = await api.get("/api/exams/exam1/analysis", headers=teacher)
+
+    assert response.status_code == 200
+    assert response.json()["submissions"] == 1
+    assert response.json()["questions"][0]["difficulty"] == 1.0
+
+
+async def test_analysis_of_unknown_exam(api, teacher):
+    response = await api.get("/api/exams/missing/analysis", headers=teacher)
+
+    assert response.status_code == 404
+
+
+async def test_new_submission_invalidates_the_analysis(api, login, teacher, live_exam):
+    before = await api.get(f"/api/exams/{live_exam}/analysis", headers=teacher)
+    headers = await login()
+    await api.post(
+        "/api/submissions",
+        json={"examId": live_exam, "studentId": "2", "answers": {"0": "a"}, "submittedAt": "2025-01-01T10:00:00"},
+        headers=headers,
+    )
+
+    after = await api.get(f"/api/exams/{live_exam}/analysis", headers=teacher)
+
+    assert before.json()["submissions"] == 0
+    assert after.json()["submissions"] == 1
+    assert after.json()["questions"][0]["difficulty"] == 1.0
+
+
+async def test_regrade_invalidates_the_analysis(api, teacher):
+    await api.get("/api/exams/exam1/analysis", headers=teacher)
+
+    await api.post("/api/exams/exam1/regrade", json={"correctAnswers": {"0": "x = 1"}}, headers=teacher)
+    response = await api.get("/api/exams/exam1/analysis", headers=teacher)
+
+    assert response.json()["questions"][0]["difficulty"] == 0.0
@@ -0,0 +1,96 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def finished_exam(api, db, teacher):
+    exam = {
+        "title": "Old", "description": "", "questionsCount": 1, "groups": ["10(1,3)"],
+        "startTime": "2024-01-01T10:00", "endTime": "2024-01-01T11:00", "pointsPerQuestion": 1,
+        "status": "finished", "questions": [{"question": "q", "type": "free-form", "correctAnswer": "a"}],
+    }
+    exam_id = (await api.post("/api/exams", json=exam, headers=teacher)).json()["id"]
+    await db.submissions.insert_many([
+        {
+            "id": f"s{student_id}", "examId": exam_id, "studentId": student_id, "answers": {"0": "a"},
+            "submittedAt": "2024-01-01T10:30", "cheatingDetected": False, "score": 1, "status": "submitted",
+        }
+        for student_id in ("1", "2")
+    ])
+    return exam_id
+
+
+async def test_archive_moves_submissions_and_writes_summaries(api, db, teacher, finished_exam):
+    moved = await server.archive_exam_submissions(finished_exam)
+
+    assert moved == 2
+    assert await db.submissions.count_documents({"examId": finished_exam}) == 0
+    part = await db.submission_archives.find_one({"examId": finished_exam})
+    assert set(part) == {"_id", "examId", "part", "count", "data"}
+    summary = await db.archive_summaries.find_one({"studentId": "2"}, {"_id": 0})
+    assert summary == {
+        "examId": finished_exam, "id": "s2", "studentId": "2",
+        "submittedAt": "2024-01-01T10:30", "cheatingDetected": False, "score": 1,
+    }
+    results = (await api.get(f"/api/submissions/exam/{finished_exam}", headers=teacher)).json()
+    assert sorted(result["id"] for result in results) == ["s1", "s2"]
+
+
+async def test_archiving_again_keeps_one_summary_per_student(db, finished_exam):
+    await server.archive_exam_submissions(finished_exam)
+    await server.archive_exam_submissions(finished_exam)
+
+    assert await db.archive_summaries.count_documents({"examId": finished_exam}) == 2
+
+
+async def test_restore_and_delete_drop_summaries(db, finished_exam):
+    await server.archive_exam_submissions(finished_exam)
+
+    assert await server.restore_exam_submissions(finished_exam) == 2
+    assert await db.archive_summaries.count_documents({}) == 0
+    assert await db.submissions.count_documents({"examId": finished_exam}) == 2
+
+    await server.archive_exam_submissions(finished_exam)
+    await server.delete_exam_submissions([finished_exam])
+    assert await db.archive_summaries.count_documents({}) == 0
+    assert await db.submission_archives.count_documents({}) == 0
+
+
+async def test_archiving_again_appends_a_part_for_new_submissions(api, db, teacher, finished_exam):
+    await server.archive_exam_submissions(finished_exam)
+    first_part = await db.submission_archives.find_one({"examId": finished_exam, "part": 0})
+    await db.submissions.insert_one({
+        "id": "s3", "examId": finished_exam, "studentId": "3", "answers": {}, "submittedAt": "2024-01-01T10:40",
+        "cheatingDetected": False, "score": 0, "status": "submitted",
+    })
+
+    assert await server.archive_exam_submissions(finished_exam) == 1
+
+    parts = await db.submission_archives.find({"examId": finished_exam}).sort("part", 1).to_list(None)
+    assert [part["count"] for part in parts] == [2, 1]
+    assert parts[0]["data"] == first_part["data"]
+    results = (await api.get(f"/api/submissions/exam/{finished_exam}", headers=teacher)).json()
+    assert [result["id"] for result in results] == ["s1", "s2", "s3"]
+
+
+async def test_archiving_drops_hot_copies_left_by_an_interrupted_run(db, finished_exam):
+    leftover = await db.submissions.find_one({"id": "s2"})
+    await server.archive_exam_submissions(finished_exam)
+    await db.submissions.insert_one(leftover)
+
+    assert await server.archive_exam_submissions(finished_exam) == 0
+
+    assert await db.submissions.count_documents({"examId": finished_exam}) == 0
+    assert await db.submission_archives.count_documents({"examId": finished_exam}) == 1
+
+
+async def test_archive_parts_hold_at_most_the_part_size(db, finished_exam, monkeypatch):
+    monkeypatch.setattr(server, "ARCHIVE_PART_SIZE", 1)
+
+    assert await server.archive_exam_submissions(finished_exam) == 2
+
+    assert [part["count"] async for part in db.submission_archives.find({"examId": finished_exam})] == [1, 1]
+    assert [submission["id"] async for submission in server.archived_submissions(finished_exam)] == ["s1", "s2"]
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def submission(exam_id: str, answers: dict, submitted_at: str = "2025-01-01T10:00:00") -> dict:
+    return {"examId": exam_id, "studentId": "2", "answers": answers, "submittedAt": submitted_at}
+
+
+async def test_draft_is_not_found_before_the_first_save(api, login, live_exam):
+    headers = await login()
+
+    response = await api.get(
+        "/api/submissions/draft", params={"examId": live_exam, "studentId": "2"}, headers=headers,
+    )
+
+    assert response.status_code == 404
+
+
+async def test_autosave_rejects_answer_keys_that_are_not_indexes(api, db, login, live_exam):
+    headers = await login()
+
+    response = await api.patch(
+        "/api/submissions/draft",
+        json={"examId": live_exam, "studentId": "2", "answers": {"answers.0": "a"}},
+        headers=headers,
+    )
+
+    assert response.status_code == 400
+    assert await db.submissions.count_documents({"examId": live_exam}) == 0
+
+
+async def test_autosave_is_limited_to_the_own_drafts(api, login, live_exam):
+    headers = await login()
+    draft = {"examId": live_exam, "studentId": "1"}
+
+    saved = await api.patch("/api/submissions/draft", json={**draft, "answers": {"0": "a"}}, headers=headers)
+    read = await api.get("/api/submissions/draft", params=draft, headers=headers)
+
+    assert saved.status_code == 403
+    assert read.status_code == 403
+
+
+async def test_submission_merges_autosaved_answers(api, db, login, teacher, live_exam):
+    exam_id = live_exam
+    headers = await login()
+    draft = {"examId": exam_id, "studentId": "2"}
+
+    await api.patch("/api/submissions/draft", json={**draft, "answers": {"0": "x"}}, headers=headers)
+    saves = await asyncio.gather(
+        api.patch("/api/submissions/draft", json={**draft, "answers": {"0": "a"}}, headers=headers),
+        api.patch("/api/submissions/draft", json={**draft, "answers": {"1": "a"}}, headers=headers),
+    )
+    assert all(save.status_code == 200 for save in saves)
+    saved = await api.get("/api/submissions/draft", params=draft, headers=headers)
+    assert saved.json()["answers"] == {"0": "a", "1": "a"}
+    # Drafts are not results yet
+    assert (await api.get(f"/api/submissions/exam/{exam_id}", headers=teacher)).json() == []
+
+    response = await api.post("/api/submissions", json=submission(exam_id, {"2": "a"}), headers=headers)
+
+    assert response.json()["answers"] == {"0": "a", "1": "a", "2": "a"}
+    assert response.json()["score"] == 3
+    stored = await db.submissions.find({"examId": exam_id, "studentId": "2"}, {"_id": 0}).to_list(None)
+    assert len(stored) == 1
+    assert stored[0]["status"] == server.SUBMISSION_SUBMITTED
+
+
+async def test_submission_in_grace_period_replaces_auto_submitted_draft(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+    await api.patch(
+        "/api/submissions/draft",
+        json={"examId": exam_id, "studentId": "2", "answers": {"0": "a"}},
+        headers=headers,
+    )
+
+    await server.finalize_exam_scores(exam_id)
+    finalized = await db.submissions.find_one({"examId": exam_id, "studentId": "2"}, {"_id": 0})
+    assert finalized["status"] == server.SUBMISSION_SUBMITTED
+    assert finalized["autoSubmitted"] is True
+    assert finalized["score"] == 1
+
+    response = await api.post(
+        "/api/submissions", json=submission(exam_id, {"1": "a"}, "2025-01-01T11:00:00"), headers=headers,
+    )
+
+    assert response.json()["answers"] == {"0": "a", "1": "a"}
+    stored = await db.submissions.find({"examId": exam_id, "studentId": "2"}, {"_id": 0}).to_list(None)
+    assert len(stored) == 1
+    assert "autoSubmitted" not in stored[0]
+    assert stored[0]["submittedAt"] == "2025-01-01T11:00:00"
+    assert stored[0]["score"] == 2
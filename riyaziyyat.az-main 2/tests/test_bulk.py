@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_bulk_update_changes_only_given_fields(api, db, teacher):
+    before = await db.students.find_one({"id": "2"}, {"_id": 0})
+
+    response = await api.post("/api/students/bulk", json={
+        "update": [
+            {"id": "2", "changes": {"class": "11b", "pass": "new-pass"}},
+            {"id": "missing", "changes": {"name": "Nobody"}},
+        ],
+    }, headers=teacher)
+
+    assert [(item["id"], item["ok"]) for item in response.json()] == [("2", True), ("missing", False)]
+    after = await db.students.find_one({"id": "2"}, {"_id": 0})
+    assert after["class"] == "11b"
+    assert after["pass"] != "new-pass"
+    unchanged = {field: value for field, value in before.items() if field not in ("class", "pass")}
+    assert {field: after[field] for field in unchanged} == unchanged
+
+    login = await api.post("/api/auth/login", json={"email": before["email"], "password": "new-pass"})
+    assert login.json()["success"] is True
+
+
+async def test_bulk_create_and_delete(api, db, teacher):
+    student = {
+        "id": "new", "name": "Leyla", "surname": "Həsənova", "email": "leyla", "pass": "p",
+        "group": "10(1,3)", "class": "10a", "parentContact": "+994500000000",
+    }
+
+    response = await api.post("/api/students/bulk", json={"create": [student], "delete": ["1", "missing"]}, headers=teacher)
+
+    assert [(item["op"], item["ok"]) for item in response.json()] == [
+        ("create", True), ("delete", True), ("delete", False),
+    ]
+    assert await db.students.find_one({"id": "new"}) is not None
+    assert await db.students.find_one({"id": "1"}) is None
+
+
+async def test_bulk_update_ignores_null_changes(api, db, teacher):
+    before = await db.students.find_one({"id": "2"}, {"_id": 0})
+
+    response = await api.post("/api/students/bulk", json={
+        "update": [{"id": "2", "changes": {"name": None, "pass": None, "class": "11b"}}],
+    }, headers=teacher)
+
+    assert response.json()[0]["ok"] is True
+    after = await db.students.find_one({"id": "2"}, {"_id": 0})
+    assert (after["name"], after["pass"], after["class"]) == (before["name"], before["pass"], "11b")
+    login = await api.post("/api/auth/login", json={"email": before["email"], "password": "aynur123"})
+    assert login.json()["success"] is True
+
+
+async def test_bulk_groups_keep_groups_that_have_students(api, db, teacher):
+    response = await api.post("/api/groups/bulk", json={"create": ["NEW"], "delete": ["10(1,3)", "10B"]}, headers=teacher)
+
+    results = {(item["op"], item["id"]): item for item in response.json()}
+    assert results[("create", "NEW")]["ok"] is True
+    assert results[("delete", "10(1,3)")]["ok"] is False
+    assert results[("delete", "10(1,3)")]["error"] == "Cannot delete group with students"
+    assert results[("delete", "10B")]["ok"] is True
+    assert sorted(await db.groups.distinct("name")) == ["10(1,3)", "11S", "9A", "NEW"]
+
+
+async def test_bulk_exam_delete_removes_their_submissions(api, db, teacher):
+    response = await api.post("/api/exams/bulk", json={"delete": ["exam1", "missing"]}, headers=teacher)
+
+    body = response.json()
+    assert [(item["id"], item["ok"]) for item in body["results"]] == [("exam1", True), ("missing", False)]
+    assert await db.exams.find_one({"id": "exam1"}) is None
+    if body["jobId"]:
+        for _ in range(100):
+            job = (await api.get(f"/api/jobs/{body['jobId']}", headers=teacher)).json()
+            if job["status"] != "running":
+                break
+            await asyncio.sleep(0.01)
+        assert job["status"] == "done"
+    assert await db.submissions.count_documents({"examId": "exam1"}) == 0
@@ -0,0 +1,51 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def flagged(api, db):
+    # The second and last have no student or exam any more
+    pairs = [("exam1", "2"), ("exam1", "ghost"), ("exam2", "2"), ("exam2", "3"), ("gone", "2")]
+    await db.submissions.insert_many([
+        {"id": f"flag{index}", "examId": exam_id, "studentId": student_id, "answers": {},
+         "submittedAt": "2025-01-01T10:00", "cheatingDetected": True, "score": 0, "status": "submitted"}
+        for index, (exam_id, student_id) in enumerate(pairs)
+    ])
+
+
+async def test_pages_skip_missing_joins_without_coming_back_short(api, teacher, flagged):
+    first = await api.get("/api/cheating-reports", params={"limit": 2}, headers=teacher)
+
+    assert [report["id"] for report in first.json()] == ["flag0", "flag2"]
+    cursor = first.headers["X-Next-Cursor"]
+    second = await api.get("/api/cheating-reports", params={"limit": 2, "after": cursor}, headers=teacher)
+    assert [report["id"] for report in second.json()] == ["flag3"]
+    assert "X-Next-Cursor" not in second.headers
+
+
+async def test_without_a_limit_every_report_is_streamed(api, teacher, flagged):
+    response = await api.get("/api/cheating-reports", headers=teacher)
+
+    assert response.json() == [
+        {"id": "flag0", "studentName": "Aynur Məmmədova", "group": "10(1,3)", "examTitle": "Quiz",
+         "submittedAt": "2025-01-01T10:00"},
+        {"id": "flag2", "studentName": "Aynur Məmmədova", "group": "10(1,3)", "examTitle": "3",
+         "submittedAt": "2025-01-01T10:00"},
+        {"id": "flag3", "studentName": "Fuad Əliyev", "group": "11S", "examTitle": "3",
+         "submittedAt": "2025-01-01T10:00"},
+    ]
+
+
+async def test_reports_filter_by_exam_and_group(api, teacher, flagged):
+    by_exam = await api.get("/api/cheating-reports", params={"examId": "exam2"}, headers=teacher)
+    by_group = await api.get("/api/cheating-reports", params={"group": "11S"}, headers=teacher)
+
+    assert [report["id"] for report in by_exam.json()] == ["flag2", "flag3"]
+    assert [report["id"] for report in by_group.json()] == ["flag3"]
+
+
+async def test_invalid_cursor_is_rejected(api, teacher):
+    response = await api.get("/api/cheating-reports", params={"after": "nope", "limit": 2}, headers=teacher)
+
+    assert response.status_code == 400
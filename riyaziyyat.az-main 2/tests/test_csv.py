@@ -0,0 +1,80 @@
+import csv
+import io
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def import_csv(api, teacher, body: str):
+    files = {"file": ("students.csv", body.encode(), "text/csv")}
+    return await api.post("/api/students/import", files=files, headers=teacher)
+
+
+async def test_import_reads_quoted_and_multi_line_records(api, db, teacher):
+    body = (
+        "name;surname;email;pass;group;class;parentContact\r\n"
+        'Ali;"Məmmədov; oğlu";ali;p1;NEW;10a;"+994 50\r\n111 11 11"\r\n'
+        '"Say ""Hi""";Quliyev;say;p2;NEW;10a;+994501112233\r\n'
+    )
+
+    response = await import_csv(api, teacher, "﻿" + body)
+
+    assert response.json() == {"imported": 2, "updated": 0, "failed": 0, "errors": []}
+    ali = await db.students.find_one({"email": "ali"}, {"_id": 0})
+    assert ali["surname"] == "Məmmədov; oğlu"
+    assert ali["parentContact"] == "+994 50\r\n111 11 11"
+    assert await db.students.find_one({"name": 'Say "Hi"'}) is not None
+    assert await db.groups.find_one({"name": "NEW"}) is not None
+
+
+async def test_import_updates_by_id_and_reports_bad_rows(api, db, teacher):
+    body = (
+        "id,name,surname,email,pass,group,class,parentContact\n"
+        "2,,Yeni,,,,,\n"
+        ",Bad,Row,,,G,10a,1\n"
+        ",Too,Many,x,p,G,10a,1,extra\n"
+    )
+
+    response = await import_csv(api, teacher, body)
+
+    result = response.json()
+    assert (result["imported"], result["updated"], result["failed"]) == (0, 1, 2)
+    assert [error["row"] for error in result["errors"]] == [3, 4]
+    student = await db.students.find_one({"id": "2"}, {"_id": 0})
+    assert (student["name"], student["surname"]) == ("Aynur", "Yeni")
+
+
+async def test_import_reports_the_line_a_record_starts_on(api, teacher):
+    body = (
+        "name,surname,email,pass,group,class,parentContact\n"
+        'Ali,"Two\nlines",ali,p,G,10a,1\n'
+        '"Three\nline\nname",X,three,p,G,10a,1\n'
+        "Bad,Row,,,G,10a,1\n"
+        'Also,"bad\nrow",,,G,10a,1\n'
+    )
+
+    response = await import_csv(api, teacher, body)
+
+    assert [error["row"] for error in response.json()["errors"]] == [7, 8]
+
+
+async def test_student_export_has_no_passwords_and_escapes_formulas(api, db, teacher):
+    await db.students.update_one({"id": "1"}, {"$set": {"name": "=HYPERLINK(1)"}})
+
+    response = await api.get("/api/students/export", params={"group": "10(1,3)"}, headers=teacher)
+
+    assert response.headers["content-disposition"] == 'attachment; filename="students.csv"'
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0] == ["id", "name", "surname", "email", "group", "class", "parentContact", "status"]
+    assert [row[0] for row in rows[1:]] == ["1", "2"]
+    assert rows[1][1] == "'=HYPERLINK(1)"
+
+
+async def test_result_export_lists_answers_per_question(api, teacher):
+    response = await api.get("/api/exams/exam1/export", headers=teacher)
+
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert rows[0][-1] == "Q1"
+    assert rows[1][:2] == ["1", "Nijat"]
+    assert rows[1][-1] == "x = -2, x = -3"
@@ -0,0 +1,83 @@
+import pytest
+
+import server
+
+msgpack = pytest.importorskip("msgpack")
+
+pytestmark = pytest.mark.anyio
+
+MSGPACK = {"Accept": server.MSGPACK_MEDIA_TYPE}
+
+
+async def test_msgpack_page_is_one_array(api, teacher):
+    response = await api.get("/api/students", params={"limit": 2}, headers={**teacher, **MSGPACK})
+
+    assert response.headers["content-type"] == server.MSGPACK_MEDIA_TYPE
+    page = msgpack.unpackb(response.content)
+    assert [student["id"] for student in page] == ["1", "2"]
+    assert "X-Next-Cursor" in response.headers
+
+
+async def test_msgpack_listing_streams_one_object_per_student(api, db, teacher):
+    response = await api.get("/api/students", headers={**teacher, **MSGPACK})
+
+    unpacker = msgpack.Unpacker()
+    unpacker.feed(response.content)
+    students = list(unpacker)
+    assert len(students) == await db.students.count_documents({})
+    assert all(isinstance(student, dict) for student in students)
+
+
+@pytest.fixture
+async def large_exam(api, teacher):
+    exam = {
+        "title": "Large", "description": "", "questionsCount": 40, "groups": ["10(1,3)"],
+        "startTime": "2025-01-01T10:00", "endTime": "2025-01-01T11:00", "pointsPerQuestion": 1,
+        "questions": [{"question": f"Question {index} " * 5, "type": "free-form", "correctAnswer": "a"}
+                      for index in range(40)],
+    }
+    return (await api.post("/api/exams", json=exam, headers=teacher)).json()["id"]
+
+
+@pytest.mark.parametrize("coding", [
+    "gzip",
+    pytest.param("br", marks=pytest.mark.skipif(server.brotli is None, reason="brotli is not installed")),
+])
+async def test_compressed_exam_gets_a_weak_etag(api, login, large_exam, coding):
+    headers = await login()
+
+    identity = await api.get(f"/api/exams/{large_exam}", headers={**headers, "Accept-Encoding": "identity"})
+    compressed = await api.get(f"/api/exams/{large_exam}", headers={**headers, "Accept-Encoding": coding})
+
+    assert "content-encoding" not in identity.headers
+    assert compressed.headers["content-encoding"] == coding
+    assert compressed.headers["etag"] == "W/" + identity.headers["etag"]
+    assert compressed.json() == identity.json()
+
+
+@pytest.mark.parametrize("if_none_match", [
+    "{etag}",
+    "{weak}",
+    '"other", {weak}',
+    "*",
+])
+async def test_if_none_match_revalidates(api, login, large_exam, if_none_match):
+    headers = {**await login(), "Accept-Encoding": "gzip"}
+    etag = (await api.get(f"/api/exams/{large_exam}", headers=headers)).headers["etag"]
+    strong = etag.removeprefix("W/")
+
+    response = await api.get(f"/api/exams/{large_exam}", headers={
+        **headers, "If-None-Match": if_none_match.format(etag=strong, weak="W/" + strong),
+    })
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+
+
+async def test_if_none_match_of_another_representation_does_not_match(api, login, large_exam):
+    headers = await login()
+    etag = (await api.get(f"/api/exams/{large_exam}", headers=headers)).headers["etag"]
+
+    response = await api.get(f"/api/exams/{large_exam}", headers={**headers, **MSGPACK, "If-None-Match": etag})
+
+    assert response.status_code == 200
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_misses_share_one_load():
+    cache = server.ExamCache()
+    loads = []
+
+    async def loader(exam_id):
+        loads.append(exam_id)
+        await asyncio.sleep(0.01)
+        return exam_id.upper()
+
+    values = await asyncio.gather(*[cache.get("e", loader) for _ in range(5)])
+
+    assert values == ["E"] * 5
+    assert loads == ["e"]
+    assert await cache.get("e", loader) == "E"
+    assert loads == ["e"]
+
+
+async def test_a_waiter_takes_over_when_the_loader_is_cancelled():
+    cache = server.ExamCache()
+    started = asyncio.Event()
+    loads = 0
+
+    async def loader(exam_id):
+        nonlocal loads
+        loads += 1
+        if loads == 1:
+            started.set()
+            await asyncio.sleep(10)
+        return "value"
+
+    leader = asyncio.create_task(cache.get("e", loader))
+    await started.wait()
+    waiters = [asyncio.create_task(cache.get("e", loader)) for _ in range(3)]
+    await asyncio.sleep(0)
+    leader.cancel()
+
+    assert await asyncio.gather(*waiters) == ["value"] * 3
+    assert loads == 2
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+async def test_invalidate_drops_the_entry():
+    cache = server.ExamCache()
+    values = iter(["old", "new"])
+
+    async def loader(exam_id):
+        return next(values)
+
+    assert await cache.get("e", loader) == "old"
+    cache.invalidate("e")
+    assert await cache.get("e", loader) == "new"
+
+
+async def test_exam_etag_revalidates_until_the_exam_is_deleted(api, login, teacher):
+    headers = await login()
+    etag = (await api.get("/api/exams/exam1", headers=headers)).headers["etag"]
+
+    cached = await api.get("/api/exams/exam1", headers={**headers, "If-None-Match": etag})
+    assert cached.status_code == 304
+
+    await api.delete("/api/exams/exam1", headers=teacher)
+    assert (await api.get("/api/exams/exam1", headers={**headers, "If-None-Match": etag})).status_code == 404
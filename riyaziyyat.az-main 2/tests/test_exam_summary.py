@@ -0,0 +1,43 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+SUMMARY_FIELDS = set(server.ExamSummary.model_fields)
+
+
+def test_summary_projection_leaves_out_the_questions():
+    assert "questions" not in server.EXAM_SUMMARY_PROJECTION
+    assert set(server.EXAM_SUMMARY_PROJECTION) == SUMMARY_FIELDS
+
+
+@pytest.mark.parametrize("params", [{"summary": "true"}, {"summary": "true", "limit": 1}])
+async def test_summary_listing_has_no_questions(api, teacher, params):
+    response = await api.get("/api/exams", params=params, headers=teacher)
+
+    assert response.json()
+    assert all(set(exam) == SUMMARY_FIELDS for exam in response.json())
+
+
+async def test_summary_matches_the_full_listing(api, teacher):
+    full = (await api.get("/api/exams", headers=teacher)).json()
+    summary = (await api.get("/api/exams", params={"summary": "true"}, headers=teacher)).json()
+
+    assert all(exam["questions"] for exam in full)
+    assert summary == [{field: exam[field] for field in SUMMARY_FIELDS} for exam in full]
+
+
+async def test_summary_filters_by_status(api, teacher):
+    response = await api.get("/api/exams", params={"summary": "true", "status": "live"}, headers=teacher)
+
+    assert [exam["id"] for exam in response.json()] == ["exam1"]
+
+
+async def test_student_exams_have_no_questions(api, login):
+    headers = await login()
+
+    response = await api.get("/api/students/2/exams", headers=headers)
+
+    assert response.json()
+    assert all("questions" not in exam for exam in response.json())
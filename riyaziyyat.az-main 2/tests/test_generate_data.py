@@ -0,0 +1,55 @@
+from datetime import date
+
+import pytest
+
+import server
+from generate_data import APP_COLLECTIONS, DatasetSpec, drop_app_data, generate
+
+pytestmark = pytest.mark.anyio
+
+SPEC = DatasetSpec(
+    students=60, groups=4, exams=6, min_questions=3, max_questions=5, password="pw", seed=3,
+    today=date(2025, 9, 1), batch_size=25,
+)
+
+
+async def test_generate_writes_consistent_documents(db):
+    counts = await generate(db, SPEC, images=False)
+
+    assert counts["students"] == 60
+    assert counts["groups"] == 4
+    assert counts["exams"] == 6
+    assert counts["submissions"] == await db.submissions.count_documents({})
+    assert await db[f"{server.IMAGE_BUCKET}.files"].count_documents({}) == 0
+    exams = {exam["id"]: exam async for exam in db.exams.find({}, {"_id": 0})}
+    async for submission in db.submissions.find({"status": server.SUBMISSION_SUBMITTED}):
+        answer_key = exams[submission["examId"]]["answerKey"]
+        assert submission["score"] == server.score_answers(answer_key, submission["answers"])
+
+
+async def test_generate_is_deterministic(db):
+    await generate(db, SPEC, images=False)
+    first = await db.students.find({}, {"_id": 0, "pass": 0}).to_list(None)
+    await drop_app_data(db)
+    await generate(db, SPEC, images=False)
+
+    assert await db.students.find({}, {"_id": 0, "pass": 0}).to_list(None) == first
+
+
+async def test_generated_students_log_in(api, db):
+    await drop_app_data(db)
+    await generate(db, SPEC, images=False)
+    student = await db.students.find_one({"status": "active"})
+
+    response = await api.post("/api/auth/login", json={"email": student["email"], "password": "pw"})
+
+    assert response.json()["success"] is True
+
+
+async def test_drop_app_data_clears_every_collection(db):
+    for collection in APP_COLLECTIONS:
+        await db[collection].insert_one({"x": 1})
+
+    await drop_app_data(db)
+
+    assert [await db[collection].count_documents({}) for collection in APP_COLLECTIONS] == [0] * len(APP_COLLECTIONS)
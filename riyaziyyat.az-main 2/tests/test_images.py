@@ -0,0 +1,49 @@
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><script>alert(1)</script></svg>'
+
+
+@pytest.mark.parametrize("data, content_type", [
+    (b"\x89PNG\r\n\x1a\n....", "image/png"),
+    (b"\xff\xd8\xff\xe0....", "image/jpeg"),
+    (b"GIF89a....", "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+])
+def test_sniff_image_type(data, content_type):
+    assert server.sniff_image_type(data) == content_type
+
+
+@pytest.mark.parametrize("data", [SVG, b"<html></html>", b"RIFF\x00\x00\x00\x00WAVE", b""])
+def test_sniff_image_type_rejects_other_content(data):
+    with pytest.raises(HTTPException) as exc:
+        server.sniff_image_type(data)
+    assert exc.value.status_code == 415
+
+
+async def test_upload_rejects_svg_declared_as_png(api, teacher):
+    response = await api.post("/api/images", files={"file": ("x.png", SVG, "image/png")}, headers=teacher)
+
+    assert response.status_code == 415
+
+
+async def test_exam_with_inline_svg_is_rejected(api, db, teacher):
+    exam = {
+        "title": "t", "description": "", "questionsCount": 1, "groups": ["10(1,3)"],
+        "startTime": "2025-01-01T10:00", "endTime": "2025-01-01T11:00", "pointsPerQuestion": 1,
+        "questions": [{
+            "question": "q", "type": "free-form", "correctAnswer": "a",
+            "imageUrl": "data:image/png;base64," + base64.b64encode(SVG).decode(),
+        }],
+    }
+
+    response = await api.post("/api/exams", json=exam, headers=teacher)
+
+    assert response.status_code == 415
+    assert await db.exams.count_documents({"title": "t"}) == 0
@@ -0,0 +1,37 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+UNIQUE_SUBMISSION_INDEX = "examId_1_studentId_1"
+
+
+@pytest.fixture
+async def duplicates(db):
+    await db.submissions.drop_index(UNIQUE_SUBMISSION_INDEX)
+    await db.submissions.insert_many([
+        {"id": "draft", "examId": "e", "studentId": "2", "status": server.SUBMISSION_IN_PROGRESS,
+         "submittedAt": "2025-01-01T09:00"},
+        {"id": "late", "examId": "e", "studentId": "2", "status": "submitted", "submittedAt": "2025-01-01T10:05"},
+        {"id": "first", "examId": "e", "studentId": "2", "status": "submitted", "submittedAt": "2025-01-01T10:00"},
+        {"id": "other", "examId": "e", "studentId": "1", "status": "submitted", "submittedAt": "2025-01-01T10:00"},
+    ])
+
+
+async def test_duplicate_submissions_stop_startup(duplicates):
+    assert await server.ensure_indexes() == [f"submissions.{UNIQUE_SUBMISSION_INDEX}"]
+
+    with pytest.raises(RuntimeError, match="dedupe_submissions"):
+        await server.create_indexes()
+
+
+async def test_dedupe_keeps_the_first_finished_submission(db, duplicates):
+    assert await server.dedupe_submissions(dry_run=True) == 2
+    assert await db.submissions.count_documents({}) == 4
+
+    assert await server.dedupe_submissions() == 2
+
+    remaining = await db.submissions.distinct("id")
+    assert sorted(remaining) == ["first", "other"]
+    assert await server.ensure_indexes() == []
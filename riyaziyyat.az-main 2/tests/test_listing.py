@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+LISTINGS = ["/api/students", "/api/exams", "/api/submissions"]
+
+
+@pytest.mark.parametrize("path", LISTINGS)
+async def test_keyset_pages_cover_the_full_listing(api, teacher, path):
+    full = (await api.get(path, headers=teacher)).json()
+    pages, params = [], {"limit": 1}
+
+    while True:
+        response = await api.get(path, params=params, headers=teacher)
+        assert response.status_code == 200
+        pages.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+        params = {"limit": 1, "after": cursor}
+
+    assert full
+    assert pages == full
+
+
+async def test_short_page_has_no_next_cursor(api, teacher):
+    response = await api.get("/api/students", params={"limit": 1000}, headers=teacher)
+
+    assert len(response.json()) == 3
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.parametrize("params", [{}, {"limit": 2}])
+async def test_ndjson_listing(api, teacher, params):
+    headers = {**teacher, "Accept": "application/x-ndjson"}
+
+    response = await api.get("/api/students", params=params, headers=headers)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = response.text.splitlines()
+    assert len(lines) == params.get("limit", 3)
+    assert [json.loads(line)["id"] for line in lines] == ["1", "2", "3"][:len(lines)]
+
+
+@pytest.mark.parametrize("path", LISTINGS)
+async def test_invalid_cursor_is_rejected(api, teacher, path):
+    response = await api.get(path, params={"limit": 1, "after": "not-an-id"}, headers=teacher)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("limit", [0, 1001])
+async def test_limit_out_of_range_is_rejected(api, teacher, limit):
+    response = await api.get("/api/students", params={"limit": limit}, headers=teacher)
+
+    assert response.status_code == 422
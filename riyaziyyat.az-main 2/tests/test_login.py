@@ -0,0 +1,110 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+AYNUR = {"email": "aynur.mammadova", "password": "aynur123"}
+
+
+async def test_teacher_login(api):
+    response = await api.post("/api/auth/login", json={"email": "Anar", "password": "Anar2025"})
+
+    assert response.json()["success"] is True
+    assert response.json()["userType"] == "teacher"
+    assert response.json()["token"]
+
+
+async def test_student_login_by_email(api):
+    response = await api.post("/api/auth/login", json=AYNUR)
+
+    assert response.json()["success"] is True
+    assert response.json()["userType"] == "student"
+    assert response.json()["user"]["id"] == "2"
+    assert response.json()["token"]
+
+
+@pytest.mark.parametrize("credentials", [
+    {"email": "aynur.mammadova", "password": "wrong"},
+    {"email": "nobody", "password": "aynur123"},
+])
+async def test_wrong_credentials_are_refused(api, credentials):
+    response = await api.post("/api/auth/login", json=credentials)
+
+    assert response.json()["success"] is False
+    assert response.json()["message"] == "İstifadəçi adı və ya şifrə yanlışdır."
+    assert response.json().get("token") is None
+
+
+async def test_disabled_account_is_refused(api):
+    response = await api.post("/api/auth/login", json={"email": "fuad.aliyev", "password": "fuad123"})
+
+    assert response.json()["success"] is False
+    assert response.json()["message"] == "Hesabınız deaktiv edilib."
+    assert server.login_cache.get("fuad.aliyev", "fuad123") is None
+
+
+async def test_duplicate_emails_are_told_apart_by_password(api, db):
+    await db.students.insert_one({
+        "id": "dup", "name": "Aynur", "surname": "Əliyeva", "email": "aynur.mammadova", "pass": "other",
+        "group": "9A", "class": "9a", "parentContact": "+994500000000", "status": "active",
+    })
+
+    first = await api.post("/api/auth/login", json=AYNUR)
+    second = await api.post("/api/auth/login", json={"email": "aynur.mammadova", "password": "other"})
+
+    assert first.json()["user"]["id"] == "2"
+    assert second.json()["user"]["id"] == "dup"
+
+
+async def test_repeated_login_skips_password_verification(api, monkeypatch):
+    await api.post("/api/auth/login", json=AYNUR)
+    calls = []
+
+    async def verify(password, stored):
+        calls.append(password)
+        return False, None
+
+    monkeypatch.setattr(server.password_hasher, "verify", verify)
+    response = await api.post("/api/auth/login", json=AYNUR)
+
+    assert response.json()["success"] is True
+    assert calls == []
+
+
+async def test_password_change_invalidates_the_cached_login(api, teacher):
+    await api.post("/api/auth/login", json=AYNUR)
+    student = (await api.get("/api/students", headers=teacher)).json()[1]
+
+    await api.put("/api/students/2", json={**student, "pass": "changed"}, headers=teacher)
+    old = await api.post("/api/auth/login", json=AYNUR)
+    new = await api.post("/api/auth/login", json={"email": "aynur.mammadova", "password": "changed"})
+
+    assert old.json()["success"] is False
+    assert new.json()["success"] is True
+
+
+async def test_deleted_student_cannot_log_in_from_the_cache(api, teacher):
+    await api.post("/api/auth/login", json=AYNUR)
+
+    await api.delete("/api/students/2", headers=teacher)
+    response = await api.post("/api/auth/login", json=AYNUR)
+
+    assert response.json()["success"] is False
+
+
+def test_login_cache_expires_and_evicts(monkeypatch):
+    cache = server.LoginCache(maxsize=2, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+
+    cache.put("a", "p", {"id": "1"})
+    cache.put("b", "p", {"id": "2"})
+    assert cache.get("a", "p") == {"id": "1"}
+    assert cache.get("a", "wrong") is None
+    cache.put("c", "p", {"id": "3"})
+    # "b" was the least recently used
+    assert cache.get("b", "p") is None
+
+    now[0] += 11
+    assert cache.get("a", "p") is None
@@ -0,0 +1,91 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def durations(monkeypatch):
+    histogram = server.Histogram("test_duration", "", ("method", "route", "status"), server.LATENCY_BUCKETS)
+    monkeypatch.setattr(server, "http_request_duration", histogram)
+    monkeypatch.setattr(server, "SLOW_REQUEST_SECONDS", 0.0)
+    return histogram
+
+
+async def serve(content_type: str) -> None:
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type.encode())]})
+        await send({"type": "http.response.body", "body": b"data: {}\n\n"})
+
+    scope = {"type": "http", "method": "GET", "path": "/api/events", "root_path": "", "app": server.app}
+    await server.MetricsMiddleware(app)(scope, None, discard)
+
+
+async def discard(message):
+    pass
+
+
+async def test_event_streams_are_not_timed_or_logged_as_slow(durations, caplog):
+    with caplog.at_level(logging.WARNING):
+        await serve("text/event-stream; charset=utf-8")
+
+    assert durations._series == {}
+    assert "Slow request" not in caplog.text
+
+
+async def test_other_responses_are_timed_and_logged_as_slow(durations, caplog):
+    with caplog.at_level(logging.WARNING):
+        await serve("application/json")
+
+    assert list(durations._series) == [("GET", "/api/events", "200")]
+    assert "Slow request GET /api/events" in caplog.text
+
+
+async def test_metrics_endpoint_reports_routes(api):
+    await api.get("/api/exams/exam1")
+
+    response = await api.get("/metrics")
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/exams/{exam_id}",status="401"}' in response.text
+    assert "http_requests_in_flight" in response.text
+
+
+def command(monitor, name, body, reply, request_id):
+    monitor.started(SimpleNamespace(command_name=name, command=body, connection_id=("db", 1), request_id=request_id))
+    monitor.succeeded(SimpleNamespace(
+        command_name=name, reply=reply, connection_id=("db", 1), request_id=request_id, duration_micros=1000,
+    ))
+
+
+def test_get_more_is_charged_to_the_cursors_collection():
+    monitor = server.MongoCommandMonitor()
+    stats = server.RequestStats()
+    token = server.current_request_stats.set(stats)
+    try:
+        command(monitor, "find", {"find": "students"}, {"cursor": {"id": 42, "firstBatch": [{}, {}]}}, 1)
+        command(monitor, "getMore", {"getMore": 42}, {"cursor": {"id": 42, "nextBatch": [{}]}}, 2)
+        command(monitor, "getMore", {"getMore": 42}, {"cursor": {"id": 0, "nextBatch": [{}]}}, 3)
+    finally:
+        server.current_request_stats.reset(token)
+
+    assert [(name, collection, documents) for name, collection, _, documents in stats.commands] == [
+        ("find", "students", 2), ("getMore", "students", 1), ("getMore", "students", 1),
+    ]
+    assert stats.documents == 4
+    # Forgotten once drained
+    assert 42 not in monitor._cursors
+
+
+def test_killed_cursors_are_forgotten():
+    monitor = server.MongoCommandMonitor()
+
+    command(monitor, "aggregate", {"aggregate": "submissions"}, {"cursor": {"id": 7, "firstBatch": []}}, 1)
+    assert monitor._cursors == {7: "submissions"}
+    command(monitor, "killCursors", {"killCursors": "submissions", "cursors": [7]}, {"ok": 1}, 2)
+
+    assert monitor._cursors == {}
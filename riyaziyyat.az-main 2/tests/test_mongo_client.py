@@ -0,0 +1,119 @@
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+from pymongo import ReadPreference
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeClient:
+    """Just what /health reads from a Motor client."""
+
+    def __init__(self, ping):
+        self.options = SimpleNamespace(pool_options=SimpleNamespace(max_pool_size=10))
+        self.topology_description = SimpleNamespace(server_descriptions=lambda: {
+            ("mongo", 27017): SimpleNamespace(round_trip_time=0.0015),
+        })
+        self.admin = SimpleNamespace(command=ping)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def no_client(monkeypatch):
+    monkeypatch.setattr(server, "client", None)
+    monkeypatch.setattr(server, "db", None)
+    monkeypatch.setattr(server, "client_pid", None)
+
+
+def test_client_options_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "250")
+    monkeypatch.setenv("MONGO_SOCKET_TIMEOUT_MS", "3000")
+    monkeypatch.setenv("MONGO_READ_PREFERENCE", "secondaryPreferred")
+
+    options = server.mongo_client_options()
+
+    assert options["maxPoolSize"] == 7
+    assert options["waitQueueTimeoutMS"] == 250
+    assert options["socketTimeoutMS"] == 3000
+    assert options["read_preference"] == ReadPreference.SECONDARY_PREFERRED
+
+
+def test_client_options_defaults(monkeypatch):
+    for name in ("MONGO_MAX_POOL_SIZE", "MONGO_SOCKET_TIMEOUT_MS", "MONGO_READ_PREFERENCE"):
+        monkeypatch.delenv(name, raising=False)
+
+    options = server.mongo_client_options()
+
+    assert options["maxPoolSize"] == 100
+    assert options["socketTimeoutMS"] is None
+    assert options["read_preference"] == ReadPreference.PRIMARY
+
+
+async def test_connect_mongo_reuses_the_client_of_the_process(no_client, monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "7")
+
+    client = server.connect_mongo()
+    try:
+        assert server.connect_mongo() is client
+        assert server.client_pid == os.getpid()
+        assert server.db.name == os.environ["DB_NAME"]
+        assert client.options.pool_options.max_pool_size == 7
+    finally:
+        server.close_mongo()
+    assert server.client is None
+
+
+async def test_forked_worker_replaces_the_inherited_client(no_client):
+    inherited = FakeClient(None)
+    server.client, server.client_pid = inherited, os.getpid() + 1
+
+    # The parent's client is neither reused nor closed from the child
+    server.close_mongo()
+    assert inherited.closed is False
+    assert server.client is None
+
+    server.client, server.client_pid = inherited, os.getpid() + 1
+    client = server.connect_mongo()
+    try:
+        assert client is not inherited
+        assert inherited.closed is False
+    finally:
+        server.close_mongo()
+
+
+async def test_health_reports_ping_and_pool(api, monkeypatch):
+    async def ping(command):
+        return {"ok": 1}
+
+    monkeypatch.setattr(server, "client", FakeClient(ping))
+
+    response = await api.get("/health")
+
+    assert response.status_code == 200
+    mongo = response.json()["mongo"]
+    assert response.json()["status"] == "ok"
+    assert mongo["pingMs"] is not None
+    assert mongo["pool"]["maxPoolSize"] == 10
+    assert mongo["serverRttMs"] == {"mongo:27017": 1.5}
+
+
+@pytest.mark.parametrize("failure", [ConnectionError("refused"), asyncio.TimeoutError()])
+async def test_health_is_unavailable_when_mongo_does_not_answer(api, monkeypatch, failure):
+    async def ping(command):
+        raise failure
+
+    monkeypatch.setattr(server, "client", FakeClient(ping))
+
+    response = await api.get("/health")
+
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert response.json()["mongo"]["error"]
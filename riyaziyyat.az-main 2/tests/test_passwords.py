@@ -0,0 +1,50 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+AYNUR = {"email": "aynur.mammadova", "password": "aynur123"}
+
+
+async def test_login_migrates_plaintext_password(api, db):
+    response = await api.post("/api/auth/login", json=AYNUR)
+
+    assert response.json()["success"] is True
+    stored = (await db.students.find_one({"id": "2"}))["pass"]
+    assert stored != "aynur123"
+    assert server.password_context.verify("aynur123", stored)
+
+
+async def test_login_keeps_the_hash_out_of_the_user_and_cache(api):
+    response = await api.post("/api/auth/login", json=AYNUR)
+    cached = await api.post("/api/auth/login", json=AYNUR)
+
+    assert "pass" not in response.json()["user"]
+    assert "pass" not in cached.json()["user"]
+    assert "pass" not in server.login_cache.get(AYNUR["email"], AYNUR["password"])
+
+
+@pytest.mark.parametrize("params", [{}, {"limit": 2}])
+async def test_student_listing_has_no_passwords(api, teacher, params):
+    response = await api.get("/api/students", params=params, headers=teacher)
+
+    assert response.json()
+    assert all("pass" not in student for student in response.json())
+
+
+async def test_create_and_update_do_not_echo_the_password(api, db, teacher):
+    student = {
+        "id": "new", "name": "Leyla", "surname": "Həsənova", "email": "leyla", "pass": "p",
+        "group": "10(1,3)", "class": "10a", "parentContact": "+994500000000",
+    }
+
+    created = await api.post("/api/students", json=student, headers=teacher)
+    updated = await api.put("/api/students/new", json={**student, "pass": "", "name": "Lala"}, headers=teacher)
+
+    assert "pass" not in created.json()
+    assert updated.json()["name"] == "Lala"
+    assert "pass" not in updated.json()
+    # An empty password in an edit keeps the current one
+    login = await api.post("/api/auth/login", json={"email": "leyla", "password": "p"})
+    assert login.json()["success"] is True
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+def exam_times(start: timedelta, end: timedelta) -> dict:
+    now = datetime.now(server.EXAM_TIMEZONE).replace(tzinfo=None)
+    return {"startTime": (now + start).isoformat(), "endTime": (now + end).isoformat()}
+
+
+async def wait_for_status(db, exam_id: str, status: str) -> None:
+    for _ in range(200):
+        if (await db.exams.find_one({"id": exam_id}))["status"] == status:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"{exam_id} never became {status}")
+
+
+@pytest.fixture
+async def scheduler(db):
+    scheduler = server.ExamLifecycleScheduler(catch_up_concurrency=2)
+    yield scheduler
+    await scheduler.stop()
+
+
+async def test_overdue_exams_are_caught_up_in_the_background(db, scheduler):
+    await db.exams.insert_many([
+        {"id": f"old{index}", "status": "live", **exam_times(timedelta(hours=-2), timedelta(hours=-1))}
+        for index in range(5)
+    ])
+    release = asyncio.Event()
+    running, most = 0, 0
+
+    async def hook(exam_id):
+        nonlocal running, most
+        running += 1
+        most = max(most, running)
+        await release.wait()
+        running -= 1
+
+    scheduler.finish_hooks.append(hook)
+
+    await scheduler.start()
+    await asyncio.sleep(0.05)
+
+    # start() returned while the hooks are still blocked
+    assert running == 2
+    release.set()
+    for index in range(5):
+        await wait_for_status(db, f"old{index}", "finished")
+    assert most == 2
+
+
+async def test_scheduled_exam_goes_live_then_finishes(db, scheduler):
+    finished = []
+
+    async def hook(exam_id):
+        finished.append(exam_id)
+
+    scheduler.finish_hooks.append(hook)
+    exam = {"id": "soon", "status": "upcoming", **exam_times(timedelta(seconds=0.2), timedelta(seconds=0.4))}
+    await db.exams.insert_one(dict(exam))
+
+    await scheduler.start()
+    assert (await db.exams.find_one({"id": "soon"}))["status"] == "upcoming"
+
+    await wait_for_status(db, "soon", "live")
+    await wait_for_status(db, "soon", "finished")
+    assert finished == ["soon"]
+
+
+async def test_seeded_exams_are_scheduled(db, monkeypatch):
+    scheduled = []
+    monkeypatch.setattr(server.exam_scheduler, "schedule", lambda exam: scheduled.append(exam["id"]))
+
+    await server.initialize_data()
+
+    assert scheduled == ["exam1", "exam2"]
@@ -0,0 +1,50 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+ANSWER_KEY = {"answers": ["x = 1", "", "b"], "points": 5}
+
+
+@pytest.mark.parametrize("answers, score", [
+    ({"0": " X = 1 ", "2": "B"}, 10),
+    ({"0": "x = 2"}, 0),
+    # An empty answer never counts, even against an empty key
+    ({"1": "", "2": "b"}, 5),
+    ({}, 0),
+])
+def test_score_answers(answers, score):
+    assert server.score_answers(ANSWER_KEY, answers) == score
+
+
+def test_frame_scoring_matches_score_answers():
+    submissions = [{"answers": answers} for answers in ({"0": "x = 1"}, {"2": " b"}, {"0": "x = 1", "2": "b"}, {})]
+
+    scores = server.score_submissions_frame(ANSWER_KEY, submissions)
+
+    assert [int(score) for score in scores] == [server.score_answers(ANSWER_KEY, s["answers"]) for s in submissions]
+
+
+async def test_seeded_submission_is_scored(api, db):
+    seeded = await db.submissions.find_one({"id": "sub1"})
+
+    assert seeded["score"] == 10
+    assert (await db.exams.find_one({"id": "exam1"}))["answerKey"]["points"] == 10
+
+
+async def test_regrade_applies_corrected_answers(api, db, teacher):
+    response = await api.post(
+        "/api/exams/exam1/regrade", json={"correctAnswers": {"0": "x = 2, x = 3"}}, headers=teacher,
+    )
+
+    assert response.json()["regraded"] == 1
+    assert (await db.submissions.find_one({"id": "sub1"}))["score"] == 0
+    exam = await db.exams.find_one({"id": "exam1"})
+    assert exam["questions"][0]["correctAnswer"] == "x = 2, x = 3"
+
+
+async def test_regrade_rejects_unknown_questions(api, teacher):
+    response = await api.post("/api/exams/exam1/regrade", json={"correctAnswers": {"5": "a"}}, headers=teacher)
+
+    assert response.status_code == 400
@@ -0,0 +1,86 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_exam(api, headers):
+    return await api.get("/api/exams/exam1", headers=headers)
+
+
+async def test_requests_need_a_valid_session(api):
+    assert (await api.get("/api/exams/exam1")).status_code == 401
+    assert (await get_exam(api, {"Authorization": "Bearer forged"})).status_code == 401
+
+
+async def test_logout_revokes_only_that_session(api, login):
+    first, second = await login(), await login()
+    assert (await get_exam(api, first)).status_code == 200
+
+    response = await api.post("/api/auth/logout", headers=first)
+
+    assert response.status_code == 200
+    assert (await get_exam(api, first)).status_code == 401
+    assert (await get_exam(api, second)).status_code == 200
+
+
+async def test_student_update_revokes_open_sessions(api, db, login, teacher):
+    headers = await login()
+    student = await db.students.find_one({"id": "2"}, {"_id": 0})
+
+    await api.put("/api/students/2", json={**student, "pass": "aynur123", "status": "disabled"}, headers=teacher)
+
+    assert (await get_exam(api, headers)).status_code == 401
+    relogin = await api.post("/api/auth/login", json={"email": "aynur.mammadova", "password": "aynur123"})
+    assert relogin.json()["success"] is False
+
+
+async def test_bulk_update_revokes_open_sessions(api, login, teacher):
+    headers = await login()
+
+    await api.post("/api/students/bulk", json={"update": [{"id": "2", "changes": {"class": "11b"}}]}, headers=teacher)
+
+    assert (await get_exam(api, headers)).status_code == 401
+    assert (await get_exam(api, await login())).status_code == 200
+
+
+async def test_group_move_revokes_sessions_of_the_group(api, login, teacher):
+    headers = await login()
+    await api.post("/api/groups", json={"name": "NEW"}, headers=teacher)
+
+    response = await api.post("/api/groups/10(1,3)/move", json={"to": "NEW"}, headers=teacher)
+
+    assert response.json()["moved"] >= 1
+    assert (await get_exam(api, headers)).status_code == 401
+    # A new session carries the new group, which exam1 is not assigned to
+    assert (await get_exam(api, await login())).status_code == 403
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/api/students"),
+    ("POST", "/api/students/bulk"),
+    ("DELETE", "/api/exams/exam1"),
+    ("POST", "/api/exams/exam1/regrade"),
+    ("POST", "/api/submissions/archive"),
+    ("GET", "/api/cheating-reports"),
+])
+async def test_teacher_endpoints_refuse_students(api, login, method, path):
+    assert (await api.request(method, path)).status_code == 401
+    assert (await api.request(method, path, headers=await login())).status_code == 403
+
+
+async def test_event_stream_takes_the_token_from_the_query(api, login):
+    token = (await login())["Authorization"].removeprefix("Bearer ")
+
+    response = await api.get("/api/events", params={"token": token})
+
+    assert response.status_code == 403
+
+
+async def test_server_refuses_to_start_without_session_secret(monkeypatch):
+    monkeypatch.setattr(server, "SESSION_SECRET", None)
+
+    with pytest.raises(RuntimeError, match="SESSION_SECRET"):
+        async with server.lifespan(server.app):
+            pass
@@ -0,0 +1,28 @@
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_student_exams_need_the_students_own_session(api, login, teacher):
+    assert (await api.get("/api/students/2/exams")).status_code == 401
+    assert (await api.get("/api/students/1/exams", headers=await login())).status_code == 403
+    assert (await api.get("/api/students/2/exams", headers=teacher)).status_code == 403
+
+
+async def test_student_exams_join_submissions_and_archives(api, db, login):
+    await db.submissions.insert_many([
+        {"id": "live", "examId": "exam1", "studentId": "2", "answers": {}, "submittedAt": "2025-01-01T10:30",
+         "cheatingDetected": False, "score": 1, "status": "submitted"},
+        {"id": "draft", "examId": "exam2", "studentId": "2", "answers": {}, "submittedAt": "2025-01-01T10:30",
+         "status": server.SUBMISSION_IN_PROGRESS},
+    ])
+
+    response = await api.get("/api/students/2/exams", headers=await login())
+
+    assert response.status_code == 200
+    exams = {exam["id"]: exam for exam in response.json()}
+    assert exams["exam1"]["submission"]["id"] == "live"
+    assert "questions" not in exams["exam1"]
+    assert all(exam["submission"] is None for exam_id, exam in exams.items() if exam_id != "exam1")
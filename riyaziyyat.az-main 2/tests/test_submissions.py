@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import server
+
+pytestmark = pytest.mark.anyio
+
+def submission(exam_id: str, answers: dict, submitted_at: str = "2025-01-01T10:00:00") -> dict:
+    return {"examId": exam_id, "studentId": "2", "answers": answers, "submittedAt": submitted_at}
+
+
+async def test_concurrent_submissions_store_one_document(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+
+    responses = await asyncio.gather(*[
+        api.post("/api/submissions", json=submission(exam_id, {"0": "a"}), headers=headers)
+        for _ in range(5)
+    ])
+
+    assert {response.status_code for response in responses} == {200}
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert await db.submissions.count_documents({"examId": exam_id, "studentId": "2"}) == 1
+
+
+async def test_retried_submission_returns_the_stored_one(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+
+    first = await api.post("/api/submissions", json=submission(exam_id, {"0": "a"}), headers=headers)
+    retry = await api.post(
+        "/api/submissions", json=submission(exam_id, {"0": "b"}, "2025-01-01T10:05:00"), headers=headers,
+    )
+
+    assert retry.json() == first.json()
+    stored = await db.submissions.find_one({"examId": exam_id, "studentId": "2"}, {"_id": 0})
+    assert stored["answers"] == {"0": "a"}
+    assert stored["score"] == 1
+
+
+async def test_same_submission_sent_twice_stores_one_document(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+    body = submission(exam_id, {"0": "a"})
+
+    sequential = [await api.post("/api/submissions", json=body, headers=headers) for _ in range(2)]
+    concurrent = await asyncio.gather(*[api.post("/api/submissions", json=body, headers=headers) for _ in range(2)])
+
+    assert {response.status_code for response in sequential + concurrent} == {200}
+    assert len({response.json()["id"] for response in sequential + concurrent}) == 1
+    assert await db.submissions.count_documents({"examId": exam_id, "studentId": "2"}) == 1
+
+
+async def test_client_score_is_ignored(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+
+    response = await api.post(
+        "/api/submissions", json={**submission(exam_id, {"0": "wrong"}), "score": 99}, headers=headers,
+    )
+
+    assert response.json()["score"] == 0
+    assert (await db.submissions.find_one({"examId": exam_id}))["score"] == 0
+
+
+async def test_submission_for_an_exam_deleted_after_authorization_is_rejected(api, db, login, live_exam):
+    exam_id = live_exam
+    headers = await login()
+    # Cached by the exam page, so authorization still passes after the delete
+    assert (await api.get(f"/api/exams/{exam_id}", headers=headers)).status_code == 200
+    await db.exams.delete_one({"id": exam_id})
+
+    response = await api.post(
+        "/api/submissions", json={**submission(exam_id, {"0": "a"}), "score": 99}, headers=headers,
+    )
+
+    assert response.status_code == 404
+    assert await db.submissions.count_documents({"examId": exam_id}) == 0
@@ -0,0 +1,65 @@
+import orjson
+import pytest
+from bson import ObjectId
+
+import server
+
+STUDENT = {
+    "_id": ObjectId(), "id": "1", "name": "Nijat", "surname": "Qəsynli", "email": "nijat",
+    "pass": "hash", "group": "10(1,3)", "class": "10a", "parentContact": "+994501234567",
+}
+EXAM = {
+    "_id": ObjectId(), "id": "exam1", "title": "Quiz", "description": "", "questionsCount": 2,
+    "groups": ["10(1,3)"], "startTime": "2025-01-01T10:00:00", "endTime": "2025-01-01T11:00:00",
+    "pointsPerQuestion": 5, "status": "live", "answerKey": ["a", "b"],
+    "questions": [
+        {"question": "q1", "type": "multiple-choice", "options": ["a", "b"], "correctAnswer": "a"},
+        {"question": "q2", "type": "free-form", "correctAnswer": "b", "imageUrl": "/api/images/1"},
+    ],
+}
+SUBMISSION = {
+    "_id": ObjectId(), "id": "sub1", "examId": "exam1", "studentId": "1", "answers": {"0": "a"},
+    "submittedAt": "2025-01-01T10:30:00", "score": 5, "autoSubmitted": True,
+}
+
+
+@pytest.mark.parametrize("document, model", [
+    (STUDENT, server.Student),
+    (STUDENT, server.StudentProfile),
+    (EXAM, server.Exam),
+    (EXAM, server.ExamSummary),
+    (SUBMISSION, server.Submission),
+])
+def test_encode_trusted_matches_the_model(document, model):
+    expected = model(**document).model_dump(by_alias=True, mode="json")
+
+    assert orjson.loads(server.encode_trusted(document, model)) == expected
+
+
+def test_encode_trusted_uses_aliases_and_drops_unknown_fields():
+    encoded = orjson.loads(server.encode_trusted(STUDENT, server.StudentProfile))
+
+    assert encoded["class"] == "10a"
+    assert "class_" not in encoded
+    assert "_id" not in encoded
+    assert "pass" not in encoded
+    assert encoded["status"] == "active"
+
+
+def test_encode_trusted_shapes_nested_models():
+    exam = {**EXAM, "questions": [{**EXAM["questions"][0], "_id": ObjectId()}]}
+
+    encoded = orjson.loads(server.encode_trusted(exam, server.Exam))
+
+    assert "answerKey" not in encoded
+    assert encoded["questions"] == [
+        {"question": "q1", "type": "multiple-choice", "options": ["a", "b"], "correctAnswer": "a", "imageUrl": None},
+    ]
+
+
+def test_pack_trusted_matches_encode_trusted():
+    msgpack = pytest.importorskip("msgpack")
+
+    packed = msgpack.unpackb(server.pack_trusted(SUBMISSION, server.Submission))
+
+    assert packed == orjson.loads(server.encode_trusted(SUBMISSION, server.Submission))